@@ -1,87 +1,378 @@
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_file
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import io
 import os
-from groq import Groq
 import logging
 import json
 import traceback
-import tempfile
-from pydub import AudioSegment
 import base64
-import requests
+import time
+import threading
 from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from config.settings import *
-from database.mongodb import MongoDB
-from managers.conversation_manager import ConversationHistoryManager
-from managers.reminder_manager import RemindersManager
-from managers.scheduling_manager import SchedulingManager
-from services.web_service import web_search
-from services.speech_service import text_to_speech
-from utils.function_tools import function_tools
+from services.web_service import web_search, enable_shared_cache, web_cache_stats
+from services.speech_service import text_to_speech, convert_to_wav, transcribe, SentenceBuffer, submit_sentences, finish_speech, SpeechPipeline, tts_executor, prewarm_speech, audio_cache, get_audio, enable_shared_audio
+from services.voice_stream import CallSession, transcribe_executor, transcript_text, partial_transcript
+from utils.function_tools import tool_definitions, function_tools
+from utils.prompt_builder import PromptBuilder, stream_usage
+from utils.intent_router import IntentRouter
+from utils.response_cache import ResponseCache
+from utils.lazy import LazyProxy, warm_up
+from utils.static_assets import StaticAssets
+from utils.metrics import registry, request_seconds, span, record_stage, record_tool, submit, start_request, server_timing
+from utils.stream_parser import ResponseStreamParser
+from utils.limiter import limited_call, limited_stream, set_request_priority, UpstreamBusy, PRIORITY_VOICE, PRIORITY_INTERACTIVE
 
 # Initialize Flask app
-app = Flask(__name__, static_folder=os.path.abspath("frontend/build"), static_url_path="")
+# Static files go through StaticAssets (see serve) instead of Flask's static route
+STATIC_ROOT = os.path.abspath("frontend/build")
+app = Flask(__name__, static_folder=None)
 CORS(app)
-# app.secret_key = os.urandom(24)
-
-# Initialize MongoDB
-mongodb = MongoDB(MONGODB_URI)
-conversations_collection = mongodb.conversations
-reminders_collection = mongodb.reminders
-
-# Initialize managers and clients
-groq_client = Groq(api_key=GROQ_API_KEY)
-history_manager = ConversationHistoryManager(conversations_collection)
-reminders_manager = RemindersManager(reminders_collection)
-scheduling_manager = SchedulingManager()
+sock = Sock(app)
+# Workers behind a load balancer must agree on the key that signs session cookies
+if SECRET_KEY:
+    app.secret_key = SECRET_KEY
+else:
+    if WORKER_MODE == "shared":
+        logging.getLogger(__name__).warning("WORKER_MODE=shared without SECRET_KEY: session cookies only work on the worker that set them.")
+    app.secret_key = os.urandom(24)
+
+# MongoDB, the managers and the Groq client are created on first use; their imports
+# and the database bootstrap would otherwise dominate cold start (see STARTUP_INIT)
+def create_mongodb():
+    from database.mongodb import MongoDB
+    db = MongoDB(MONGODB_URI)
+    if WEB_CACHE_SHARED:
+        enable_shared_cache(db.web_cache)
+    if WORKER_MODE == "shared":
+        enable_shared_audio(db.audio_clips)
+    return db
+
+def create_groq_client():
+    from groq import Groq
+    # Retries are left to the upstream limiter, which also backs off the other callers
+    return Groq(api_key=GROQ_API_KEY, max_retries=0 if UPSTREAM_LIMITER else 2)
+
+def create_history_manager():
+    from managers.conversation_manager import ConversationHistoryManager
+    return ConversationHistoryManager(
+        mongodb.conversations,
+        messages_collection=mongodb.messages if CONVERSATION_STORAGE == "message" else None,
+        max_day_messages=MAX_DAY_MESSAGES,
+        cache_pages=WORKER_MODE != "shared"
+    )
+
+def create_reminders_manager():
+    from managers.reminder_manager import RemindersManager
+    return RemindersManager(mongodb.reminders)
+
+def create_scheduling_manager():
+    from managers.scheduling_manager import SchedulingManager
+    if WORKER_MODE != "shared":
+        return SchedulingManager()
+
+    from services.google_service import SharedCredentialsStore
+    # Events created through another worker must be visible to the next sync, so it is never skipped
+    return SchedulingManager(credentials=SharedCredentialsStore(mongodb.credentials), calendar_sync_interval=0)
+
+def create_static_assets():
+    return StaticAssets(STATIC_ROOT)
+
+mongodb = LazyProxy(create_mongodb, "MongoDB")
+groq_client = LazyProxy(create_groq_client, "Groq client")
+history_manager = LazyProxy(create_history_manager, "conversation history")
+reminders_manager = LazyProxy(create_reminders_manager, "reminders")
+scheduling_manager = LazyProxy(create_scheduling_manager, "scheduling")
+static_assets = LazyProxy(create_static_assets, "static manifest")
+prompt_builder = PromptBuilder()
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="tool")
+intent_router = IntentRouter()
+response_cache = ResponseCache(prompt_builder.prefix + "llama-3.3-70b-versatile") if RESPONSE_CACHE else None
+
+CALENDAR_AUTH_RESPONSE = "Please authenticate with Google Calendar first"
+EVENT_FAILED_RESPONSE = "I couldn't create the event. Please try again."
+NO_REMINDERS_RESPONSE = "You don't have any active reminders."
+
+BUSY_RESPONSE = "I'm getting more requests than I can handle right now. Please try again in a moment."
+ERROR_RESPONSE = "Sorry, something went wrong while answering. Please try again."
+NO_RESPONSE = "I apologize, but I couldn't generate a proper response."
+
+def timed_out_response(function_name):
+    return f"Sorry, {function_name.replace('_', ' ')} took too long to respond."
+
+def error_response(error):
+    # The exception text only goes to the log
+    return BUSY_RESPONSE if isinstance(error, UpstreamBusy) else ERROR_RESPONSE
+
+def turn_priority(is_speech):
+    return PRIORITY_VOICE if is_speech else PRIORITY_INTERACTIVE
+
+# Replies that never vary, synthesized ahead of time when TTS_PREWARM is set
+FIXED_RESPONSES = [CALENDAR_AUTH_RESPONSE, EVENT_FAILED_RESPONSE, NO_REMINDERS_RESPONSE, BUSY_RESPONSE, ERROR_RESPONSE, NO_RESPONSE] + [
+    timed_out_response(tool["name"]) for tool in function_tools
+]
+
+def initialize_services(strict=False):
+    if TTS_PREWARM:
+        tts_executor.submit(prewarm_speech, FIXED_RESPONSES)
+    warm_up(static_assets, groq_client, mongodb, history_manager, reminders_manager, scheduling_manager, strict=strict)
+
+if STARTUP_INIT == "eager":
+    initialize_services(strict=True)
+elif STARTUP_INIT == "background":
+    threading.Thread(target=initialize_services, name="startup-init", daemon=True).start()
 
 logger = logging.getLogger(__name__)
 
-def process_chat(user_input):
-    recent_context = history_manager.get_recent_context()
-    current_time = datetime.now()
-    formatted_time = current_time.strftime(r"%Y-%m-%d %I:%M:%S %p")
-    day_of_week = current_time.strftime("%A")
-
-    formatted_context = "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in recent_context])
+def build_messages(user_input):
+    with span("history_read"):
+        recent_context = history_manager.get_recent_context(limit=PROMPT_CONTEXT_MAX_MESSAGES)
+    return prompt_builder.build(user_input, recent_context)
+
+def tool_items(function_args, single_key, list_key):
+    # A call names one item under single_key or several under list_key
+    items = list(function_args.get(list_key) or [])
+    if function_args.get(single_key):
+        items.insert(0, function_args[single_key])
+    return list(dict.fromkeys(item for item in items if item))
+
+def execute_tool_call(function_name, function_args):
+    event_link = None
+    web_link = None
+    auth_url = None
+    final_response = None
+    failed = False
 
-    system_message = f"""You are 'Athen', a virtual personal assistant created to engage and satisfy {USER_NAME}, the one who created you and you work for, by following the tasks they ask you to do. {USER_NAME} is {USER_AGE} years old and he is a {USER_OCCUPATION}. Their interests include {USER_INTERESTS}. You can perform tasks by selecting the most appropriate function. Your capabilities include accessing the user's Google Calendar (create, delete, list events), handling reminders (add, mark as completed, list), and now you can also perform web searches when explicitly asked to do so.
+    try:
+        if isinstance(function_args, str):
+            function_args = json.loads(function_args or "{}")
+
+        logger.debug(f"Function name: {function_name}")
+        logger.debug(f"Function args: {function_args}")
+
+        if function_name == "create_event":
+            service, auth_url = scheduling_manager.get_google_calendar_service()
+            if auth_url:
+                final_response = CALENDAR_AUTH_RESPONSE
+                return {
+                    'llm_resp': final_response,
+                    'auth_url': auth_url
+                }
+            
+            if not service:
+                raise Exception("Failed to initialize Google Calendar service")
+            
+            event_details = function_args.get("event_details")
+            if not event_details:
+                raise ValueError("No event details provided")
+            
+            logger.debug(f"Creating event with details: {event_details}")
+            result = scheduling_manager.create_event(service=service, event_details=event_details)
+            
+            if result and isinstance(result, str) and result.startswith("https://"):
+                event_link = result
+                final_response = f"I've created the event '{event_details['summary']}' for {event_details['start_time']} to {event_details['end_time']}."
+            else:
+                final_response = EVENT_FAILED_RESPONSE
+
+        elif function_name == "get_upcoming_events":
+            service, auth_url = scheduling_manager.get_google_calendar_service()
+            if auth_url:
+                final_response = CALENDAR_AUTH_RESPONSE
+                return {
+                    'llm_resp': final_response,
+                    'auth_url': auth_url
+                }
+            result = scheduling_manager.get_upcoming_events(service, function_args.get('max_results', 10))
+            final_response = result
+
+        elif function_name == "delete_event":
+            service, auth_url = scheduling_manager.get_google_calendar_service()
+            if auth_url:
+                final_response = CALENDAR_AUTH_RESPONSE
+                return {
+                    'llm_resp': final_response,
+                    'auth_url': auth_url
+                }
+            deleted, candidates = scheduling_manager.delete_event(service, function_args['summary'])
+            if deleted:
+                final_response = f"I've deleted the event '{deleted.get('summary', function_args['summary'])}'."
+            elif candidates:
+                from managers.scheduling_manager import format_event_start
+                options = ", ".join(f"'{event.get('summary', '(No title)')}' ({format_event_start(event)})" for event in candidates[:5])
+                final_response = f"I found several events that could match '{function_args['summary']}': {options}. Which one should I delete?"
+            else:
+                final_response = f"I couldn't find an upcoming event called '{function_args['summary']}'."
 
-    When the user asks you to search for something online or if you need to verify information, use the web_search function. Only use this function when explicitly asked or when you need to verify important information. Do not use it for every query.
+        elif function_name == "get_active_reminders":
+            reminders = reminders_manager.get_active_reminders()
+            if reminders:
+                final_response = "Here are your active reminders:\n" + "\n".join([f"- {r['reminder']}" for r in reminders])
+            else:
+                final_response = NO_REMINDERS_RESPONSE
+
+        elif function_name == "add_reminder":
+            reminders = tool_items(function_args, 'reminder', 'reminders')
+            if not reminders:
+                raise ValueError("No reminder provided")
+            if len(reminders) == 1:
+                reminders_manager.add_reminder(reminders[0])
+                final_response = f"Reminder '{reminders[0]}' added successfully."
+            else:
+                reminders_manager.add_reminders(reminders)
+                final_response = f"Added {len(reminders)} reminders: " + ", ".join(f"'{r}'" for r in reminders) + "."
+
+        elif function_name == "complete_reminder":
+            reminder_texts = tool_items(function_args, 'reminder_text', 'reminder_texts')
+            if not reminder_texts:
+                raise ValueError("No reminder provided")
+            if len(reminder_texts) == 1:
+                success = reminders_manager.complete_reminder(reminder_text=reminder_texts[0])
+                final_response = f"Reminder '{reminder_texts[0]}' marked as completed." if success else f"Reminder '{reminder_texts[0]}' not found or already completed."
+            else:
+                completed = reminders_manager.complete_reminders(reminder_texts=reminder_texts)
+                if completed:
+                    final_response = f"Marked {completed} reminder{'s' if completed != 1 else ''} as completed."
+                else:
+                    final_response = "None of those reminders were found, or they are already completed."
 
-    The following is the recent context of previous message history of the user with you <"{formatted_context}">.  When responding, ANALYZE ONLY THE LATEST USER INPUT TO DETERMINE THE APPROPRIATE ACTION. DO NOT CONSIDER PREVIOUS MESSAGES FOR FUNCTION CALLING.
-    Choose one of two response formats:
+        elif function_name == "web_search":
+            result = web_search(**function_args, groq_client=groq_client)
+            if result and isinstance(result, str) and result.startswith("https://"):
+                web_link = result
+            final_response = result
 
-    1. Function Call Format (for task-oriented requests):
-    If the user's latest input requires a specific task to be completed using available functions, respond with a JSON object in this format:
-    {function_tools}. Refer carefully what are the functions used for which purposes using the descriptions provided in each functions. AND VERY IMPORTANTLY IF REQUIRED ARGUMENTS ARE PROVIDED BY THE USER DONT TOOL CALL STRAIGHT AWAY, INSTEAD ASK THE USER NECESSARY INFORMATION THAT IS MISSING IN A FOLLOWUP/RESPONSE by using secong response format (Nomral response format) AND THEN PROCEED TO TOOL CALLING TILL YOU GET THE DETAILS COMPLETELY. FOR EXAMPLE IF USER ASKS YOU TO SCHEDULE AN EVENT IN GOOGLE CALENDAR WITHOUT REQUIRED INFORMATIONS LIKE SUMMARY, START TIME AND END TIME, YOU SHOULD ASK THEM THESE DETAILS IN A FOLLOW UP AND THEN AFTER YOU GET THE REQUIRED DETAILS ONLY PROCEED TO TOOL CALLING. Check the necessary parameters/arguments for each function in the structure given. (( OPTIONAL - If you can append your explanation or confirmation of the action taken or function choosed in a short description outside the tool calling format and If you feel you need more accurate data in order to respond to the user, dont hesitate to use the web_search function to get more information)).
+        else:
+            final_response = f"Unknown function: {function_name}"
 
-    2. Normal Response Format (for general queries or when no function is needed):
-    If the user's latest input is a general query or doesn't require a specific function, respond with a JSON object in this format:
-    {{
-        "response": "Your direct response to the user's query or input. respond only to the latest user input and not to the previous conversation history or context."
-    }}
+    except Exception as e:
+        logger.error(f"Error executing function {function_name}: {e}")
+        final_response = f"Sorry, there was an error: {str(e)}"
+        failed = True
+
+    return {
+        'llm_resp': final_response,
+        'event_link': event_link,
+        'web_link': web_link,
+        'auth_url': auth_url,
+        'failed': failed
+    }
+
+def tool_timeout(function_name):
+    return WEB_SEARCH_TOOL_TIMEOUT if function_name == "web_search" else TOOL_CALL_TIMEOUT
+
+def timed_out_tool_result(function_name):
+    return {
+        'llm_resp': timed_out_response(function_name),
+        'event_link': None,
+        'web_link': None,
+        'auth_url': None
+    }
+
+def tool_outcome(result):
+    if result.get('auth_url'):
+        return "auth_required"
+    return "error" if result.get('failed') else "ok"
+
+def run_tool_calls(tool_calls):
+    """Runs (name, args) pairs concurrently and returns their results in call order."""
+    start = time.monotonic()
+    futures = [submit(tool_executor, execute_tool_call, name, args) for name, args in tool_calls]
+    results = []
+    for (function_name, _), future in zip(tool_calls, futures):
+        remaining = start + tool_timeout(function_name) - time.monotonic()
+        try:
+            result = future.result(timeout=max(remaining, 0))
+            outcome = tool_outcome(result)
+        except FutureTimeoutError:
+            logger.warning(f"Tool call {function_name} timed out.")
+            result = timed_out_tool_result(function_name)
+            outcome = "timeout"
+        record_tool(function_name, outcome, time.monotonic() - start)
+        results.append(result)
+    return results
+
+LINK_KEYS = ('event_link', 'web_link', 'auth_url')
+
+def merge_tool_results(results):
+    merged = {'llm_resp': "\n\n".join(r['llm_resp'] for r in results if r.get('llm_resp'))}
+    for key in LINK_KEYS:
+        links = list(dict.fromkeys(r[key] for r in results if r.get(key)))
+        # The single-link fields keep the first; the plural field has every tool call's link
+        merged[key] = links[0] if links else None
+        merged[f"{key}s"] = links
+    return merged
+
+def response_links(resp):
+    links = {}
+    for key in LINK_KEYS:
+        for name in (key, f"{key}s"):
+            if resp.get(name):
+                links[name] = resp[name]
+    return links
+
+def execute_tool_calls(tool_calls):
+    return merge_tool_results(run_tool_calls(tool_calls))
+
+def parse_llm_content(content):
+    try:
+        if content:
+            parsed_content = json.loads(content)
+            if isinstance(parsed_content, dict) and "response" in parsed_content:
+                return parsed_content["response"]
+            return content
+        return NO_RESPONSE
+    except json.JSONDecodeError:
+        return content if content else NO_RESPONSE
+
+def route_intent(user_input):
+    return intent_router.route(user_input) if INTENT_FAST_PATH else None
+
+def cached_response(user_input):
+    return response_cache.get(user_input) if response_cache else None
+
+def store_response(user_input, response):
+    # Fallback and failure replies would otherwise be served again for the same question
+    if response_cache and response not in (NO_RESPONSE, BUSY_RESPONSE, ERROR_RESPONSE):
+        response_cache.store(user_input, response)
 
-    The current date and time is {formatted_time}, and today is {day_of_week}. Use the current date and time for relative references and respond with dates and times in sentence format (example: 3rd May 2024) with AM/PM format only."""
+def process_chat(user_input):
+    intent = route_intent(user_input)
+    if intent:
+        return execute_tool_calls([(intent.name, intent.args)])
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_input}
-    ]
+    cached = cached_response(user_input)
+    if cached:
+        return {
+            'llm_resp': cached,
+            'event_link': None,
+            'web_link': None,
+            'auth_url': None
+        }
 
     try:
-        response = groq_client.chat.completions.create(
-            messages=messages,
-            model="llama-3.3-70b-versatile",
-            temperature=0.5,
-            max_tokens=1024,
-            top_p=1,
-            stop=None,
-            stream=False,
-            functions=function_tools
-        )
-
+        messages = build_messages(user_input)
+        start = time.perf_counter()
+        with span("llm"):
+            response = limited_call(
+                "groq",
+                groq_client.chat.completions.create,
+                messages=messages,
+                model="llama-3.3-70b-versatile",
+                temperature=0.5,
+                max_tokens=1024,
+                top_p=1,
+                stop=None,
+                stream=False,
+                tools=tool_definitions
+            )
+
+        intent_router.record_llm_latency(time.perf_counter() - start)
+        prompt_builder.record_usage(getattr(response, "usage", None))
         assistant_message = response.choices[0].message
         content = assistant_message.content
         tool_calls = assistant_message.tool_calls
@@ -90,120 +381,206 @@ def process_chat(user_input):
         logger.debug(f"Content: {content}")
         logger.debug(f"Tool calls: {tool_calls}")
 
-        event_link = None
-        web_link = None
-        auth_url = None
-        final_response = None
-
         if tool_calls:
-            try:
-                tool_call = tool_calls[0]
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                logger.debug(f"Function name: {function_name}")
-                logger.debug(f"Function args: {function_args}")
-
-                if function_name == "create_event":
-                    service, auth_url = scheduling_manager.get_google_calendar_service()
-                    if auth_url:
-                        final_response = "Please authenticate with Google Calendar first"
-                        return {
-                            'llm_resp': final_response,
-                            'auth_url': auth_url
-                        }
-                    
-                    if not service:
-                        raise Exception("Failed to initialize Google Calendar service")
-                    
-                    event_details = function_args.get("event_details")
-                    if not event_details:
-                        raise ValueError("No event details provided")
-                    
-                    logger.debug(f"Creating event with details: {event_details}")
-                    result = scheduling_manager.create_event(service=service, event_details=event_details)
-                    
-                    if result and isinstance(result, str) and result.startswith("https://"):
-                        event_link = result
-                        final_response = f"I've created the event '{event_details['summary']}' for {event_details['start_time']} to {event_details['end_time']}."
-                    else:
-                        final_response = "I couldn't create the event. Please try again."
-
-                elif function_name == "get_upcoming_events":
-                    service, auth_url = scheduling_manager.get_google_calendar_service()
-                    if auth_url:
-                        final_response = "Please authenticate with Google Calendar first"
-                        return {
-                            'llm_resp': final_response,
-                            'auth_url': auth_url
-                        }
-                    result = scheduling_manager.get_upcoming_events(service, function_args.get('max_results', 10))
-                    final_response = result
-
-                elif function_name == "get_active_reminders":
-                    reminders = reminders_manager.get_active_reminders()
-                    if reminders:
-                        final_response = "Here are your active reminders:\n" + "\n".join([f"- {r['reminder']}" for r in reminders])
-                    else:
-                        final_response = "You don't have any active reminders."
-
-                elif function_name == "add_reminder":
-                    reminders_manager.add_reminder(**function_args)
-                    final_response = f"Reminder '{function_args['reminder']}' added successfully."
-
-                elif function_name == "complete_reminder":
-                    success = reminders_manager.complete_reminder(**function_args)
-                    final_response = f"Reminder '{function_args['reminder_text']}' marked as completed." if success else f"Reminder '{function_args['reminder_text']}' not found or already completed."
-
-                elif function_name == "web_search":
-                    result = web_search(**function_args, groq_client=groq_client)
-                    if result and isinstance(result, str) and result.startswith("https://"):
-                        web_link = result
-                    final_response = result
-
-                else:
-                    final_response = f"Unknown function: {function_name}"
-
-            except Exception as e:
-                logger.error(f"Error executing function {function_name}: {e}")
-                final_response = f"Sorry, there was an error: {str(e)}"
-        else:
-            try:
-                if content:
-                    parsed_content = json.loads(content)
-                    if isinstance(parsed_content, dict) and "response" in parsed_content:
-                        final_response = parsed_content["response"]
-                    else:
-                        final_response = content
-                else:
-                    final_response = "I apologize, but I couldn't generate a proper response."
-            except json.JSONDecodeError:
-                final_response = content if content else "I apologize, but I couldn't generate a proper response."
+            return execute_tool_calls([(call.function.name, call.function.arguments) for call in tool_calls])
 
+        final_response = parse_llm_content(content)
+        store_response(user_input, final_response)
         return {
             'llm_resp': final_response,
-            'event_link': event_link,
-            'web_link': web_link,
-            'auth_url': auth_url
+            'event_link': None,
+            'web_link': None,
+            'auth_url': None
         }
     
     except Exception as e:
         logger.error(f"Error in process_chat: {str(e)}")
         logger.error(traceback.format_exc())
         return {
-            'llm_resp': f"An error occurred: {str(e)}",
+            'llm_resp': error_response(e),
             'event_link': None,
             'web_link': None,
             'auth_url': None
         }
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def audio_url(audio_id):
+    return f"/api/audio/{audio_id}"
+
+def accumulate_tool_calls(native_calls, delta):
+    # Native tool calls arrive as name/argument fragments keyed by index
+    for call in delta.tool_calls or []:
+        entry = native_calls.setdefault(call.index, {"name": "", "arguments": ""})
+        if call.function and call.function.name:
+            entry["name"] += call.function.name
+        if call.function and call.function.arguments:
+            entry["arguments"] += call.function.arguments
+    function_call = getattr(delta, "function_call", None)
+    if function_call:
+        entry = native_calls.setdefault(0, {"name": "", "arguments": ""})
+        entry["name"] += function_call.name or ""
+        entry["arguments"] += function_call.arguments or ""
+
+def streamed_tool_calls(native_calls, parser):
+    if native_calls:
+        return [(native_calls[index]["name"], native_calls[index]["arguments"]) for index in sorted(native_calls)]
+    tool_call = parser.tool_call()
+    return [tool_call] if tool_call else []
+
+def audio_events(pipeline, drain=False):
+    for seq, audio in (pipeline.drain() if drain else pipeline.ready()):
+        if audio:
+            yield "audio", {"seq": seq, "audio": base64.b64encode(audio).decode('utf-8')}
+
+def llm_events(user_input, parser, native_calls, sentences=None, pipeline=None):
+    messages = build_messages(user_input)
+    start = time.perf_counter()
+    stream = limited_stream(
+        "groq",
+        groq_client.chat.completions.create,
+        messages=messages,
+        model="llama-3.3-70b-versatile",
+        temperature=0.5,
+        max_tokens=1024,
+        top_p=1,
+        stop=None,
+        stream=True,
+        tools=tool_definitions
+    )
+
+    first_token = True
+    for chunk in stream:
+        prompt_builder.record_usage(stream_usage(chunk))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+
+        accumulate_tool_calls(native_calls, delta)
+        text = parser.feed(delta.content)
+        if text:
+            if first_token:
+                record_stage("llm_first_token", time.perf_counter() - start)
+                first_token = False
+            yield "token", {"text": text}
+            if pipeline is not None:
+                submit_sentences(pipeline, sentences.feed(text))
+        if pipeline is not None:
+            yield from audio_events(pipeline)
+
+    text = parser.finish()
+    if text:
+        yield "token", {"text": text}
+        if pipeline is not None:
+            submit_sentences(pipeline, sentences.feed(text))
+    record_stage("llm", time.perf_counter() - start)
+    intent_router.record_llm_latency(time.perf_counter() - start)
+
+def chat_events(user_input, is_speech=False):
+    """Yields (event, data) pairs for one streamed chat turn."""
+    set_request_priority(turn_priority(is_speech))
+    parser = ResponseStreamParser()
+    native_calls = {}
+    resp = None
+    # Text that was never streamed as tokens (tool output, cached and fallback answers) is spoken as a whole
+    reply = None
+
+    # In voice mode each finished sentence is sent to TTS while the LLM keeps generating
+    sentences = SentenceBuffer() if is_speech else None
+    pipeline = SpeechPipeline() if is_speech else None
+
+    try:
+        intent = route_intent(user_input)
+        cached = cached_response(user_input) if not intent else None
+        if intent:
+            tool_calls = [(intent.name, intent.args)]
+        elif cached:
+            tool_calls = []
+            yield "token", {"text": cached}
+        else:
+            yield from llm_events(user_input, parser, native_calls, sentences, pipeline)
+            tool_calls = streamed_tool_calls(native_calls, parser)
+
+        if tool_calls:
+            logger.debug(f"Streamed tool calls: {[name for name, _ in tool_calls]}")
+            results = run_tool_calls(tool_calls)
+            for (function_name, _), result in zip(tool_calls, results):
+                yield "tool", {"name": function_name, "response": result.get('llm_resp'), **response_links(result)}
+            resp = merge_tool_results(results)
+            reply = resp.get('llm_resp') or ""
+        elif cached:
+            resp = {'llm_resp': cached}
+            reply = cached
+        else:
+            final_response = parser.text.strip()
+            if not final_response:
+                final_response = parse_llm_content(parser.raw)
+                reply = final_response
+                yield "token", {"text": final_response}
+            resp = {'llm_resp': final_response}
+            store_response(user_input, final_response)
+
+        links = response_links(resp)
+        if links:
+            yield "links", links
+
+        if is_speech:
+            finish_speech(pipeline, sentences, reply)
+            yield from audio_events(pipeline, drain=True)
+
+    except Exception as e:
+        logger.error(f"Error in chat_events: {str(e)}")
+        logger.error(traceback.format_exc())
+        resp = {'llm_resp': error_response(e)}
+        yield "error", {"message": resp['llm_resp']}
+
+    finally:
+        # Also runs when the client disconnects mid-stream, keeping whatever was shown
+        final_response = resp.get('llm_resp') if resp else parser.text.strip()
+        if final_response:
+            with span("history_write"):
+                history_manager.add_message("assistant", final_response)
+
+    yield "done", {"response": resp.get('llm_resp')}
+
+def stream_chat(user_input, is_speech=False):
+    for event, data in chat_events(user_input, is_speech):
+        yield sse_event(event, data)
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    start_request()
+
+@app.before_request
+def reset_request_priority():
+    # Request threads are reused, so a voice turn's priority must not carry over
+    set_request_priority(PRIORITY_INTERACTIVE)
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint, status=response.status_code)
+    # Streamed responses only carry the stages finished before the body starts
+    if SERVER_TIMING and request.path.startswith('/api/'):
+        timing = server_timing()
+        if timing:
+            response.headers['Server-Timing'] = timing
+    return response
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(app.static_folder + '/' + path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    asset = static_assets.get(path) if path else None
+    if asset is None:
+        # Missing bundles must not fall back to index.html; other paths are client-side routes
+        if path.startswith('static/'):
+            return jsonify({'error': 'Not found'}), 404
+        asset = static_assets.get('index.html')
+        if asset is None:
+            return jsonify({'error': 'Frontend build not found'}), 404
+    return static_assets.response(asset, request.headers)
 
 @app.route('/oauth_callback')
 def oauth_callback():
@@ -212,7 +589,6 @@ def oauth_callback():
         try:
             service = scheduling_manager.handle_auth_callback(auth_code)
             if service:
-                session['auth_pending'] = False
                 return "Authentication successful! You can close this window."
             else:
                 return "Authentication failed. Please try again."
@@ -223,7 +599,8 @@ def oauth_callback():
 
 @app.route('/api/auth_status')
 def auth_status():
-    return jsonify({'authenticated': not session.get('auth_pending', True)})
+    # Derived from the stored credentials rather than the session, so any worker can answer
+    return jsonify({'authenticated': scheduling_manager.credentials.get() is not None})
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -232,20 +609,21 @@ def chat():
         user_input = data['message']
         is_speech = data.get('is_speech', False)
         logger.info(f"Received message: {user_input}, is_speech: {is_speech}")
+        set_request_priority(turn_priority(is_speech))
 
         # Add user message to history
-        history_manager.add_message("user", user_input)
+        with span("history_write"):
+            history_manager.add_message("user", user_input)
 
         # Process the chat
         resp = process_chat(user_input)
         
         # Get the response components
         final_response = resp.get('llm_resp', '')
-        event_link = resp.get('event_link')
-        auth_url = resp.get('auth_url')
         
         # Add assistant response to history
-        history_manager.add_message("assistant", final_response)
+        with span("history_write"):
+            history_manager.add_message("assistant", final_response)
 
         # Prepare response data
         response_data = {
@@ -254,15 +632,12 @@ def chat():
 
         # Convert response to speech if input was from speech
         if is_speech:
-            audio_data = text_to_speech(final_response)
-            if audio_data:
-                response_data['audio'] = audio_data
+            audio_id = text_to_speech(final_response)
+            if audio_id:
+                response_data['audio_url'] = audio_url(audio_id)
         
         # Add optional response components
-        if event_link:
-            response_data['event_link'] = event_link
-        if auth_url:
-            response_data['auth_url'] = auth_url
+        response_data.update(response_links(resp))
 
         return jsonify(response_data), 200
 
@@ -274,35 +649,51 @@ def chat():
             'response': 'I apologize, but I encountered an error processing your request.'
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    try:
+        data = request.json
+        user_input = data['message']
+        is_speech = data.get('is_speech', False)
+        logger.info(f"Received streaming message: {user_input}, is_speech: {is_speech}")
+
+        with span("history_write"):
+            history_manager.add_message("user", user_input)
+
+        return Response(
+            stream_with_context(stream_chat(user_input, is_speech)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except Exception as e:
+        logger.error(f"Error in chat_stream endpoint: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': str(e),
+            'response': 'I apologize, but I encountered an error processing your request.'
+        }), 500
+
+@app.route('/api/audio/<audio_id>', methods=['GET'])
+def serve_audio(audio_id):
+    audio = get_audio(audio_id)
+    if audio is None:
+        return jsonify({'error': 'Audio not found or expired'}), 404
+
+    # send_file streams the clip in blocks and answers Range and If-None-Match requests
+    response = send_file(io.BytesIO(audio), mimetype='audio/mpeg', conditional=True, etag=audio_id, max_age=AUDIO_CLIP_TTL)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 @app.route('/api/speech-to-text', methods=['POST'])
 def speech_to_text():
     try:
         audio_file = request.files['audio']
         print("Audio file received:", audio_file)
 
-        # Save the input file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
-            audio_file.save(temp_file.name)
-            temp_filename = temp_file.name
-
-        # Convert using pydub
-        audio = AudioSegment.from_file(temp_filename)
-        output_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
-        audio = audio.set_frame_rate(16000)  # Set sample rate to 16kHz
-        audio = audio.set_channels(1)        # Convert to mono
-        audio = audio.set_sample_width(2)    # Set to 16-bit
-        audio.export(output_wav, format='wav')
-
-        API_URL = "https://api-inference.huggingface.co/models/openai/whisper-large-v3"
-        headers = {"Authorization": "Bearer {HUGGING_FACE_INFERENCEAPI}"}
-
-        def query(filename):
-            with open(filename, "rb") as f:
-                data = f.read()
-            response = requests.post(API_URL, headers=headers, data=data)
-            return response.json()
-
-        output = query(output_wav)
+        set_request_priority(PRIORITY_VOICE)
+        output = transcribe(convert_to_wav(audio_file.read()))
         print("Hugging Face API response:", output)
 
         if "text" in output:
@@ -310,41 +701,197 @@ def speech_to_text():
             return jsonify({'transcription': transcription})
         else:
             raise ValueError(f"Unexpected API response: {output}")
+    except UpstreamBusy as e:
+        logger.warning(f"Error in speech_to_text endpoint: {e}")
+        return jsonify({'error': BUSY_RESPONSE}), 503
     except Exception as e:
         print("Error occurred:", str(e))
         return jsonify({'error': str(e)}), 500
+
+class CallSocket:
+    """Serializes sends so a running call turn and the receive loop can share one socket."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.ws.send(message)
+
+def send_json(ws, message_type, data=None):
+    ws.send(json.dumps({"type": message_type, **(data or {})}))
+
+def run_call_turn(ws, wav_bytes, is_speech, interrupted):
+    set_request_priority(PRIORITY_VOICE)
+    try:
+        user_input = transcript_text(transcribe(wav_bytes))
+    except Exception as e:
+        logger.error(f"Error transcribing call audio: {str(e)}")
+        send_json(ws, "error", {"message": str(e)})
+        return
+    send_json(ws, "final", {"text": user_input})
+    if not user_input or interrupted.is_set():
+        return
+
+    logger.info(f"Received call turn: {user_input}")
+    with span("history_write"):
+        history_manager.add_message("user", user_input)
+    events = chat_events(user_input, is_speech)
+    try:
+        for event, data in events:
+            if interrupted.is_set():
+                break
+            send_json(ws, event, data)
     finally:
-        if 'temp_filename' in locals():
-            os.remove(temp_filename)
-        if 'output_wav' in locals():
-            os.remove(output_wav)
+        # Closing the generator still saves whatever part of the reply was produced
+        events.close()
+
+def call_turn_done(future):
+    error = future.exception()
+    if error is not None and not isinstance(error, ConnectionClosed):
+        logger.error(f"Error in call turn: {error}")
+
+@sock.route('/api/call')
+def call(ws):
+    """Voice turns over one socket.
+
+    The client sends {"type": "start", "sample_rate": 16000} and then binary
+    16-bit mono PCM frames. Replies are {"type": ...} messages: speech_start,
+    partial, final, then the /api/chat/stream events for the chat turn.
+    Turns run on their own thread while audio keeps being received; speech
+    during a reply stops it and sends "interrupted".
+    """
+    call_session = CallSession()
+    is_speech = True
+    set_request_priority(PRIORITY_VOICE)
+    out = CallSocket(ws)
+    # One worker keeps the turns of a call in order
+    turns = ThreadPoolExecutor(max_workers=1, thread_name_prefix="call-turn")
+    turn = None
+    interrupted = threading.Event()
+    partial = None
+
+    try:
+        while True:
+            message = ws.receive(timeout=0.1)
+
+            if partial is not None and partial.done():
+                text = partial.result()
+                text = call_session.add_partial(text) if text else None
+                if text:
+                    send_json(out, "partial", {"text": text})
+                partial = None
+
+            if message is None:
+                continue
+
+            if isinstance(message, str):
+                control = json.loads(message)
+                if control.get("type") == "start":
+                    call_session = CallSession(int(control.get("sample_rate", call_session.sample_rate)))
+                    is_speech = control.get("speech", True)
+                elif control.get("type") == "stop":
+                    break
+                continue
+
+            for event in call_session.feed(message):
+                if event == "speech_start":
+                    send_json(out, "speech_start")
+                    if turn is not None and not turn.done():
+                        interrupted.set()
+                        send_json(out, "interrupted")
+                elif event == "partial" and partial is None:
+                    partial = transcribe_executor.submit(partial_transcript, call_session.take_partial_audio())
+                elif event == "end_of_turn":
+                    if partial is not None:
+                        partial.cancel()
+                        partial = None
+                    interrupted = threading.Event()
+                    turn = turns.submit(run_call_turn, out, call_session.take_utterance(), is_speech, interrupted)
+                    turn.add_done_callback(call_turn_done)
+
+    except ConnectionClosed:
+        logger.info("Call closed by client.")
+    finally:
+        interrupted.set()
+        turns.shutdown(wait=False)
 
 @app.route('/api/conversation_history', methods=['GET'])
 def load_conversation_history():
     try:
-        today_doc = history_manager.get_today_document()
-        recent_context = today_doc["messages"][-history_manager.context_length:]
+        try:
+            limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        before = request.args.get('before')
+        try:
+            messages, next_cursor = history_manager.get_history_page(limit, before=before)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
 
         conversation_history = []
-        for message in recent_context:
+        for message in messages:
             conversation_history.append({
                 "role": message.get("role", "unknown"),
                 "content": message.get("content", ""),
                 "timestamp": message.get("timestamp", datetime.utcnow()).isoformat()
             })
 
-        return jsonify({"conversation_history": conversation_history}), 200
+        return jsonify({"conversation_history": conversation_history, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         logger.error(f"Error in load_conversation_history: {str(e)}")
         return jsonify({'error': f'An internal server error occurred: {str(e)}'}), 500
     
+@app.route('/api/reminders', methods=['GET'])
+def list_reminders():
+    try:
+        flag = 1 if request.args.get('status') == 'completed' else 0
+        try:
+            limit = max(1, min(int(request.args.get('limit', 50)), 200))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        cursor = request.args.get('cursor')
+        try:
+            reminders, next_cursor = reminders_manager.list_reminders(flag=flag, limit=limit, cursor=cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        return jsonify({
+            "reminders": [{
+                "id": str(r["_id"]),
+                "reminder": r["reminder"],
+                "completed": r["flag"] == 1,
+                "timestamp": r["timestamp"].isoformat()
+            } for r in reminders],
+            "next_cursor": next_cursor
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in list_reminders: {str(e)}")
+        return jsonify({'error': f'An internal server error occurred: {str(e)}'}), 500
+
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'web_search': web_cache_stats(),
+        'prompt': prompt_builder.stats(),
+        'intent': intent_router.stats(),
+        'response': response_cache.stats() if response_cache else None,
+        'tts': audio_cache.stats()
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/clear_chat_history', methods=['POST'])
 def clear_chat_history():
     try:
         today = date.today().isoformat()
-        conversations_collection.delete_one({"date": today})
-        reminders_collection.delete_many({})
+        history_manager.clear_day(today)
+        mongodb.reminders.delete_many({})
         reminders_manager.initialize_reminders()
         return jsonify({'message': 'Chat history and reminders cleared successfully'}), 200
     except Exception as e:
@@ -0,0 +1,480 @@
+"""Asyncio execution mode.
+
+The chat, streaming chat, speech-to-text and call routes run as coroutines
+on a Quart app, so one process can keep hundreds of Groq, ElevenLabs, search
+and Whisper calls in flight. Every other route is served by the regular
+Flask app through a WSGI adapter, keeping the same contracts.
+
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 10000
+"""
+import asyncio
+import base64
+import contextvars
+import functools
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, request, jsonify, Response, websocket, g
+
+from config.settings import GROQ_API_KEY, ASYNC_BLOCKING_WORKERS, SERVER_TIMING, UPSTREAM_LIMITER
+from app import (
+    app as flask_app,
+    history_manager,
+    build_messages,
+    prompt_builder,
+    intent_router,
+    route_intent,
+    cached_response,
+    store_response,
+    execute_tool_call,
+    parse_llm_content,
+    accumulate_tool_calls,
+    streamed_tool_calls,
+    tool_timeout,
+    timed_out_tool_result,
+    merge_tool_results,
+    response_links,
+    tool_outcome,
+    audio_events,
+    sse_event,
+    audio_url,
+    error_response,
+    turn_priority,
+    BUSY_RESPONSE,
+)
+from services.speech_service import synthesize_async, publish_audio, convert_to_wav, transcribe_async, SentenceBuffer, submit_sentences, finish_speech, AsyncSpeechPipeline
+from services.voice_stream import CallSession, transcript_text
+from services.web_service import web_search_async
+from utils.async_http import close_async_client
+from utils.lazy import LazyProxy
+from utils.limiter import limited_call_async, limited_stream_async, set_request_priority, UpstreamBusy, PRIORITY_VOICE
+from utils.function_tools import tool_definitions
+from utils.metrics import request_seconds, span, record_stage, record_tool, start_request, server_timing
+from utils.prompt_builder import stream_usage
+from utils.stream_parser import ResponseStreamParser
+
+logger = logging.getLogger(__name__)
+
+ASYNC_ROUTES = {'/api/chat', '/api/chat/stream', '/api/speech-to-text', '/api/call'}
+
+async_app = Quart(__name__)
+def create_async_groq_client():
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=GROQ_API_KEY, max_retries=0 if UPSTREAM_LIMITER else 2)
+
+async_groq_client = LazyProxy(create_async_groq_client, "async Groq client")
+
+# Mongo, Calendar and audio decoding stay synchronous and run here, off the event loop
+blocking_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # The copied context keeps spans recorded in the worker attached to this request
+    return await loop.run_in_executor(blocking_executor, functools.partial(contextvars.copy_context().run, func, *args, **kwargs))
+
+@async_app.before_request
+async def start_request_metrics():
+    g.request_start = time.perf_counter()
+    start_request()
+
+@async_app.after_request
+async def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint, status=response.status_code)
+    if SERVER_TIMING:
+        timing = server_timing()
+        if timing:
+            response.headers['Server-Timing'] = timing
+    return response
+
+@async_app.after_serving
+async def shutdown():
+    await close_async_client()
+    blocking_executor.shutdown(wait=False)
+
+async def execute_tool_call_async(function_name, function_args):
+    if function_name != "web_search":
+        return await run_blocking(execute_tool_call, function_name, function_args)
+
+    try:
+        if isinstance(function_args, str):
+            function_args = json.loads(function_args or "{}")
+        result = await web_search_async(**function_args, groq_client=async_groq_client)
+    except Exception as e:
+        logger.error(f"Error executing function {function_name}: {e}")
+        result = f"Sorry, there was an error: {str(e)}"
+        failed = True
+    else:
+        failed = False
+
+    web_link = result if isinstance(result, str) and result.startswith("https://") else None
+    return {
+        'llm_resp': result,
+        'event_link': None,
+        'web_link': web_link,
+        'auth_url': None,
+        'failed': failed
+    }
+
+async def run_tool_calls_async(tool_calls):
+    async def run_with_timeout(function_name, function_args):
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(execute_tool_call_async(function_name, function_args), tool_timeout(function_name))
+            outcome = tool_outcome(result)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool call {function_name} timed out.")
+            result = timed_out_tool_result(function_name)
+            outcome = "timeout"
+        record_tool(function_name, outcome, time.monotonic() - start)
+        return result
+
+    return await asyncio.gather(*(run_with_timeout(name, args) for name, args in tool_calls))
+
+async def process_chat_async(user_input):
+    intent = route_intent(user_input)
+    if intent:
+        return merge_tool_results(await run_tool_calls_async([(intent.name, intent.args)]))
+
+    cached = cached_response(user_input)
+    if cached:
+        return {
+            'llm_resp': cached,
+            'event_link': None,
+            'web_link': None,
+            'auth_url': None
+        }
+
+    try:
+        messages = await run_blocking(build_messages, user_input)
+        start = time.perf_counter()
+        with span("llm"):
+            response = await limited_call_async(
+                "groq",
+                async_groq_client.chat.completions.create,
+                messages=messages,
+                model="llama-3.3-70b-versatile",
+                temperature=0.5,
+                max_tokens=1024,
+                top_p=1,
+                stop=None,
+                stream=False,
+                tools=tool_definitions
+            )
+
+        intent_router.record_llm_latency(time.perf_counter() - start)
+        prompt_builder.record_usage(getattr(response, "usage", None))
+        assistant_message = response.choices[0].message
+        content = assistant_message.content
+        tool_calls = assistant_message.tool_calls
+
+        if tool_calls:
+            calls = [(call.function.name, call.function.arguments) for call in tool_calls]
+            return merge_tool_results(await run_tool_calls_async(calls))
+
+        final_response = parse_llm_content(content)
+        store_response(user_input, final_response)
+        return {
+            'llm_resp': final_response,
+            'event_link': None,
+            'web_link': None,
+            'auth_url': None
+        }
+
+    except Exception as e:
+        logger.error(f"Error in process_chat_async: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {
+            'llm_resp': error_response(e),
+            'event_link': None,
+            'web_link': None,
+            'auth_url': None
+        }
+
+async def llm_events_async(user_input, parser, native_calls, sentences=None, pipeline=None):
+    messages = await run_blocking(build_messages, user_input)
+    start = time.perf_counter()
+    stream = limited_stream_async(
+        "groq",
+        async_groq_client.chat.completions.create,
+        messages=messages,
+        model="llama-3.3-70b-versatile",
+        temperature=0.5,
+        max_tokens=1024,
+        top_p=1,
+        stop=None,
+        stream=True,
+        tools=tool_definitions
+    )
+
+    first_token = True
+    async for chunk in stream:
+        prompt_builder.record_usage(stream_usage(chunk))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        accumulate_tool_calls(native_calls, delta)
+
+        text = parser.feed(delta.content)
+        if text:
+            if first_token:
+                record_stage("llm_first_token", time.perf_counter() - start)
+                first_token = False
+            yield "token", {"text": text}
+            if pipeline is not None:
+                submit_sentences(pipeline, sentences.feed(text))
+        if pipeline is not None:
+            for event in audio_events(pipeline):
+                yield event
+
+    text = parser.finish()
+    if text:
+        yield "token", {"text": text}
+        if pipeline is not None:
+            submit_sentences(pipeline, sentences.feed(text))
+    record_stage("llm", time.perf_counter() - start)
+    intent_router.record_llm_latency(time.perf_counter() - start)
+
+async def chat_events_async(user_input, is_speech=False):
+    set_request_priority(turn_priority(is_speech))
+    parser = ResponseStreamParser()
+    native_calls = {}
+    resp = None
+    # Text that was never streamed as tokens (tool output, cached and fallback answers) is spoken as a whole
+    reply = None
+    sentences = SentenceBuffer() if is_speech else None
+    pipeline = AsyncSpeechPipeline() if is_speech else None
+
+    try:
+        intent = route_intent(user_input)
+        cached = cached_response(user_input) if not intent else None
+        if intent:
+            tool_calls = [(intent.name, intent.args)]
+        elif cached:
+            tool_calls = []
+            yield "token", {"text": cached}
+        else:
+            async for event in llm_events_async(user_input, parser, native_calls, sentences, pipeline):
+                yield event
+            tool_calls = streamed_tool_calls(native_calls, parser)
+
+        if tool_calls:
+            results = await run_tool_calls_async(tool_calls)
+            for (function_name, _), result in zip(tool_calls, results):
+                yield "tool", {"name": function_name, "response": result.get('llm_resp'), **response_links(result)}
+            resp = merge_tool_results(results)
+            reply = resp.get('llm_resp') or ""
+        elif cached:
+            resp = {'llm_resp': cached}
+            reply = cached
+        else:
+            final_response = parser.text.strip()
+            if not final_response:
+                final_response = parse_llm_content(parser.raw)
+                reply = final_response
+                yield "token", {"text": final_response}
+            resp = {'llm_resp': final_response}
+            store_response(user_input, final_response)
+
+        links = response_links(resp)
+        if links:
+            yield "links", links
+
+        if is_speech:
+            finish_speech(pipeline, sentences, reply)
+            async for seq, audio in pipeline.drain_async():
+                if audio:
+                    yield "audio", {"seq": seq, "audio": base64.b64encode(audio).decode('utf-8')}
+
+    except Exception as e:
+        logger.error(f"Error in chat_events_async: {str(e)}")
+        logger.error(traceback.format_exc())
+        resp = {'llm_resp': error_response(e)}
+        yield "error", {"message": resp['llm_resp']}
+
+    finally:
+        final_response = resp.get('llm_resp') if resp else parser.text.strip()
+        if final_response:
+            with span("history_write"):
+                await run_blocking(history_manager.add_message, "assistant", final_response)
+
+    yield "done", {"response": resp.get('llm_resp')}
+
+async def stream_chat_async(user_input, is_speech=False):
+    async for event, data in chat_events_async(user_input, is_speech):
+        yield sse_event(event, data)
+
+@async_app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        user_input = data['message']
+        is_speech = data.get('is_speech', False)
+        logger.info(f"Received message: {user_input}, is_speech: {is_speech}")
+        set_request_priority(turn_priority(is_speech))
+
+        with span("history_write"):
+            await run_blocking(history_manager.add_message, "user", user_input)
+
+        resp = await process_chat_async(user_input)
+
+        final_response = resp.get('llm_resp', '')
+
+        with span("history_write"):
+            await run_blocking(history_manager.add_message, "assistant", final_response)
+
+        response_data = {
+            'response': final_response
+        }
+
+        if is_speech:
+            audio_bytes = await synthesize_async(final_response)
+            # In shared worker mode publishing writes the clip to MongoDB
+            audio_id = await run_blocking(publish_audio, audio_bytes) if audio_bytes else None
+            if audio_id:
+                response_data['audio_url'] = audio_url(audio_id)
+
+        response_data.update(response_links(resp))
+
+        return jsonify(response_data), 200
+
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': str(e),
+            'response': 'I apologize, but I encountered an error processing your request.'
+        }), 500
+
+@async_app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    try:
+        data = await request.get_json()
+        user_input = data['message']
+        is_speech = data.get('is_speech', False)
+        logger.info(f"Received streaming message: {user_input}, is_speech: {is_speech}")
+
+        with span("history_write"):
+            await run_blocking(history_manager.add_message, "user", user_input)
+
+        response = Response(
+            stream_chat_async(user_input, is_speech),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        response.timeout = None
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in chat_stream endpoint: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': str(e),
+            'response': 'I apologize, but I encountered an error processing your request.'
+        }), 500
+
+@async_app.route('/api/speech-to-text', methods=['POST'])
+async def speech_to_text():
+    try:
+        files = await request.files
+        audio_file = files['audio']
+
+        set_request_priority(PRIORITY_VOICE)
+        wav_bytes = await run_blocking(convert_to_wav, audio_file.read())
+        output = await transcribe_async(wav_bytes)
+
+        if "text" in output:
+            return jsonify({'transcription': output['text']})
+        else:
+            raise ValueError(f"Unexpected API response: {output}")
+    except UpstreamBusy as e:
+        logger.warning(f"Error in speech_to_text endpoint: {e}")
+        return jsonify({'error': BUSY_RESPONSE}), 503
+    except Exception as e:
+        logger.error(f"Error in speech_to_text endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+async def send_json(message_type, data=None):
+    await websocket.send(json.dumps({"type": message_type, **(data or {})}))
+
+async def send_partial(call_session, wav_bytes):
+    try:
+        text = transcript_text(await transcribe_async(wav_bytes))
+    except Exception as e:
+        logger.debug(f"Partial transcription failed: {e}")
+        return
+    text = call_session.add_partial(text) if text else None
+    if text:
+        await send_json("partial", {"text": text})
+
+async def run_call_turn(wav_bytes, is_speech, previous=None):
+    if previous is not None:
+        # Turns of a call run in order; an interrupted one finishes its cleanup first
+        await asyncio.wait([previous])
+    try:
+        user_input = transcript_text(await transcribe_async(wav_bytes))
+    except Exception as e:
+        logger.error(f"Error transcribing call audio: {str(e)}")
+        await send_json("error", {"message": str(e)})
+        return
+    await send_json("final", {"text": user_input})
+    if not user_input:
+        return
+
+    logger.info(f"Received call turn: {user_input}")
+    with span("history_write"):
+        await run_blocking(history_manager.add_message, "user", user_input)
+    async for event, data in chat_events_async(user_input, is_speech):
+        await send_json(event, data)
+
+@async_app.websocket('/api/call')
+async def call():
+    # Turns run as tasks so audio keeps being received; speech during a reply cancels it
+    call_session = CallSession()
+    is_speech = True
+    set_request_priority(PRIORITY_VOICE)
+    partial = None
+    turn = None
+
+    try:
+        while True:
+            message = await websocket.receive()
+
+            if isinstance(message, str):
+                control = json.loads(message)
+                if control.get("type") == "start":
+                    call_session = CallSession(int(control.get("sample_rate", call_session.sample_rate)))
+                    is_speech = control.get("speech", True)
+                elif control.get("type") == "stop":
+                    break
+                continue
+
+            for event in call_session.feed(message):
+                if event == "speech_start":
+                    await send_json("speech_start")
+                    if turn is not None and not turn.done():
+                        turn.cancel()
+                        await send_json("interrupted")
+                elif event == "partial" and (partial is None or partial.done()):
+                    partial = asyncio.create_task(send_partial(call_session, call_session.take_partial_audio()))
+                elif event == "end_of_turn":
+                    if partial is not None:
+                        partial.cancel()
+                        partial = None
+                    turn = asyncio.create_task(run_call_turn(call_session.take_utterance(), is_speech, turn))
+    finally:
+        for task in (partial, turn):
+            if task is not None:
+                task.cancel()
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan" or scope.get("path") in ASYNC_ROUTES:
+        await async_app(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
@@ -0,0 +1,77 @@
+"""Compares the old BeautifulSoup get_text() extraction with MainContentExtractor.
+
+Usage:
+    python -m benchmarks.bench_html_extract --corpus path/to/saved_pages [--repeat 5]
+
+The corpus is a directory of saved .html/.htm files. Without --corpus a
+small synthetic corpus is generated so the script still runs.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from utils.html_extract import extract_main_text
+
+PAGE_CHAR_BUDGET = 4000
+
+def load_corpus(path):
+    pages = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith((".html", ".htm")):
+            with open(os.path.join(path, name), "rb") as f:
+                pages.append((name, f.read().decode("utf-8", errors="replace")))
+    return pages
+
+def synthetic_corpus(count=20):
+    boilerplate = "<nav>" + "".join(f"<a href='/{i}'>Link {i}</a>" for i in range(200)) + "</nav>"
+    script = "<script>" + "var x = 1;" * 5000 + "</script>"
+    pages = []
+    for n in range(count):
+        body = "".join(f"<p>Paragraph {i} of page {n} with some representative article text.</p>" for i in range(500 * (n % 5 + 1)))
+        pages.append((f"synthetic-{n}.html", f"<html><head>{script}<style>p{{}}</style></head><body>{boilerplate}<main>{body}</main><footer>footer</footer></body></html>"))
+    return pages
+
+def baseline(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.get_text()[:PAGE_CHAR_BUDGET]
+
+def fast(html):
+    return extract_main_text(html, max_chars=PAGE_CHAR_BUDGET)
+
+def time_extractor(func, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html in pages:
+            func(html)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of saved HTML pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        sys.exit(f"No .html files found in {args.corpus}")
+    total_bytes = sum(len(html) for _, html in pages)
+    print(f"{len(pages)} pages, {total_bytes / 1024:.0f} KiB total, {args.repeat} runs")
+
+    results = {}
+    for name, func in (("bs4 get_text", baseline), ("MainContentExtractor", fast)):
+        timings = time_extractor(func, pages, args.repeat)
+        results[name] = statistics.median(timings)
+        per_page = results[name] / len(pages) * 1000
+        print(f"{name:<22} median {results[name] * 1000:8.1f} ms total  {per_page:7.2f} ms/page")
+
+    print(f"speedup: {results['bs4 get_text'] / results['MainContentExtractor']:.1f}x")
+
+if __name__ == "__main__":
+    main()
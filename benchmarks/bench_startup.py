@@ -0,0 +1,101 @@
+"""Measures cold start of the app under each STARTUP_INIT mode.
+
+Every run starts a fresh `python -X importtime` app process against the
+local service stand-ins of benchmarks.fake_services and records:
+
+  import     cumulative import time of the app module (from -X importtime)
+  listening  process start until the port accepts connections
+  first chat process start until the first /api/chat response arrives
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--modes eager,background,lazy] [--mongodb-uri URI]
+
+Without --mongodb-uri MongoDB is replaced by mongomock, which imports
+pymongo before the app does, so pymongo's import cost and the network
+round trips of the database bootstrap only show up with a real URI.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import add_arguments
+from benchmarks.loadtest import start_fake_services, start_app, stop_processes, wait_for_port
+
+def parse_importtime(path, top=5):
+    """Returns (app cumulative ms, [(module, cumulative ms)] of the app's heaviest direct imports)."""
+    app_us, children = None, []
+    lines = []
+    with open(path, errors="replace") as f:
+        for line in f:
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+            lines.append((int(cumulative), name.rstrip("\n")[1:]))
+
+    # importtime prints children before their parent, indented two spaces deeper
+    for index, (cumulative, name) in enumerate(lines):
+        if name.strip() == "app":
+            app_us, app_indent = cumulative, len(name) - len(name.lstrip())
+            for child_cumulative, child_name in reversed(lines[:index]):
+                indent = len(child_name) - len(child_name.lstrip())
+                if indent <= app_indent:
+                    break
+                if indent == app_indent + 2:
+                    children.append((child_name.strip(), child_cumulative / 1000))
+            break
+    children.sort(key=lambda item: item[1], reverse=True)
+    return (app_us / 1000 if app_us is not None else None), children[:top]
+
+def run_once(mode, fake_url, mongodb_uri):
+    with tempfile.NamedTemporaryFile(suffix=".log", delete=False) as log:
+        log_path = log.name
+    with open(log_path, "w") as output:
+        start = time.perf_counter()
+        base_url, port, process = start_app(fake_url, mongodb_uri, output=output, env={"STARTUP_INIT": mode}, python_args=("-X", "importtime"))
+        try:
+            wait_for_port(port, process)
+            listening = time.perf_counter() - start
+            response = requests.post(f"{base_url}/api/chat", json={"message": "hello there"}, timeout=60)
+            first_chat = time.perf_counter() - start
+            response.raise_for_status()
+        finally:
+            stop_processes(process)
+    app_ms, heaviest = parse_importtime(log_path)
+    os.remove(log_path)
+    return {"import": app_ms, "listening": listening * 1000, "first_chat": first_chat * 1000, "heaviest": heaviest}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="eager,background,lazy")
+    parser.add_argument("--mongodb-uri", help="use a real MongoDB instead of mongomock")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake_url, fake_port, fakes = start_fake_services(args)
+    try:
+        wait_for_port(fake_port, fakes)
+        for mode in [mode.strip() for mode in args.modes.split(",") if mode.strip()]:
+            runs = [run_once(mode, fake_url, args.mongodb_uri) for _ in range(args.runs)]
+            imports = [run["import"] for run in runs if run["import"] is not None]
+            print(
+                f"{mode:<11} import p50 {statistics.median(imports) if imports else float('nan'):7.1f} ms  "
+                f"listening p50 {statistics.median(run['listening'] for run in runs):7.1f} ms  "
+                f"first chat p50 {statistics.median(run['first_chat'] for run in runs):7.1f} ms"
+            )
+            # Not available in background mode, where the warm-up thread's imports interleave with the app's
+            if runs[-1]["heaviest"]:
+                heaviest = ", ".join(f"{name} {ms:.0f} ms" for name, ms in runs[-1]["heaviest"])
+                print(f"{'':<11} heaviest imports: {heaviest}")
+    finally:
+        stop_processes(fakes)
+
+if __name__ == "__main__":
+    main()
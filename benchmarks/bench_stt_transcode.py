@@ -0,0 +1,94 @@
+"""Measures per-request latency and peak memory of the /api/speech-to-text audio conversion.
+
+Compares the previous temp-file + pydub pipeline with the in-memory
+ffmpeg pipe used by services.speech_service.convert_to_wav.
+
+Usage:
+    python -m benchmarks.bench_stt_transcode --input recording.webm [--runs 10]
+
+Without --input a 10 second 48 kHz stereo Opus clip is generated with
+ffmpeg. Both paths need ffmpeg on PATH; the legacy path also needs pydub.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.speech_service import convert_to_wav
+
+def legacy_convert(audio_bytes):
+    from pydub import AudioSegment
+
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
+            temp_file.write(audio_bytes)
+            temp_filename = temp_file.name
+
+        audio = AudioSegment.from_file(temp_filename)
+        output_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
+        audio = audio.set_frame_rate(16000)
+        audio = audio.set_channels(1)
+        audio = audio.set_sample_width(2)
+        audio.export(output_wav, format='wav')
+
+        with open(output_wav, "rb") as f:
+            return f.read()
+    finally:
+        if 'temp_filename' in locals():
+            os.remove(temp_filename)
+        if 'output_wav' in locals():
+            os.remove(output_wav)
+
+def generate_clip(seconds=10):
+    with tempfile.NamedTemporaryFile(suffix='.webm') as clip:
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+             "-ac", "2", "-ar", "48000", "-c:a", "libopus", clip.name],
+            check=True
+        )
+        with open(clip.name, "rb") as f:
+            return f.read()
+
+def measure(func, audio_bytes, runs):
+    timings, peaks = [], []
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(audio_bytes)
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return timings, peaks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="recorded audio file (webm/ogg/wav/...)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            audio_bytes = f.read()
+    else:
+        audio_bytes = generate_clip()
+    print(f"input {len(audio_bytes) / 1024:.0f} KiB, {args.runs} runs")
+
+    for name, func in (("temp files + pydub", legacy_convert), ("in-memory ffmpeg pipe", convert_to_wav)):
+        try:
+            timings, peaks = measure(func, audio_bytes, args.runs)
+        except (ImportError, OSError) as e:
+            print(f"{name:<22} skipped ({e})")
+            continue
+        print(
+            f"{name:<22} p50 {statistics.median(timings) * 1000:7.1f} ms  "
+            f"max {max(timings) * 1000:7.1f} ms  peak python memory {max(peaks) / 1024:8.0f} KiB"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Local stand-ins for Groq, ElevenLabs, Hugging Face Whisper, Google CSE and result pages.
+
+Each service answers after a configurable latency (plus jitter), fails
+with a 503 at a configurable rate and returns payloads of a configurable
+size, so the app can be load-tested without network access or API keys.
+--groq-max-concurrency emulates a provider rate limit: requests beyond
+that many in flight get a 429 with Retry-After.
+
+Usage:
+    python -m benchmarks.fake_services --port 8900 [--groq-latency-ms 400 ...]
+
+benchmarks.loadtest starts this automatically; run it by hand to point a
+dev server at it through GROQ_BASE_URL, ELEVENLABS_API_BASE,
+WHISPER_API_URL and CUSTOM_SEARCH_ENDPOINT.
+"""
+import argparse
+import base64
+import json
+import random
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ANSWER = "Here is a short, self-contained answer to your question. It covers the main points in a few sentences. Let me know if you want more detail."
+WORDS = "the quick brown fox jumps over the lazy dog while researchers measure latency across every subsystem".split()
+
+def add_arguments(parser):
+    for service, latency in (("groq", 400), ("tts", 250), ("stt", 500), ("search", 150), ("page", 100)):
+        parser.add_argument(f"--{service}-latency-ms", type=float, default=latency)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--token-delay-ms", type=float, default=5, help="delay between streamed Groq chunks")
+    parser.add_argument("--page-kb", type=int, default=200, help="size of each search result page")
+    parser.add_argument("--tts-kb", type=int, default=60, help="audio bytes returned per TTS request")
+    parser.add_argument("--groq-max-concurrency", type=int, default=0, help="answer 429 beyond this many concurrent Groq requests (0: unlimited)")
+
+def profile_args(args):
+    """Turns parsed arguments back into a command line for the fake services process."""
+    argv = []
+    for name in ("groq_latency_ms", "tts_latency_ms", "stt_latency_ms", "search_latency_ms", "page_latency_ms",
+                 "jitter", "error_rate", "token_delay_ms", "page_kb", "tts_kb", "groq_max_concurrency"):
+        argv += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return argv
+
+def filler_html(size):
+    paragraph = "<p>" + " ".join(random.choice(WORDS) for _ in range(60)) + ".</p>"
+    body = paragraph * max(1, size // len(paragraph))
+    return f"<html><head><title>Result</title><script>var x=1;</script></head><body><nav>menu</nav><main>{body}</main></body></html>"
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile = None
+    groq_in_flight = 0
+    groq_rejected = 0
+    groq_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def wait(self, service):
+        latency = getattr(self.profile, f"{service}_latency_ms") / 1000
+        time.sleep(max(0, latency * (1 + random.uniform(-self.profile.jitter, self.profile.jitter))))
+
+    def failed(self):
+        if random.random() < self.profile.error_rate:
+            self.send_json({"error": "injected failure"}, status=503)
+            return True
+        return False
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunked(self, content_type, chunks, delay=0):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        path = urlparse(self.path)
+        if path.path.endswith("/customsearch/v1"):
+            self.wait("search")
+            if self.failed():
+                return
+            query = parse_qs(path.query).get("q", [""])[0]
+            num = int(parse_qs(path.query).get("num", ["3"])[0])
+            host = self.headers.get("Host")
+            items = [{
+                "title": f"Result {i + 1} for {query}",
+                "link": f"http://{host}/page/{i + 1}?q={query}",
+                "snippet": f"Snippet {i + 1} about {query}."
+            } for i in range(num)]
+            self.send_json({"items": items})
+        elif path.path.startswith("/page/"):
+            self.wait("page")
+            if self.failed():
+                return
+            body = filler_html(self.profile.page_kb * 1024).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_body()
+        if path.endswith("/chat/completions"):
+            self.chat_completion(json.loads(body or b"{}"))
+        elif "/text-to-speech/" in path:
+            self.wait("tts")
+            if self.failed():
+                return
+            audio = random.randbytes(self.profile.tts_kb * 1024) if hasattr(random, "randbytes") else bytes(self.profile.tts_kb * 1024)
+            step = 8192
+            lines = [json.dumps({"audio_base64": base64.b64encode(audio[i:i + step]).decode()}).encode() + b"\n" for i in range(0, len(audio), step)]
+            self.send_chunked("application/json", lines)
+        elif path.endswith("/whisper") or "whisper" in path:
+            self.wait("stt")
+            if self.failed():
+                return
+            self.send_json({"text": "what is the tallest mountain in the world"})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def chat_completion(self, request):
+        ceiling = self.profile.groq_max_concurrency
+        cls = FakeServiceHandler
+        with cls.groq_lock:
+            if ceiling and cls.groq_in_flight >= ceiling:
+                cls.groq_rejected += 1
+                rejected = True
+            else:
+                cls.groq_in_flight += 1
+                rejected = False
+        if rejected:
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        try:
+            self.complete(request)
+        finally:
+            with cls.groq_lock:
+                cls.groq_in_flight -= 1
+
+    def complete(self, request):
+        self.wait("groq")
+        if self.failed():
+            return
+        messages = request.get("messages", [])
+        user_input = messages[-1]["content"] if messages else ""
+        model = request.get("model", "fake")
+
+        tool_call = None
+        if request.get("tools") and "search the web" in user_input.lower():
+            tool_call = {"id": "call_0", "type": "function", "function": {"name": "web_search", "arguments": json.dumps({"query": user_input})}}
+            content = None
+        elif request.get("max_tokens") == 50:
+            content = "1"
+        elif not request.get("tools"):
+            content = ANSWER * 3
+        else:
+            content = json.dumps({"response": ANSWER})
+
+        usage = {"prompt_tokens": sum(len(m.get("content") or "") for m in messages) // 4, "completion_tokens": len(content or "") // 4, "total_tokens": 0}
+        if request.get("stream"):
+            self.stream_completion(model, content, tool_call, usage)
+            return
+
+        message = {"role": "assistant", "content": content}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        self.send_json({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": usage
+        })
+
+    def stream_completion(self, model, content, tool_call, usage):
+        def chunk(delta, finish_reason=None, extra=None):
+            payload = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **(extra or {})}
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        events = []
+        if tool_call:
+            events.append(chunk({"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}))
+        else:
+            for i in range(0, len(content), 12):
+                events.append(chunk({"content": content[i:i + 12]}))
+        events.append(chunk({}, "tool_calls" if tool_call else "stop", {"x_groq": {"id": "fake", "usage": usage}}))
+        events.append(b"data: [DONE]\n\n")
+        self.send_chunked("text/event-stream", events, delay=self.profile.token_delay_ms / 1000)
+
+
+def serve(args, port):
+    FakeServiceHandler.profile = args
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeServiceHandler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = serve(args, args.port)
+    print(f"fake services listening on http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Offline load test of the API against local stand-ins for every external service.
+
+Starts benchmarks.fake_services and the Flask app as subprocesses, points
+the app at the fakes through GROQ_BASE_URL, ELEVENLABS_API_BASE,
+WHISPER_API_URL and CUSTOM_SEARCH_ENDPOINT, then drives a mix of
+scenarios at a fixed concurrency and reports throughput and latency
+percentiles (time to first byte and total) per scenario.
+
+Usage:
+    python -m benchmarks.loadtest [--requests 200] [--concurrency 8] [--scenarios chat,chat_stream,...]
+    python -m benchmarks.loadtest --output run.json
+    python -m benchmarks.loadtest --baseline run.json [--tolerance 0.2]
+
+Scenarios: chat, chat_stream, chat_speech, chat_stream_speech, chat_search,
+stt, history, static. chat_speech is the JSON voice turn (/api/chat with
+is_speech, then the reply audio from its audio_url); chat_stream_speech
+is the streamed one. MongoDB is replaced by mongomock (install
+requirements-dev.txt) unless --mongodb-uri is given. The app runs with
+the disk speech cache off, so fake audio never lands in the real
+TTS_CACHE_DIR. The stt
+scenario needs ffmpeg on PATH. Google Calendar needs OAuth and is not
+exercised. With --baseline the run exits with status 1 when any
+scenario's p95 total latency or error rate is worse than the baseline by
+more than the tolerance.
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_services import add_arguments, profile_args
+
+SCENARIOS = ("chat", "chat_stream", "chat_speech", "chat_stream_speech", "chat_search", "stt", "history", "static")
+DEFAULT_SCENARIOS = "chat,chat_stream,chat_speech,chat_stream_speech,chat_search,history,static"
+QUESTIONS = [
+    "explain how photosynthesis works",
+    "give me three tips for better sleep",
+    "what is the difference between a list and a tuple in python",
+    "summarize the plot of hamlet",
+    "how do vaccines train the immune system",
+]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with status {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+def speech_wav(seconds=2, sample_rate=16000):
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)))
+        for i in range(seconds * sample_rate)
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+def serve_app(port, mongodb_uri):
+    """Runs app.app in this process; used as the app subprocess."""
+    if not mongodb_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install -r requirements-dev.txt, or pass --mongodb-uri")
+        import database.mongodb
+        database.mongodb.MongoClient = lambda uri, **kwargs: mongomock.MongoClient()
+    os.chdir(ROOT)
+    from werkzeug.serving import make_server
+    from app import app
+
+    print(f"app listening on http://127.0.0.1:{port}", flush=True)
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+def start_fake_services(args, output=subprocess.DEVNULL):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_services", "--port", str(port)] + profile_args(args),
+        cwd=ROOT, stdout=output, stderr=output
+    )
+    return f"http://127.0.0.1:{port}", port, process
+
+def start_app(fake_url, mongodb_uri=None, output=subprocess.DEVNULL, env=None, python_args=()):
+    """Starts the app against the fake services without waiting for it to listen."""
+    port = free_port()
+    app_env = dict(
+        os.environ,
+        GROQ_BASE_URL=fake_url,
+        GROQ_API_KEY="loadtest",
+        ELEVENLABS_API_BASE=fake_url,
+        ELEVENLABS_API_KEY="loadtest",
+        WHISPER_API_URL=f"{fake_url}/whisper",
+        HUGGING_FACE_INFERENCEAPI="loadtest",
+        CUSTOM_SEARCH_ENDPOINT=fake_url + "/",
+        GOOGLE_API_KEY="loadtest",
+        GOOGLE_CSE_ID="loadtest",
+        MONGODB_URI=mongodb_uri or "mongodb://loadtest",
+        # Fake audio must not be cached under keys the real app would look up
+        VOICE_ID="loadtest",
+        TTS_CACHE_DISK_BYTES="0",
+        **(env or {})
+    )
+    process = subprocess.Popen(
+        [sys.executable, *python_args, "-m", "benchmarks.loadtest", "--serve", str(port)] + (["--mongodb-uri", mongodb_uri] if mongodb_uri else []),
+        cwd=ROOT, env=app_env, stdout=output, stderr=output
+    )
+    return f"http://127.0.0.1:{port}", port, process
+
+def start_processes(args):
+    output = None if args.verbose else subprocess.DEVNULL
+    fake_url, fake_port, fakes = start_fake_services(args, output)
+    base_url, app_port, server = start_app(fake_url, args.mongodb_uri, output)
+    try:
+        wait_for_port(fake_port, fakes)
+        wait_for_port(app_port, server)
+    except Exception:
+        stop_processes(fakes, server)
+        raise
+    return base_url, (fakes, server)
+
+def stop_processes(*processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class LoadTest:
+    def __init__(self, base_url, unique_queries):
+        self.base_url = base_url
+        self.unique_queries = unique_queries
+        self.counter = itertools.count()
+        self.local = threading.local()
+        self.wav = speech_wav()
+        self.static_paths = ["/"] + self.asset_paths()
+
+    @property
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def asset_paths(self):
+        try:
+            manifest = requests.get(f"{self.base_url}/asset-manifest.json", timeout=10).json()
+            return ["/" + path.lstrip("./") for path in manifest.get("entrypoints", [])]
+        except (requests.RequestException, ValueError):
+            return []
+
+    def question(self):
+        n = next(self.counter)
+        question = QUESTIONS[n % len(QUESTIONS)]
+        return f"{question} (variant {n})" if self.unique_queries else question
+
+    def timed(self, method, path, stream=False, **kwargs):
+        """Returns (ok, ttfb_seconds, total_seconds)."""
+        start = time.perf_counter()
+        with self.session.request(method, self.base_url + path, stream=True, timeout=120, **kwargs) as response:
+            ttfb = None
+            for chunk in response.iter_content(chunk_size=None):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if stream and b"event: error" in chunk:
+                    return False, ttfb, time.perf_counter() - start
+            total = time.perf_counter() - start
+            return response.ok, ttfb if ttfb is not None else total, total
+
+    def chat(self):
+        return self.timed("POST", "/api/chat", json={"message": self.question()})
+
+    def chat_stream(self):
+        return self.timed("POST", "/api/chat/stream", stream=True, json={"message": self.question()})
+
+    def chat_speech(self):
+        start = time.perf_counter()
+        response = self.session.post(self.base_url + "/api/chat", json={"message": self.question(), "is_speech": True}, timeout=120)
+        audio_url = response.json().get("audio_url") if response.ok else None
+        if not audio_url:
+            return False, None, None
+        ok, _, _ = self.timed("GET", audio_url)
+        ttfb = response.elapsed.total_seconds()
+        return ok, ttfb, time.perf_counter() - start
+
+    def chat_stream_speech(self):
+        return self.timed("POST", "/api/chat/stream", stream=True, json={"message": self.question(), "is_speech": True})
+
+    def chat_search(self):
+        return self.timed("POST", "/api/chat/stream", stream=True, json={"message": f"search the web for {self.question()}"})
+
+    def stt(self):
+        return self.timed("POST", "/api/speech-to-text", files={"audio": ("speech.wav", self.wav, "audio/wav")})
+
+    def history(self):
+        return self.timed("GET", "/api/conversation_history")
+
+    def static(self):
+        path = self.static_paths[next(self.counter) % len(self.static_paths)]
+        return self.timed("GET", path)
+
+    def run(self, scenario, total_requests, concurrency):
+        action = getattr(self, scenario)
+
+        def one(_):
+            try:
+                return action()
+            except (requests.RequestException, ValueError):
+                return False, None, None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(one, range(total_requests)))
+        return summarize(results, time.perf_counter() - start)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+def latency_summary(values):
+    if not values:
+        return None
+    return {
+        "mean": round(statistics.mean(values) * 1000, 1),
+        "p50": round(percentile(values, 0.50) * 1000, 1),
+        "p95": round(percentile(values, 0.95) * 1000, 1),
+        "p99": round(percentile(values, 0.99) * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+    }
+
+def summarize(results, duration):
+    ok = [result for result in results if result[0]]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else 0,
+        "duration_s": round(duration, 2),
+        "throughput_rps": round(len(results) / duration, 2) if duration else 0,
+        "ttfb_ms": latency_summary([ttfb for _, ttfb, _ in ok]),
+        "total_ms": latency_summary([total for _, _, total in ok]),
+    }
+
+def print_report(report):
+    print(f"{'scenario':<18} {'reqs':>5} {'err':>4} {'rps':>7} {'ttfb p50':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for scenario, result in report["scenarios"].items():
+        ttfb, total = result["ttfb_ms"] or {}, result["total_ms"] or {}
+        print(
+            f"{scenario:<18} {result['requests']:>5} {result['errors']:>4} {result['throughput_rps']:>7.2f} "
+            f"{ttfb.get('p50', 0):>9.1f} {total.get('p50', 0):>8.1f} {total.get('p95', 0):>8.1f} "
+            f"{total.get('p99', 0):>8.1f} {total.get('max', 0):>8.1f}"
+        )
+
+def regressions(report, baseline, tolerance):
+    found = []
+    for scenario, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        if result["error_rate"] > previous["error_rate"] + tolerance * max(previous["error_rate"], 0.01):
+            found.append(f"{scenario}: error rate {result['error_rate']} vs {previous['error_rate']}")
+        if result["total_ms"] and previous["total_ms"]:
+            p95, previous_p95 = result["total_ms"]["p95"], previous["total_ms"]["p95"]
+            if p95 > previous_p95 * (1 + tolerance):
+                found.append(f"{scenario}: p95 {p95} ms vs {previous_p95} ms")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--unique-queries", action="store_true", help="make every chat message distinct (defeats response caching)")
+    parser.add_argument("--mongodb-uri", help="use a real MongoDB instead of mongomock")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression against --baseline")
+    parser.add_argument("--verbose", action="store_true", help="show output of the app and fake services")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_app(args.serve, args.mongodb_uri)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    base_url, processes = start_processes(args)
+    try:
+        load_test = LoadTest(base_url, args.unique_queries)
+        report = {
+            "config": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "unique_queries": args.unique_queries,
+                "fake_services": profile_args(args),
+            },
+            "scenarios": {}
+        }
+        for scenario in scenarios:
+            report["scenarios"][scenario] = load_test.run(scenario, args.requests, args.concurrency)
+    finally:
+        stop_processes(*processes)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,123 @@ GOOGLE_CALENDAR_CREDENTIALS = os.getenv('GOOGLE_CALENDAR_CREDENTIALS')
 MONGODB_URI = os.getenv('MONGODB_URI')
 HUGGING_FACE_INFERENCEAPI = os.getenv('HUGGING_FACE_INFERENCEAPI')
 
+# Service Endpoints (overridable for proxies and the offline load test)
+ELEVENLABS_API_BASE = os.getenv('ELEVENLABS_API_BASE', 'https://api.elevenlabs.io')
+WHISPER_API_URL = os.getenv('WHISPER_API_URL', 'https://api-inference.huggingface.co/models/openai/whisper-large-v3')
+CUSTOM_SEARCH_ENDPOINT = os.getenv('CUSTOM_SEARCH_ENDPOINT', 'https://customsearch.googleapis.com/')
+
 # Google Calendar Settings
 SCOPES = "https://www.googleapis.com/auth/calendar"
 TOKEN_FILE = "token.json"
-CREDENTIALS_FILE = "credentials.json" 
\ No newline at end of file
+CREDENTIALS_FILE = "credentials.json"
+TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', 300))
+CALENDAR_SYNC_INTERVAL = int(os.getenv('CALENDAR_SYNC_INTERVAL', 30))
+
+# Worker Mode Settings
+# "single" keeps the Calendar credentials in token.json and caches in process memory. "shared" keeps
+# them in MongoDB, along with reply audio and the web search cache, so several workers or replicas
+# can serve behind a load balancer; every worker then needs the same SECRET_KEY.
+WORKER_MODE = os.getenv('WORKER_MODE', 'single')
+SECRET_KEY = os.getenv('SECRET_KEY')
+# How long a worker trusts its in-memory copy of the shared credentials
+CREDENTIALS_CACHE_TTL = int(os.getenv('CREDENTIALS_CACHE_TTL', 30))
+
+# Startup Settings
+# "lazy" creates clients and runs the MongoDB bootstrap on first use, "background" starts that
+# in a thread right after import, "eager" does it during import
+STARTUP_INIT = os.getenv('STARTUP_INIT', 'background')
+
+# Conversation Storage Settings
+# "day" keeps one document per day (append-only), "message" stores one document per message
+CONVERSATION_STORAGE = os.getenv('CONVERSATION_STORAGE', 'day')
+MAX_DAY_MESSAGES = int(os.getenv('MAX_DAY_MESSAGES', 1000))
+# /api/conversation_history pages; the latest page is cached until the next message is added
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 100))
+HISTORY_CACHE_SIZE = int(os.getenv('HISTORY_CACHE_SIZE', 16))
+HISTORY_CACHE_TTL = int(os.getenv('HISTORY_CACHE_TTL', 60))
+
+# Prompt Settings
+# History is trimmed newest-first to fit PROMPT_CONTEXT_TOKENS
+PROMPT_CONTEXT_TOKENS = int(os.getenv('PROMPT_CONTEXT_TOKENS', 1500))
+PROMPT_CONTEXT_MAX_MESSAGES = int(os.getenv('PROMPT_CONTEXT_MAX_MESSAGES', 40))
+
+# Intent Fast Path Settings
+INTENT_FAST_PATH = os.getenv('INTENT_FAST_PATH', 'true').lower() == 'true'
+INTENT_MIN_CONFIDENCE = float(os.getenv('INTENT_MIN_CONFIDENCE', 0.7))
+
+# Response Cache Settings
+# Opt-in cache of answers to general questions that don't depend on time or user data
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'false').lower() == 'true'
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 86400))
+
+# Tool Call Settings
+TOOL_CALL_WORKERS = int(os.getenv('TOOL_CALL_WORKERS', 8))
+TOOL_CALL_TIMEOUT = int(os.getenv('TOOL_CALL_TIMEOUT', 15))
+WEB_SEARCH_TOOL_TIMEOUT = int(os.getenv('WEB_SEARCH_TOOL_TIMEOUT', 30))
+
+# Upstream Limiter Settings
+# Concurrent calls per provider (Groq, ElevenLabs, Hugging Face, Google CSE) start at the initial
+# limit, grow by one per round of successes, halve on 429/503 responses and shrink on timeouts
+UPSTREAM_LIMITER = os.getenv('UPSTREAM_LIMITER', 'true').lower() == 'true'
+UPSTREAM_INITIAL_CONCURRENCY = int(os.getenv('UPSTREAM_INITIAL_CONCURRENCY', 8))
+UPSTREAM_MIN_CONCURRENCY = int(os.getenv('UPSTREAM_MIN_CONCURRENCY', 1))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', 64))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', 30))
+UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', 3))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv('UPSTREAM_RETRY_BASE_DELAY', 0.5))
+# A longer Retry-After is not waited for; the call fails with a "busy" reply instead
+UPSTREAM_MAX_RETRY_DELAY = float(os.getenv('UPSTREAM_MAX_RETRY_DELAY', 10))
+
+# Web Search Settings
+# "concurrent" fetches every candidate page in parallel, "ranked" downloads only the LLM-picked result
+WEB_SEARCH_MODE = os.getenv('WEB_SEARCH_MODE', 'concurrent')
+WEB_FETCH_WORKERS = int(os.getenv('WEB_FETCH_WORKERS', 8))
+WEB_FETCH_TIMEOUT = float(os.getenv('WEB_FETCH_TIMEOUT', 5))
+WEB_FETCH_MAX_BYTES = int(os.getenv('WEB_FETCH_MAX_BYTES', 1048576))
+WEB_SEARCH_DEADLINE = float(os.getenv('WEB_SEARCH_DEADLINE', 8))
+
+# Web Search Cache Settings (TTLs in seconds)
+WEB_CACHE_SIZE = int(os.getenv('WEB_CACHE_SIZE', 256))
+WEB_CACHE_SHARED = os.getenv('WEB_CACHE_SHARED', 'true' if WORKER_MODE == 'shared' else 'false').lower() == 'true'
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 3600))
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 1800))
+PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', 86400))
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', 1800))
+
+# Speech Settings
+TTS_PIPELINE_WORKERS = int(os.getenv('TTS_PIPELINE_WORKERS', 3))
+
+# Audio Delivery Settings
+# Chat replies carry an /api/audio/<id> URL that stays valid for AUDIO_CLIP_TTL seconds
+AUDIO_CLIP_TTL = int(os.getenv('AUDIO_CLIP_TTL', 300))
+AUDIO_CLIP_CACHE_SIZE = int(os.getenv('AUDIO_CLIP_CACHE_SIZE', 128))
+
+# TTS Cache Settings
+# Replies up to TTS_CACHE_MAX_CHARS are cached; set TTS_CACHE_DISK_BYTES=0 to keep the cache in memory only
+TTS_CACHE_MAX_CHARS = int(os.getenv('TTS_CACHE_MAX_CHARS', 500))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv('TTS_CACHE_MEMORY_BYTES', 33554432))
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', '.tts_cache')
+TTS_CACHE_DISK_BYTES = int(os.getenv('TTS_CACHE_DISK_BYTES', 268435456))
+# Synthesizes the fixed tool replies at startup (costs ElevenLabs characters once per cache directory)
+TTS_PREWARM = os.getenv('TTS_PREWARM', 'false').lower() == 'true'
+
+# Call Mode Settings
+VAD_END_SILENCE_MS = int(os.getenv('VAD_END_SILENCE_MS', 700))
+VAD_THRESHOLD_RATIO = float(os.getenv('VAD_THRESHOLD_RATIO', 3.0))
+VAD_MIN_RMS = int(os.getenv('VAD_MIN_RMS', 300))
+PARTIAL_TRANSCRIPT_INTERVAL_MS = int(os.getenv('PARTIAL_TRANSCRIPT_INTERVAL_MS', 1000))
+CALL_TRANSCRIBE_WORKERS = int(os.getenv('CALL_TRANSCRIBE_WORKERS', 4))
+
+# Async Mode Settings
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 200))
+ASYNC_BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', 32))
+
+# Static Asset Settings
+# Smaller files are not worth compressing
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv('STATIC_COMPRESS_MIN_BYTES', 1024))
+
+# Metrics Settings
+# Adds a Server-Timing header with the per-stage breakdown of each API response
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
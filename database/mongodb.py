@@ -7,6 +7,10 @@ class MongoDB:
         self.db = self.client['athen_db']
         self.conversations = self.db['conversations']
         self.reminders = self.db['reminders']
+        self.messages = self.db['messages']
+        self.web_cache = self.db['web_cache']
+        self.credentials = self.db['credentials']
+        self.audio_clips = self.db['audio_clips']
 
     def test_connection(self):
         try:
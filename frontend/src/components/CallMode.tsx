@@ -1,27 +1,201 @@
-import React, { useState } from 'react';
+import React, { useState, useRef, useEffect } from 'react';
+import { FaMicrophone } from 'react-icons/fa';
 
-const CallMode: React.FC = () => {
+const SAMPLE_RATE = 16000;
+
+export interface CallResponse {
+  response: string;
+  event_link?: string;
+  event_links?: string[];
+  web_link?: string;
+  auth_url?: string;
+}
+
+interface CallModeProps {
+  onTranscript: (text: string) => void;
+  onResponse: (data: CallResponse) => void;
+  onRecordingChange?: (recording: boolean) => void;
+}
+
+const callSocketUrl = () => {
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  return `${protocol}//${window.location.host}/api/call`;
+};
+
+const toPcm16 = (samples: Float32Array) => {
+  const pcm = new Int16Array(samples.length);
+  for (let i = 0; i < samples.length; i++) {
+    const s = Math.max(-1, Math.min(1, samples[i]));
+    pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return pcm.buffer;
+};
+
+// Streams microphone audio to /api/call; the server detects when the user
+// stops talking, so there is no upload step between speaking and the reply.
+const CallMode: React.FC<CallModeProps> = ({ onTranscript, onResponse, onRecordingChange }) => {
   const [isRecording, setIsRecording] = useState(false);
+  const [isSpeaking, setIsSpeaking] = useState(false);
+  const [partial, setPartial] = useState('');
+  const [reply, setReply] = useState('');
+
+  const socketRef = useRef<WebSocket | null>(null);
+  const stopCaptureRef = useRef<(() => void) | null>(null);
+  // While a reply is generated or played the mic is not streamed, so the
+  // assistant's own voice doesn't open a new turn
+  const busyRef = useRef(false);
+  const audioQueueRef = useRef<string[]>([]);
+  const audioPlayingRef = useRef(false);
+  const turnDoneRef = useRef(false);
+  const linksRef = useRef<Partial<CallResponse>>({});
+
+  const releaseIfIdle = () => {
+    if (turnDoneRef.current && !audioPlayingRef.current && audioQueueRef.current.length === 0) {
+      busyRef.current = false;
+    }
+  };
 
-  const toggleRecording = () => {
-    setIsRecording(!isRecording);
-    // Implement actual recording logic here
+  const playNextAudio = () => {
+    const next = audioQueueRef.current.shift();
+    if (!next) {
+      audioPlayingRef.current = false;
+      releaseIfIdle();
+      return;
+    }
+    audioPlayingRef.current = true;
+    const audio = new Audio(`data:audio/mp3;base64,${next}`);
+    audio.onended = playNextAudio;
+    audio.onerror = playNextAudio;
+    audio.play().catch(error => {
+      console.error('Error playing audio:', error);
+      playNextAudio();
+    });
   };
 
+  const handleMessage = (event: MessageEvent) => {
+    const message = JSON.parse(event.data);
+    switch (message.type) {
+      case 'speech_start':
+        setIsSpeaking(true);
+        setPartial('');
+        break;
+      case 'partial':
+        setPartial(message.text);
+        break;
+      case 'final':
+        setIsSpeaking(false);
+        setPartial('');
+        if (message.text) {
+          busyRef.current = true;
+          turnDoneRef.current = false;
+          linksRef.current = {};
+          setReply('');
+          onTranscript(message.text);
+        }
+        break;
+      case 'token':
+        setReply(prev => prev + message.text);
+        break;
+      case 'tool':
+        setReply(prev => (prev ? `${prev}\n\n` : '') + (message.response || ''));
+        break;
+      case 'links':
+        linksRef.current = message;
+        break;
+      case 'audio':
+        audioQueueRef.current.push(message.audio);
+        if (!audioPlayingRef.current) {
+          playNextAudio();
+        }
+        break;
+      case 'interrupted':
+        // The user spoke over the reply; drop what hasn't been played yet
+        audioQueueRef.current = [];
+        turnDoneRef.current = true;
+        releaseIfIdle();
+        break;
+      case 'error':
+        console.error('Call error:', message.message);
+        break;
+      case 'done':
+        turnDoneRef.current = true;
+        onResponse({ ...linksRef.current, response: message.response || '' });
+        releaseIfIdle();
+        break;
+    }
+  };
+
+  const startCall = async () => {
+    try {
+      const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+      const audioContext = new AudioContext({ sampleRate: SAMPLE_RATE });
+      const source = audioContext.createMediaStreamSource(stream);
+      const processor = audioContext.createScriptProcessor(1024, 1, 1);
+      const socket = new WebSocket(callSocketUrl());
+      socket.binaryType = 'arraybuffer';
+
+      socket.onopen = () => {
+        socket.send(JSON.stringify({ type: 'start', sample_rate: audioContext.sampleRate }));
+      };
+      socket.onmessage = handleMessage;
+      socket.onclose = () => stopCall();
+
+      processor.onaudioprocess = (e) => {
+        if (socket.readyState === WebSocket.OPEN && !busyRef.current) {
+          socket.send(toPcm16(e.inputBuffer.getChannelData(0)));
+        }
+      };
+      source.connect(processor);
+      processor.connect(audioContext.destination);
+
+      socketRef.current = socket;
+      stopCaptureRef.current = () => {
+        source.disconnect();
+        processor.disconnect();
+        stream.getTracks().forEach(track => track.stop());
+        audioContext.close();
+      };
+      setIsRecording(true);
+      onRecordingChange?.(true);
+    } catch (error) {
+      console.error('Error starting call:', error);
+    }
+  };
+
+  const stopCall = () => {
+    stopCaptureRef.current?.();
+    stopCaptureRef.current = null;
+    const socket = socketRef.current;
+    socketRef.current = null;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: 'stop' }));
+      socket.close();
+    }
+    busyRef.current = false;
+    setIsRecording(false);
+    onRecordingChange?.(false);
+    setIsSpeaking(false);
+    setPartial('');
+  };
+
+  useEffect(() => () => stopCall(), []); // eslint-disable-line react-hooks/exhaustive-deps
+
   return (
     <div className="call-mode">
       <button
-        onClick={toggleRecording}
-        className={`record-button ${isRecording ? 'recording' : ''}`}
+        id="recordButton"
+        onClick={isRecording ? stopCall : startCall}
+        className={`record-button ${isRecording ? 'recording' : ''} ${isSpeaking ? 'animating' : ''}`}
       >
-        {isRecording ? 'Stop Recording' : 'Start Recording'}
+        <FaMicrophone />
+        <span>{isRecording ? 'End Call' : 'Speak with Athen'}</span>
       </button>
-      <div className="audio-animation">
-        {/* Add audio animation here */}
-        {isRecording && <div className="audio-waves"></div>}
+      <div className="call-transcript">
+        {partial && <p className="call-partial">{partial}</p>}
+        {reply && <p className="call-reply">{reply}</p>}
       </div>
     </div>
   );
 };
 
-export default CallMode;
\ No newline at end of file
+export default CallMode;
@@ -2,14 +2,14 @@ import React, { useState, useEffect, useRef, useCallback } from 'react';
 import './ChatContainer.css';
 import { Switch } from "../components/ui/switch"; // Updated import path
 import { Label } from "../components/ui/label"; // Updated import path
-import WavEncoder from 'wav-encoder';
-import { FaMicrophone } from 'react-icons/fa'; // Add this import for the microphone icon
+import CallMode, { CallResponse } from './CallMode';
 
 interface Message {
   role: string;
   content: string;
   timestamp: string;
   event_link?: string;
+  event_links?: string[];
 }
 
 interface ChatContainerProps {
@@ -20,23 +20,17 @@ interface ChatContainerProps {
   sendMessage: (message: string) => Promise<void>;
 }
 
-interface CustomAudioProcessor {
-  stop: () => void;
-}
-
 const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHistory, isLoading, sendMessage }) => {
   const [input, setInput] = useState('');
   const [localChatHistory, setLocalChatHistory] = useState<Message[]>(chatHistory);
   const [isRecording, setIsRecording] = useState(false);
   const [showIntegration, setShowIntegration] = useState(false);
   const messagesEndRef = useRef<null | HTMLDivElement>(null);
-  const [audioProcessor, setAudioProcessor] = useState<CustomAudioProcessor | null>(null);
   const [hoveredEventLink, setHoveredEventLink] = useState<string | null>(null);
   const [previewPosition, setPreviewPosition] = useState({ top: 0, left: 0 });
   const inputRef = useRef<HTMLInputElement>(null);
   const [showClearConfirmation, setShowClearConfirmation] = useState(false);
   const [isAudioPlaying, setIsAudioPlaying] = useState(false);
-  const [isAnimating, setIsAnimating] = useState(false);
   const [lastUserMessage, setLastUserMessage] = useState<string | null>(null);
 
   useEffect(() => {
@@ -138,14 +132,15 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
         const lastMessage = newHistory[newHistory.length - 1];
         if (lastMessage && lastMessage.role === 'assistant') {
           lastMessage.event_link = data.event_link;
+          lastMessage.event_links = data.event_links;
         }
         return newHistory;
       });
     }
 
     // Handle audio if present
-    if (data.audio) {
-      playAudioResponse(data.audio);
+    if (data.audio_url) {
+      playAudioResponse(data.audio_url);
     }
 
     // Scroll to bottom after updating chat
@@ -196,7 +191,8 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
             role: 'assistant',
             content: data.response,
             timestamp: new Date().toISOString(),
-            event_link: data.event_link
+            event_link: data.event_link,
+            event_links: data.event_links
         }]);
 
         // Handle authentication if needed
@@ -205,8 +201,8 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
         }
 
         // Handle audio if present
-        if (data.audio) {
-            playAudioResponse(data.audio);
+        if (data.audio_url) {
+            playAudioResponse(data.audio_url);
         }
 
         // Scroll to bottom
@@ -284,14 +280,12 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
     }
   };
 
-  const playAudioResponse = (audioData: string) => {
-    const audio = new Audio(`data:audio/mp3;base64,${audioData}`);
+  const playAudioResponse = (audioUrl: string) => {
+    const audio = new Audio(audioUrl);
     setIsAudioPlaying(true);
-    setIsAnimating(true);
     audio.play().catch(error => console.error('Error playing audio:', error));
     audio.onended = () => {
       setIsAudioPlaying(false);
-      setIsAnimating(false);
     };
   };
 
@@ -311,105 +305,37 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
   const renderMessage = (message: Message, index: number) => (
     <div key={index} className={`message ${message.role}`}>
       <span className="message-content">{message.content}</span>
-      {message.event_link && (
+      {(message.event_links || (message.event_link ? [message.event_link] : [])).map((eventLink) => (
         <a 
-          href={message.event_link}
+          key={eventLink}
+          href={eventLink}
           target="_blank"
           rel="noopener noreferrer"
           className="event-link"
-          onMouseEnter={(e) => handleEventLinkHover(message.event_link, e)}
+          onMouseEnter={(e) => handleEventLinkHover(eventLink, e)}
           onMouseLeave={() => handleEventLinkHover(undefined, undefined)}
         >
           [Event Link]
         </a>
-      )}
+      ))}
     </div>
   );
 
-  const toggleRecording = async () => {
-    if (!isRecording) {
-      setIsAnimating(true);
-      try {
-        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        const audioContext = new AudioContext();
-        const source = audioContext.createMediaStreamSource(stream);
-        const processor = audioContext.createScriptProcessor(1024, 1, 1);
-        
-        const audioChunks: Float32Array[] = [];
-
-        processor.onaudioprocess = (e) => {
-          const inputData = e.inputBuffer.getChannelData(0);
-          audioChunks.push(new Float32Array(inputData));
-        };
-
-        source.connect(processor);
-        processor.connect(audioContext.destination);
-
-        setAudioProcessor({
-          stop: () => {
-            source.disconnect();
-            processor.disconnect();
-            const audioData = audioChunks.reduce((acc, chunk) => {
-              const tmp = new Float32Array(acc.length + chunk.length);
-              tmp.set(acc, 0);
-              tmp.set(chunk, acc.length);
-              return tmp;
-            }, new Float32Array());
-
-            WavEncoder.encode({
-              sampleRate: audioContext.sampleRate,
-              channelData: [audioData]
-            }).then((buffer: ArrayBuffer) => {
-              const blob = new Blob([buffer], { type: 'audio/wav' });
-              sendAudioToServer(blob);
-            });
-          }
-        });
-
-        setIsRecording(true);
-      } catch (error) {
-        console.error('Error starting recording:', error);
-      }
-    } else {
-      audioProcessor?.stop();
-      setAudioProcessor(null);
-      setIsRecording(false);
-      setIsAnimating(false);
-    }
+  const handleCallTranscript = (text: string) => {
+    setLastUserMessage(text);
+    setLocalChatHistory(prev => [...prev, { role: 'user', content: text, timestamp: new Date().toISOString() }]);
   };
 
-  const sendAudioToServer = async (audioBlob: Blob) => {
-    const formData = new FormData();
-    formData.append('audio', audioBlob, 'audio.wav');
-
-    try {
-      const response = await fetch('/api/speech-to-text', {
-        method: 'POST',
-        body: formData,
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      const data = await response.json();
-      console.log("Speech-to-text response:", data);
-
-      if (data.transcription && data.transcription.trim() !== "") {
-        // Add the transcribed text as a user message
-        setLocalChatHistory(prevHistory => [...prevHistory, { role: 'user', content: data.transcription, timestamp: new Date().toISOString() }]);
-        // Then send the transcribed text to the chat function
-        await sendMessage(data.transcription);
-      } else if (data.error) {
-        console.error('Error from server:', data.error);
-        setLocalChatHistory(prevHistory => [...prevHistory, { role: 'assistant', content: `Sorry, an error occurred: ${data.error}`, timestamp: new Date().toISOString() }]);
-      } else {
-        console.error('No transcription or error received from server');
-        setLocalChatHistory(prevHistory => [...prevHistory, { role: 'assistant', content: 'Sorry, I couldn\'t process the audio. Please try again.', timestamp: new Date().toISOString() }]);
-      }
-    } catch (error) {
-      console.error('Error sending audio to server:', error);
-      setLocalChatHistory(prevHistory => [...prevHistory, { role: 'assistant', content: 'An error occurred while processing the audio. Please try again.', timestamp: new Date().toISOString() }]);
+  const handleCallResponse = (data: CallResponse) => {
+    setLocalChatHistory(prev => [...prev, {
+      role: 'assistant',
+      content: data.response,
+      timestamp: new Date().toISOString(),
+      event_link: data.event_link,
+      event_links: data.event_links
+    }]);
+    if (data.auth_url) {
+      handleAuthUrl(data.auth_url);
     }
   };
 
@@ -535,14 +461,11 @@ const ChatContainer: React.FC<ChatContainerProps> = ({ mode, toggleMode, chatHis
         </>
       ) : (
         <div className="call-container">
-          <button 
-            id="recordButton"
-            onClick={toggleRecording}
-            className={`record-button ${isRecording ? 'recording' : ''} ${isAnimating ? 'animating' : ''}`}
-          >
-            <FaMicrophone />
-            <span>Speak with Athen</span>
-          </button>
+          <CallMode
+            onTranscript={handleCallTranscript}
+            onResponse={handleCallResponse}
+            onRecordingChange={setIsRecording}
+          />
         </div>
       )}
       {hoveredEventLink && (
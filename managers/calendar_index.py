@@ -0,0 +1,163 @@
+import bisect
+import difflib
+import threading
+import time
+import logging
+import datetime as dt
+import pytz
+from googleapiclient.errors import HttpError
+from config.settings import CALENDAR_SYNC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TZ = pytz.timezone("Asia/Kolkata")
+
+def event_start(event):
+    start = event.get('start', {})
+    if 'dateTime' in start:
+        return dt.datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
+    if 'date' in start:
+        return LOCAL_TZ.localize(dt.datetime.fromisoformat(start['date']))
+    return None
+
+def event_end(event):
+    end = event.get('end', {})
+    if 'dateTime' in end:
+        return dt.datetime.fromisoformat(end['dateTime'].replace('Z', '+00:00'))
+    if 'date' in end:
+        return LOCAL_TZ.localize(dt.datetime.fromisoformat(end['date']))
+    return event_start(event)
+
+def normalize_summary(summary):
+    return " ".join((summary or "").lower().split())
+
+
+class CalendarIndex:
+    """In-memory copy of a calendar kept current with syncToken incremental sync.
+
+    The first sync lists every event; later syncs only fetch what changed,
+    and are skipped entirely within CALENDAR_SYNC_INTERVAL seconds of the
+    previous one. Events are indexed by id, by start time and by summary.
+    """
+
+    def __init__(self, calendar_id="primary", sync_interval=CALENDAR_SYNC_INTERVAL):
+        self.calendar_id = calendar_id
+        self.sync_interval = sync_interval
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.events = {}
+            self.by_start = []
+            self.by_summary = {}
+            self.sync_token = None
+            self.last_sync = 0
+            # Longest event seen, so range() knows how far back an in-progress event can have started
+            self.max_duration = dt.timedelta(0)
+
+    def sync(self, service, force=False):
+        with self.lock:
+            if not force and self.sync_token and time.monotonic() - self.last_sync < self.sync_interval:
+                return
+            try:
+                self._sync(service)
+            except HttpError as error:
+                if error.resp.status != 410:
+                    raise
+                # The sync token expired; start over with a full sync
+                logger.info("Calendar sync token expired, running a full sync.")
+                self.reset()
+                self._sync(service)
+
+    def _sync(self, service):
+        params = {"calendarId": self.calendar_id, "singleEvents": True, "maxResults": 250}
+        if self.sync_token:
+            params["syncToken"] = self.sync_token
+        changed = 0
+        while True:
+            result = service.events().list(**params).execute()
+            for event in result.get("items", []):
+                if event.get("status") == "cancelled":
+                    self.remove(event["id"])
+                else:
+                    self.apply(event)
+                changed += 1
+            if "nextPageToken" not in result:
+                break
+            params["pageToken"] = result["nextPageToken"]
+        self.sync_token = result.get("nextSyncToken")
+        self.last_sync = time.monotonic()
+        logger.debug(f"Calendar sync applied {changed} changes, {len(self.events)} events indexed.")
+
+    def apply(self, event):
+        with self.lock:
+            self.remove(event["id"])
+            start = event_start(event)
+            if start is None:
+                return
+            self.events[event["id"]] = event
+            self.max_duration = max(self.max_duration, event_end(event) - start)
+            bisect.insort(self.by_start, (start, event["id"]))
+            self.by_summary.setdefault(normalize_summary(event.get("summary")), set()).add(event["id"])
+
+    def remove(self, event_id):
+        with self.lock:
+            event = self.events.pop(event_id, None)
+            if event is None:
+                return
+            key = (event_start(event), event_id)
+            position = bisect.bisect_left(self.by_start, key)
+            if position < len(self.by_start) and self.by_start[position] == key:
+                del self.by_start[position]
+            ids = self.by_summary.get(normalize_summary(event.get("summary")))
+            if ids:
+                ids.discard(event_id)
+                if not ids:
+                    del self.by_summary[normalize_summary(event.get("summary"))]
+
+    def get(self, event_id):
+        return self.events.get(event_id)
+
+    def range(self, start, end=None, limit=None):
+        """Events in progress at start or starting in [start, end), ordered by start time."""
+        with self.lock:
+            position = bisect.bisect_left(self.by_start, (start - self.max_duration, ""))
+            events = []
+            for event_start_time, event_id in self.by_start[position:]:
+                if end is not None and event_start_time >= end:
+                    break
+                event = self.events[event_id]
+                if event_start_time < start and event_end(event) <= start:
+                    continue
+                events.append(event)
+                if limit is not None and len(events) >= limit:
+                    break
+            return events
+
+    def match_summary(self, summary, after=None):
+        """Returns (events ordered by start, exact) for a summary.
+
+        Exact matches win; without any, prefix matches and then close
+        (difflib) matches are used and exact is False. Events that ended
+        by `after` are left out.
+        """
+        with self.lock:
+            wanted = normalize_summary(summary)
+            exact = self.events_for(self.by_summary.get(wanted, ()), after)
+            if exact:
+                return exact, True
+            prefixed = [key for key in self.by_summary if key.startswith(wanted)] if wanted else []
+            close = prefixed or difflib.get_close_matches(wanted, self.by_summary.keys(), n=3, cutoff=0.75)
+            return self.events_for(set().union(*(self.by_summary[key] for key in close)) if close else (), after), False
+
+    def events_for(self, event_ids, after):
+        events = [self.events[event_id] for event_id in event_ids]
+        if after is not None:
+            events = [event for event in events if event_end(event) > after]
+        return sorted(events, key=event_start)
+
+    def find_by_summary(self, summary, after=None):
+        """Finds the soonest event whose summary matches exactly, then by prefix, then fuzzily."""
+        events, _ = self.match_summary(summary, after=after)
+        return events[0] if events else None
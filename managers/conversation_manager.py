@@ -1,47 +1,205 @@
 from datetime import date, datetime
+import itertools
+import logging
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from config.settings import HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_PROJECTION = {"_id": 0, "role": 1, "content": 1, "timestamp": 1}
+PAGE_PROJECTION = {"date": 1, "role": 1, "content": 1, "timestamp": 1}
+
+def encode_history_cursor(day, message):
+    message_id = message.get("_id") or ""
+    return f"{day}|{message['timestamp'].isoformat()}|{message_id}"
+
+def decode_history_cursor(cursor):
+    """Returns (day, timestamp, ObjectId or None) from encode_history_cursor output."""
+    parts = cursor.split("|")
+    if len(parts) != 3:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    day, timestamp, message_id = parts
+    try:
+        date.fromisoformat(day)
+        return day, datetime.fromisoformat(timestamp), ObjectId(message_id) if message_id else None
+    except (ValueError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 class ConversationHistoryManager:
-    def __init__(self, conversations_collection, context_length=8):
+    """Stores chat messages either inside one document per day or one document per message.
+
+    Day documents are only ever appended to with an atomic $push capped by
+    $slice. When a messages collection is given, every message becomes its
+    own document indexed on (date, timestamp) and old day documents are
+    copied over on startup.
+
+    History pages are read newest-first across days. The latest page is
+    cached in process under a generation number that add_message bumps,
+    so a write makes every cached page unreachable at once.
+    """
+
+    def __init__(self, conversations_collection, context_length=8, messages_collection=None, max_day_messages=1000, cache_pages=True):
         self.conversations = conversations_collection
+        self.messages = messages_collection
         self.context_length = context_length
+        self.max_day_messages = max_day_messages
+        # Another worker's writes can't bump this process's generation, so shared mode reads every page
+        self.page_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=HISTORY_CACHE_TTL) if cache_pages else None
+        self.generation = itertools.count()
+        self.current_generation = next(self.generation)
+        self.initialize_storage()
 
-    def get_today_document(self):
-        today = date.today().isoformat()
-        return self.conversations.find_one({"date": today}) or {"date": today, "messages": []}
+    @property
+    def per_message(self):
+        return self.messages is not None
+
+    def initialize_storage(self):
+        try:
+            # Reply audio used to be kept in day documents; it is now served by id from /api/audio
+            self.conversations.update_many({"temp_audio": {"$exists": True}}, {"$unset": {"temp_audio": ""}})
+            if self.per_message:
+                self.messages.create_index([("date", ASCENDING), ("timestamp", ASCENDING)])
+                self.messages.create_index([("timestamp", ASCENDING), ("_id", ASCENDING)])
+                self.migrate_day_documents()
+            else:
+                self.conversations.create_index("date", unique=True)
+        except OperationFailure as e:
+            logger.error(f"Error initializing conversation storage: {e}")
+
+    def migrate_day_documents(self):
+        """Copies messages out of day documents into per-message documents. Safe to re-run."""
+        migrated = 0
+        for day_doc in self.conversations.find({"migrated": {"$ne": True}, "messages.0": {"$exists": True}}):
+            operations = []
+            for message in day_doc["messages"]:
+                message_doc = {
+                    "date": day_doc["date"],
+                    "role": message.get("role", "unknown"),
+                    "content": message.get("content", ""),
+                    "timestamp": message.get("timestamp", datetime.utcnow())
+                }
+                operations.append(UpdateOne(message_doc, {"$setOnInsert": message_doc}, upsert=True))
+            self.messages.bulk_write(operations, ordered=False)
+            self.conversations.update_one({"_id": day_doc["_id"]}, {"$set": {"migrated": True}})
+            migrated += len(operations)
+        if migrated:
+            logger.info(f"Migrated {migrated} messages to per-message documents.")
+        return migrated
 
     def add_message(self, role, content):
-        today_doc = self.get_today_document()
-        today_doc["messages"].append({
+        today = date.today().isoformat()
+        message = {
             "role": role,
             "content": content,
             "timestamp": datetime.utcnow()
-        })
-        self.conversations.update_one(
-            {"date": today_doc["date"]},
-            {"$set": today_doc},
-            upsert=True
-        )
-
-    def get_recent_context(self):
-        today_doc = self.get_today_document()
-        return today_doc["messages"][-self.context_length:]
-
-    def store_temp_audio(self, audio_data):
-        today = date.today().isoformat()
-        self.conversations.update_one(
-            {"date": today},
-            {"$set": {"temp_audio": audio_data}},
-            upsert=True
-        )
+        }
+        if self.per_message:
+            self.messages.insert_one({"date": today, **message})
+            self.invalidate_pages()
+            return
 
-    def get_temp_audio(self):
-        today = date.today().isoformat()
-        doc = self.conversations.find_one({"date": today})
-        return doc.get("temp_audio") if doc else None
+        # The id breaks timestamp ties when paging, as it does for per-message documents
+        message["_id"] = ObjectId()
+        update = {"$push": {"messages": {"$each": [message], "$slice": -self.max_day_messages}}}
+        try:
+            self.conversations.update_one({"date": today}, update, upsert=True)
+        except DuplicateKeyError:
+            # Another request created today's document first; the push now matches it
+            self.conversations.update_one({"date": today}, update, upsert=True)
+        self.invalidate_pages()
+
+    def invalidate_pages(self):
+        self.current_generation = next(self.generation)
+
+    def get_history_page(self, limit, before=None):
+        """Returns (messages oldest first, cursor for the page before them or None).
+
+        Raises ValueError for a malformed cursor.
+        """
+        if before:
+            return self.read_history_page(limit, decode_history_cursor(before))
+        if self.page_cache is None:
+            return self.read_history_page(limit, None)
+
+        key = (self.current_generation, limit)
+        page = self.page_cache.get(key)
+        if page is None:
+            # Stored under the generation read before the query, so a concurrent write can't leave a stale page behind
+            page = self.read_history_page(limit, None)
+            self.page_cache.set(key, page)
+        return page
+
+    def read_history_page(self, limit, cursor):
+        # One extra message tells whether an older page exists
+        if self.per_message:
+            messages = self.read_message_documents(limit + 1, cursor)
+        else:
+            messages = self.read_day_documents(limit + 1, cursor)
 
-    def clear_temp_audio(self):
+        if len(messages) > limit:
+            messages = messages[1:]
+            next_cursor = encode_history_cursor(messages[0]["date"], messages[0])
+        else:
+            next_cursor = None
+        return [{key: message[key] for key in ("role", "content", "timestamp") if key in message} for message in messages], next_cursor
+
+    def read_message_documents(self, count, cursor):
+        query = {}
+        if cursor:
+            _, timestamp, message_id = cursor
+            query["$or"] = [{"timestamp": {"$lt": timestamp}}]
+            if message_id:
+                query["$or"].append({"timestamp": timestamp, "_id": {"$lt": message_id}})
+        docs = self.messages.find(query, PAGE_PROJECTION).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(count)
+        return list(docs)[::-1]
+
+    def read_day_documents(self, count, cursor):
+        """Walks day documents newest first, projecting only the trailing slice each day still has to contribute."""
+        day_query = {"date": {"$lte": cursor[0]}} if cursor else {}
+        days = self.conversations.find(day_query, {"_id": 0, "date": 1}).sort("date", DESCENDING)
+
+        collected = []
+        for day in (doc["date"] for doc in days):
+            needed = count - len(collected)
+            if needed <= 0:
+                break
+            if cursor and day == cursor[0]:
+                _, timestamp, message_id = cursor
+                condition = {"$lt": ["$$this.timestamp", timestamp]}
+                if message_id:
+                    # Messages stored before ids were added have none and sort below any id
+                    condition = {"$or": [condition, {"$and": [
+                        {"$eq": ["$$this.timestamp", timestamp]},
+                        {"$lt": [{"$ifNull": ["$$this._id", None]}, message_id]}
+                    ]}]}
+                older = {"$filter": {"input": "$messages", "cond": condition}}
+                result = list(self.conversations.aggregate([
+                    {"$match": {"date": day}},
+                    {"$project": {"_id": 0, "messages": {"$slice": [older, -needed]}}}
+                ]))
+                messages = (result[0].get("messages") or []) if result else []
+            else:
+                doc = self.conversations.find_one({"date": day}, {"_id": 0, "messages": {"$slice": -needed}})
+                messages = (doc or {}).get("messages") or []
+            collected = [{**message, "date": day} for message in messages] + collected
+        return collected
+
+    def get_recent_context(self, limit=None):
         today = date.today().isoformat()
-        self.conversations.update_one(
-            {"date": today},
-            {"$unset": {"temp_audio": ""}}
-        ) 
\ No newline at end of file
+        limit = limit or self.context_length
+        if self.per_message:
+            cursor = self.messages.find({"date": today}, MESSAGE_PROJECTION).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+            return list(cursor)[::-1]
+
+        today_doc = self.conversations.find_one({"date": today}, {"_id": 0, "messages": {"$slice": -limit}})
+        return today_doc["messages"] if today_doc and "messages" in today_doc else []
+
+    def clear_day(self, day):
+        self.conversations.delete_one({"date": day})
+        if self.per_message:
+            self.messages.delete_many({"date": day})
+        self.invalidate_pages()
@@ -1,33 +1,148 @@
+import re
+import logging
 from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = 0
+COMPLETED = 1
+REMINDER_PROJECTION = {"reminder": 1, "flag": 1, "timestamp": 1, "completed_at": 1}
+
+def normalize_reminder(text):
+    return re.sub(r"[\s.!?]+$", "", " ".join((text or "").lower().split()))
+
+def reminder_doc(reminder, flag=ACTIVE, timestamp=None):
+    return {
+        "reminder": reminder,
+        "normalized": normalize_reminder(reminder),
+        "flag": flag,
+        "timestamp": timestamp or datetime.utcnow()
+    }
+
+def encode_cursor(doc):
+    return f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+
+def decode_cursor(cursor):
+    timestamp, _, object_id = cursor.partition("|")
+    try:
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except InvalidId as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def parse_object_id(reminder_id):
+    try:
+        return ObjectId(reminder_id)
+    except (InvalidId, TypeError):
+        return None
+
 
 class RemindersManager:
+    """Stores one document per reminder, indexed on (flag, timestamp).
+
+    Reminders used to live in an array inside a single document; that
+    layout is migrated into separate documents on startup.
+    """
+
     def __init__(self, reminders_collection):
         self.reminders = reminders_collection
         self.initialize_reminders()
 
     def initialize_reminders(self):
-        if not self.reminders.find_one({}):
-            self.reminders.insert_one({'reminders': []})
+        try:
+            self.reminders.create_index([("flag", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)])
+            self.reminders.create_index([("normalized", ASCENDING), ("flag", ASCENDING)])
+        except OperationFailure as e:
+            logger.error(f"Error creating reminder indexes: {e}")
+        self.migrate_legacy_document()
+
+    def migrate_legacy_document(self):
+        """Moves reminders out of the old single-document array. Safe to re-run."""
+        migrated = 0
+        for legacy_doc in self.reminders.find({"reminders": {"$type": "array"}}):
+            operations = []
+            for item in legacy_doc["reminders"]:
+                doc = reminder_doc(item.get("reminder", ""), item.get("flag", ACTIVE), item.get("timestamp"))
+                operations.append(UpdateOne(
+                    {"reminder": doc["reminder"], "timestamp": doc["timestamp"]},
+                    {"$setOnInsert": doc},
+                    upsert=True
+                ))
+            if operations:
+                self.reminders.bulk_write(operations, ordered=False)
+            self.reminders.delete_one({"_id": legacy_doc["_id"]})
+            migrated += len(operations)
+        if migrated:
+            logger.info(f"Migrated {migrated} reminders to per-reminder documents.")
+        return migrated
 
     def add_reminder(self, reminder):
-        self.reminders.update_one(
-            {},
-            {'$push': {'reminders': {
-                "flag": 0,
-                "reminder": reminder,
-                "timestamp": datetime.utcnow()
-            }}}
+        return str(self.reminders.insert_one(reminder_doc(reminder)).inserted_id)
+
+    def add_reminders(self, reminders):
+        if not reminders:
+            return []
+        result = self.reminders.insert_many([reminder_doc(reminder) for reminder in reminders])
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    def list_reminders(self, flag=ACTIVE, limit=50, cursor=None):
+        """Returns (reminders, next_cursor), oldest first. next_cursor is None on the last page."""
+        limit = max(1, limit)
+        query = {"flag": flag}
+        if cursor:
+            timestamp, object_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$gt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$gt": object_id}}
+            ]
+        docs = list(
+            self.reminders.find(query, REMINDER_PROJECTION)
+            .sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+            .limit(limit + 1)
+        )
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_cursor
+
+    def get_active_reminders(self, limit=None):
+        cursor = self.reminders.find({"flag": ACTIVE}, REMINDER_PROJECTION).sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def complete_reminder(self, reminder_text=None, reminder_id=None):
+        """Completes one reminder by id, or the oldest active one matching the text."""
+        if reminder_id is not None:
+            object_id = parse_object_id(reminder_id)
+            if object_id is None:
+                return False
+            query = {"_id": object_id, "flag": ACTIVE}
+        else:
+            query = {"normalized": normalize_reminder(reminder_text), "flag": ACTIVE}
+
+        completed = self.reminders.find_one_and_update(
+            query,
+            {"$set": {"flag": COMPLETED, "completed_at": datetime.utcnow()}},
+            sort=[("timestamp", ASCENDING)],
+            return_document=ReturnDocument.AFTER
         )
+        return completed is not None
 
-    def get_active_reminders(self):
-        reminders_doc = self.reminders.find_one({})
-        if reminders_doc and 'reminders' in reminders_doc:
-            return [r for r in reminders_doc['reminders'] if r['flag'] == 0]
-        return []
+    def complete_reminders(self, reminder_texts=None, reminder_ids=None):
+        """Completes every active reminder matching the given ids or texts. Returns the count."""
+        clauses = []
+        if reminder_ids:
+            object_ids = [object_id for object_id in map(parse_object_id, reminder_ids) if object_id is not None]
+            clauses.append({"_id": {"$in": object_ids}})
+        if reminder_texts:
+            clauses.append({"normalized": {"$in": [normalize_reminder(text) for text in reminder_texts]}})
+        if not clauses:
+            return 0
 
-    def complete_reminder(self, reminder_text):
-        result = self.reminders.update_one(
-            {"reminders.reminder": reminder_text, "reminders.flag": 0},
-            {"$set": {"reminders.$.flag": 1}}
+        result = self.reminders.update_many(
+            {"flag": ACTIVE, "$or": clauses},
+            {"$set": {"flag": COMPLETED, "completed_at": datetime.utcnow()}}
         )
-        return result.modified_count > 0 
\ No newline at end of file
+        return result.modified_count
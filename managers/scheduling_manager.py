@@ -1,58 +1,45 @@
 import os
-import json
 import pytz
 from datetime import datetime
 import datetime as dt
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import logging
-from config.settings import SCOPES, TOKEN_FILE, CREDENTIALS_FILE
+from config.settings import SCOPES, CREDENTIALS_FILE, CALENDAR_SYNC_INTERVAL
+from services.google_service import CredentialsStore, calendar_service
+from managers.calendar_index import CalendarIndex, event_start
 
 logger = logging.getLogger(__name__)
 
+def format_event_start(event):
+    start = event['start'].get('dateTime', event['start'].get('date'))
+    if 'T' in start:
+        return event_start(event).astimezone(pytz.timezone("Asia/Kolkata")).strftime("%Y-%m-%d %I:%M %p")
+    return start
+
+
 class SchedulingManager:
+    def __init__(self, credentials=None, calendar_sync_interval=CALENDAR_SYNC_INTERVAL):
+        self.credentials = credentials or CredentialsStore()
+        self.calendar_index = CalendarIndex(sync_interval=calendar_sync_interval)
+
     def get_google_calendar_service(self):
         try:
-            creds = None
-            if os.path.exists(TOKEN_FILE):
-                try:
-                    creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-                except Exception as e:
-                    logger.error(f"Error loading credentials from {TOKEN_FILE}: {e}")
-                    os.remove(TOKEN_FILE)
-                    creds = None
-
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    try:
-                        creds.refresh(Request())
-                        logger.info("Successfully refreshed credentials.")
-                    except Exception as e:
-                        logger.error(f"Error refreshing credentials: {e}")
-                        creds = None
-
-                if not creds:
-                    if not os.path.exists(CREDENTIALS_FILE):
-                        raise FileNotFoundError(f"Credentials file {CREDENTIALS_FILE} not found.")
+            creds = self.credentials.get()
+            if creds:
+                return calendar_service(creds), None
 
-                    flow = Flow.from_client_secrets_file(
-                        CREDENTIALS_FILE,
-                        scopes=SCOPES,
-                        redirect_uri="http://localhost:5000/oauth_callback"
-                    )
-                    auth_url, _ = flow.authorization_url(prompt='consent')
-                    logger.info(f"Generated authorization URL: {auth_url}")
-                    return None, auth_url
+            if not os.path.exists(CREDENTIALS_FILE):
+                raise FileNotFoundError(f"Credentials file {CREDENTIALS_FILE} not found.")
 
-            if creds and creds.valid:
-                with open(TOKEN_FILE, "w") as token_file:
-                    token_file.write(creds.to_json())
-                    logger.info(f"Saved credentials to {TOKEN_FILE}.")
-                service = build("calendar", "v3", credentials=creds)
-                return service, None
+            flow = Flow.from_client_secrets_file(
+                CREDENTIALS_FILE,
+                scopes=SCOPES,
+                redirect_uri="http://localhost:5000/oauth_callback"
+            )
+            auth_url, _ = flow.authorization_url(prompt='consent')
+            logger.info(f"Generated authorization URL: {auth_url}")
+            return None, auth_url
 
         except Exception as e:
             logger.error(f"Error in get_google_calendar_service: {e}")
@@ -70,12 +57,9 @@ class SchedulingManager:
             )
             flow.fetch_token(code=auth_code)
             creds = flow.credentials
+            self.credentials.set(creds)
 
-            with open(TOKEN_FILE, "w") as token_file:
-                token_file.write(creds.to_json())
-                logger.info(f"Saved new credentials to {TOKEN_FILE}.")
-
-            return build("calendar", "v3", credentials=creds)
+            return calendar_service(creds)
 
         except Exception as e:
             logger.error(f"Error in handle_auth_callback: {e}")
@@ -121,6 +105,7 @@ class SchedulingManager:
                 event["attendees"] = [{"email": attendee} for attendee in event_details["attendees"]]
             
             event = service.events().insert(calendarId="primary", body=event).execute()
+            self.calendar_index.apply(event)
             return event.get('htmlLink')
         except ValueError as e:
             return None
@@ -129,64 +114,41 @@ class SchedulingManager:
 
     def get_event_id(self, service, summary):
         """Retrieve event ID based on event summary"""
-        creds = None
-        if os.path.exists('token.json'):
-            with open('token.json', 'rb') as token:
-                creds = json.load(token)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = Flow.from_client_secrets_file(
-                    'credentials.json', SCOPES, redirect_uri='urn:ietf:wg:oauth:2.0:oob')
-                auth_url, _ = flow.authorization_url(prompt='consent')
-                print(f"Please go to this URL: {auth_url}")
-                authorization_response = input("Enter the authorization code: ")
-                flow.fetch_token(code=authorization_response)
-                creds = flow.credentials
-            
-            with open('token.json', 'wb') as token:
-                json.dump(creds, token)
-        
-        now = dt.datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(calendarId='primary', timeMin=now,
-                                            maxResults=100, singleEvents=True,
-                                            orderBy='startTime').execute()
-        events = events_result.get('items', [])
-
-        for event in events:
-            if event['summary'] == summary:
-                return event['id']
-
-        return None
+        self.calendar_index.sync(service)
+        now = dt.datetime.now(dt.timezone.utc)
+        event = self.calendar_index.find_by_summary(summary, after=now)
+        return event['id'] if event else None
 
     def delete_event(self, service, summary):
-        event_id = self.get_event_id(service, summary)
-        if event_id:
-            service.events().delete(calendarId='primary', eventId=event_id).execute()
-            return True
-        return False
+        """Deletes the event matching the summary.
+
+        Returns (deleted event, []) for an exact title match or a single
+        close match. Several close matches are not deleted and come back
+        as (None, candidates) for the user to pick from.
+        """
+        self.calendar_index.sync(service)
+        now = dt.datetime.now(dt.timezone.utc)
+        events, exact = self.calendar_index.match_summary(summary, after=now)
+        if not events:
+            return None, []
+        if not exact and len(events) > 1:
+            return None, events
+        event = events[0]
+        try:
+            service.events().delete(calendarId='primary', eventId=event['id']).execute()
+        except HttpError as error:
+            if error.resp.status not in (404, 410):
+                raise
+        self.calendar_index.remove(event['id'])
+        return event, []
         
     def get_upcoming_events(self, service, max_results):
-        now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc).isoformat()
+        now = dt.datetime.now(dt.timezone.utc)
         try:
-            events_result = service.events().list(calendarId="primary", timeMin=now, 
-                                                maxResults=max_results, singleEvents=True,
-                                                orderBy="startTime").execute()
-            events = events_result.get("items", [])
+            self.calendar_index.sync(service)
+            events = self.calendar_index.range(now, limit=max_results)
             
-            formatted_events = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                if 'T' in start:
-                    start_dt = dt.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                    start_dt = start_dt.astimezone(pytz.timezone("Asia/Kolkata"))
-                    formatted_start = start_dt.strftime("%Y-%m-%d %I:%M %p")
-                else:
-                    formatted_start = start
-                
-                formatted_events.append(f"{formatted_start}: {event['summary']}")
+            formatted_events = [f"{format_event_start(event)}: {event.get('summary', '(No title)')}" for event in events]
             
             response = "Here are your upcoming events:\n" + "\n".join(formatted_events)
             return response
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from config.settings import SCOPES, TOKEN_FILE, GOOGLE_API_KEY, TOKEN_REFRESH_MARGIN, CUSTOM_SEARCH_ENDPOINT, CREDENTIALS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# The Google client libraries are imported on first use; they dominate cold start time.
+# httplib2 connections are not thread-safe, so each worker thread builds its
+# own client once and keeps reusing it.
+_local = threading.local()
+
+def calendar_service(creds):
+    cached = getattr(_local, "calendar", None)
+    if cached is None or cached[0] is not creds:
+        from googleapiclient.discovery import build
+        cached = (creds, build("calendar", "v3", credentials=creds, cache_discovery=False))
+        _local.calendar = cached
+    return cached[1]
+
+def customsearch_service():
+    service = getattr(_local, "customsearch", None)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY, cache_discovery=False, client_options={"api_endpoint": CUSTOM_SEARCH_ENDPOINT})
+        _local.customsearch = service
+    return service
+
+
+class CredentialsStore:
+    """Keeps the Calendar OAuth credentials in memory.
+
+    The token file is read once and written only when the serialized
+    credentials change. A background timer refreshes the access token
+    TOKEN_REFRESH_MARGIN seconds before it expires, so request threads
+    rarely pay for a refresh.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, scopes=SCOPES, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.token_file = token_file
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.lock = threading.RLock()
+        self.creds = None
+        self.loaded = False
+        self.saved_json = None
+        self.timer = None
+
+    def get(self):
+        """Returns valid credentials, or None when the user has to authenticate."""
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            if self.creds and self._needs_refresh():
+                self._refresh()
+            return self.creds if self.creds and self.creds.valid else None
+
+    def set(self, creds):
+        with self.lock:
+            self.creds = creds
+            self.loaded = True
+            self._save_if_changed()
+            self._schedule_refresh()
+
+    def _load(self):
+        self.loaded = True
+        if not os.path.exists(self.token_file):
+            return
+        try:
+            from google.oauth2.credentials import Credentials
+            self.creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+            with open(self.token_file) as token_file:
+                self.saved_json = token_file.read()
+            self._schedule_refresh()
+        except Exception as e:
+            logger.error(f"Error loading credentials from {self.token_file}: {e}")
+            os.remove(self.token_file)
+            self.creds = None
+
+    def _needs_refresh(self):
+        if not self.creds.valid:
+            return True
+        expiry = self.creds.expiry
+        return expiry is not None and expiry - datetime.utcnow() < timedelta(seconds=self.refresh_margin)
+
+    def _refresh(self):
+        if not self.creds.refresh_token:
+            if not self.creds.valid:
+                self.creds = None
+            return
+        try:
+            from google.auth.transport.requests import Request
+            self.creds.refresh(Request())
+            logger.info("Successfully refreshed credentials.")
+            self._save_if_changed()
+            self._schedule_refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing credentials: {e}")
+            if not self.creds.valid:
+                self.creds = None
+
+    def _save_if_changed(self):
+        creds_json = self.creds.to_json()
+        if creds_json == self.saved_json:
+            return
+        temp_file = f"{self.token_file}.tmp"
+        with open(temp_file, "w") as token_file:
+            token_file.write(creds_json)
+        os.replace(temp_file, self.token_file)
+        self.saved_json = creds_json
+        logger.info(f"Saved credentials to {self.token_file}.")
+
+    def _schedule_refresh(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if not self.creds or not self.creds.refresh_token or not self.creds.expiry:
+            return
+        delay = (self.creds.expiry - datetime.utcnow()).total_seconds() - self.refresh_margin
+        self.timer = threading.Timer(max(delay, 1), self._background_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _background_refresh(self):
+        with self.lock:
+            if self.creds and self._needs_refresh():
+                self._refresh()
+
+
+class SharedCredentialsStore(CredentialsStore):
+    """Keeps the Calendar OAuth credentials in a MongoDB document shared by all workers.
+
+    Each worker caches the credentials in memory and re-reads the document
+    every cache_ttl seconds, and again before refreshing an expiring token
+    in case another worker already did. Refreshed tokens are written with
+    a compare-and-set on the document version: when two workers refresh at
+    once, only the first write lands and the other adopts it. There is no
+    refresh timer, since every worker would run its own.
+    """
+
+    DOCUMENT_ID = "google_calendar"
+
+    def __init__(self, collection, cache_ttl=CREDENTIALS_CACHE_TTL, token_file=TOKEN_FILE, scopes=SCOPES, refresh_margin=TOKEN_REFRESH_MARGIN):
+        super().__init__(token_file=token_file, scopes=scopes, refresh_margin=refresh_margin)
+        self.collection = collection
+        self.cache_ttl = cache_ttl
+        self.version = None
+        self.checked_at = 0
+
+    def get(self):
+        with self.lock:
+            if not self.loaded or time.monotonic() - self.checked_at >= self.cache_ttl:
+                self._load()
+            if self.creds and self._needs_refresh():
+                self._load()
+                if self.creds and self._needs_refresh():
+                    self._refresh()
+            return self.creds if self.creds and self.creds.valid else None
+
+    def set(self, creds):
+        """Stores credentials from a new OAuth consent; they replace whatever other workers hold."""
+        from pymongo import ReturnDocument
+
+        with self.lock:
+            creds_json = creds.to_json()
+            doc = self.collection.find_one_and_update(
+                {"_id": self.DOCUMENT_ID},
+                {"$set": {"token": creds_json, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self.creds = creds
+            self.saved_json = creds_json
+            self.version = doc["version"]
+            self.loaded = True
+            self.checked_at = time.monotonic()
+
+    def _load(self):
+        self.loaded = True
+        self.checked_at = time.monotonic()
+        doc = self.collection.find_one({"_id": self.DOCUMENT_ID})
+        if doc is None:
+            self.creds, self.saved_json, self.version = None, None, None
+            self._import_token_file()
+            return
+        if doc["version"] == self.version:
+            return
+        try:
+            from google.oauth2.credentials import Credentials
+            self.creds = Credentials.from_authorized_user_info(json.loads(doc["token"]), self.scopes)
+            self.saved_json = doc["token"]
+            self.version = doc["version"]
+        except Exception as e:
+            logger.error(f"Error loading shared credentials: {e}")
+            self.creds = None
+
+    def _import_token_file(self):
+        # A token.json left from single-worker mode seeds the shared document once
+        if not os.path.exists(self.token_file):
+            return
+        super()._load()
+        self.saved_json = None
+        if self.creds:
+            self._save_if_changed()
+            logger.info(f"Imported credentials from {self.token_file} into MongoDB.")
+
+    def _save_if_changed(self):
+        from pymongo.errors import DuplicateKeyError
+
+        creds_json = self.creds.to_json()
+        if creds_json == self.saved_json:
+            return
+        now = datetime.utcnow()
+        if self.version is None:
+            try:
+                self.collection.insert_one({"_id": self.DOCUMENT_ID, "token": creds_json, "version": 1, "updated_at": now})
+                written = True
+            except DuplicateKeyError:
+                written = False
+        else:
+            result = self.collection.update_one(
+                {"_id": self.DOCUMENT_ID, "version": self.version},
+                {"$set": {"token": creds_json, "updated_at": now}, "$inc": {"version": 1}}
+            )
+            written = result.modified_count == 1
+
+        if not written:
+            # Another worker wrote first; its credentials are just as fresh
+            logger.info("Credentials were updated by another worker, reloading them.")
+            self._load()
+            return
+        self.version = 1 if self.version is None else self.version + 1
+        self.saved_json = creds_json
+
+    def _schedule_refresh(self):
+        pass
@@ -1,40 +1,323 @@
+import asyncio
 import base64
-import requests
 import json
-from config.settings import ELEVENLABS_API_KEY, VOICE_ID
+import logging
+import re
+import secrets
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import ffmpeg
+from config.settings import (
+    ELEVENLABS_API_KEY, VOICE_ID, TTS_PIPELINE_WORKERS, HUGGING_FACE_INFERENCEAPI, ELEVENLABS_API_BASE, WHISPER_API_URL,
+    TTS_CACHE_MAX_CHARS, TTS_CACHE_MEMORY_BYTES, TTS_CACHE_DIR, TTS_CACHE_DISK_BYTES, AUDIO_CLIP_TTL, AUDIO_CLIP_CACHE_SIZE
+)
+from utils.async_http import get_async_client
+from utils.audio_cache import AudioCache, audio_cache_key
+from utils.cache import TieredCache
+from utils.lazy import LazyProxy
+from utils.metrics import span, submit
+from utils.limiter import limited_call, limited_call_async, limited_stream, limited_stream_async, raise_for_retryable, request_priority, UpstreamBusy, PRIORITY_BACKGROUND
 
-def text_to_speech(text):
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream/with-timestamps"
+logger = logging.getLogger(__name__)
+
+STT_SAMPLE_RATE = 16000
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+MIN_SENTENCE_CHARS = 20
+
+TTS_MODEL_ID = "eleven_turbo_v2"
+TTS_VOICE_SETTINGS = {
+    "stability": 0.7,
+    "similarity_boost": 0.7,
+    "style": 0.0,
+    "use_speaker_boost": False
+}
+
+tts_executor = ThreadPoolExecutor(max_workers=TTS_PIPELINE_WORKERS, thread_name_prefix="tts")
+
+def create_audio_cache():
+    return AudioCache(TTS_CACHE_MEMORY_BYTES, directory=TTS_CACHE_DIR, disk_bytes=TTS_CACHE_DISK_BYTES)
+
+# Scanning the disk tier is left to the first lookup, off the import path
+audio_cache = LazyProxy(create_audio_cache, "audio_cache")
+
+# Synthesized replies handed out by id; the bytes are only referenced, not copied, when also in audio_cache.
+# In shared worker mode they are also written to MongoDB, since /api/audio may reach another worker.
+audio_clips = TieredCache("audio", maxsize=AUDIO_CLIP_CACHE_SIZE, ttl=AUDIO_CLIP_TTL)
+
+def enable_shared_audio(collection):
+    audio_clips.attach(collection)
+
+def publish_audio(audio_bytes):
+    audio_id = secrets.token_urlsafe(16)
+    audio_clips.set(audio_id, audio_bytes)
+    return audio_id
+
+def get_audio(audio_id):
+    return audio_clips.get(audio_id)
+
+def tts_cache_key(text):
+    """Returns the audio cache key for text, or None when it is too long to be worth caching."""
+    if len(text) > TTS_CACHE_MAX_CHARS:
+        return None
+    return audio_cache_key(text, VOICE_ID, TTS_MODEL_ID, TTS_VOICE_SETTINGS)
+
+def cached_speech(key):
+    if key is None:
+        return None
+    with span("tts_cache"):
+        return audio_cache.get(key)
+
+def tts_request(text):
+    url = f"{ELEVENLABS_API_BASE}/v1/text-to-speech/{VOICE_ID}/stream/with-timestamps"
     headers = {
         "Content-Type": "application/json",
         "xi-api-key": ELEVENLABS_API_KEY
     }
     data = {
         "text": text,
-        "model_id": "eleven_turbo_v2",
-        "voice_settings": {
-            "stability": 0.7,
-            "similarity_boost": 0.7,
-            "style": 0.0,
-            "use_speaker_boost": False
-        }
+        "model_id": TTS_MODEL_ID,
+        "voice_settings": TTS_VOICE_SETTINGS
     }
+    return url, headers, data
+
+def open_speech_stream(text):
+    import requests
+
+    url, headers, data = tts_request(text)
     response = requests.post(
         url,
         json=data,
         headers=headers,
         stream=True
     )
+    raise_for_retryable(response)
     if response.status_code != 200:
-        return None
+        return
 
-    audio_bytes = b""
     for line in response.iter_lines():
         if line:
             json_string = line.decode("utf-8")
             response_dict = json.loads(json_string)
-            audio_bytes_chunk = base64.b64decode(response_dict["audio_base64"])
-            audio_bytes += audio_bytes_chunk
+            yield base64.b64decode(response_dict["audio_base64"])
+
+def stream_speech(text):
+    return limited_stream("elevenlabs", open_speech_stream, text)
+
+def synthesize(text):
+    key = tts_cache_key(text)
+    cached = cached_speech(key)
+    if cached:
+        return cached
+
+    audio_bytes = bytearray()
+    try:
+        with span("tts"):
+            for chunk in stream_speech(text):
+                audio_bytes += chunk
+    except UpstreamBusy as e:
+        # The reply is still shown as text
+        logger.warning(f"Skipping speech: {e}")
+        return b""
+    if key and audio_bytes:
+        audio_cache.set(key, bytes(audio_bytes))
+    return bytes(audio_bytes)
+
+def prewarm_speech(phrases):
+    """Synthesizes phrases that are not cached yet, so their first use is a cache hit."""
+    synthesized = 0
+    # Queued behind any user request waiting for ElevenLabs
+    token = request_priority.set(PRIORITY_BACKGROUND)
+    try:
+        for phrase in phrases:
+            key = tts_cache_key(phrase)
+            if key is None or audio_cache.get(key):
+                continue
+            try:
+                synthesize(phrase)
+                synthesized += 1
+            except Exception as e:
+                logger.error(f"Error pre-warming speech for {phrase!r}: {e}")
+    finally:
+        request_priority.reset(token)
+    logger.info(f"Speech cache pre-warm: synthesized {synthesized} of {len(phrases)} phrases")
+
+def text_to_speech(text):
+    """Synthesizes text and returns the id get_audio serves it under, or None."""
+    audio_bytes = synthesize(text)
+    if not audio_bytes:
+        return None
+    return publish_audio(audio_bytes)
+
+async def open_speech_stream_async(text):
+    url, headers, data = tts_request(text)
+    async with get_async_client().stream("POST", url, json=data, headers=headers) as response:
+        raise_for_retryable(response)
+        if response.status_code != 200:
+            return
+        async for line in response.aiter_lines():
+            if line:
+                response_dict = json.loads(line)
+                yield base64.b64decode(response_dict["audio_base64"])
+
+def stream_speech_async(text):
+    return limited_stream_async("elevenlabs", open_speech_stream_async, text)
+
+async def synthesize_async(text):
+    key = tts_cache_key(text)
+    # A miss can read the disk tier, so lookups and stores run off the event loop
+    cached = await asyncio.to_thread(cached_speech, key) if key else None
+    if cached:
+        return cached
+
+    audio_bytes = bytearray()
+    try:
+        with span("tts"):
+            async for chunk in stream_speech_async(text):
+                audio_bytes += chunk
+    except UpstreamBusy as e:
+        logger.warning(f"Skipping speech: {e}")
+        return b""
+    if key and audio_bytes:
+        await asyncio.to_thread(audio_cache.set, key, bytes(audio_bytes))
+    return bytes(audio_bytes)
+
+def wav_header(pcm_length, sample_rate=STT_SAMPLE_RATE, channels=1, sample_width=2):
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + pcm_length, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b'data', pcm_length
+    )
+
+def convert_to_wav(audio_bytes):
+    """Decodes an uploaded recording to 16 kHz mono 16-bit WAV bytes.
+
+    ffmpeg reads the upload from stdin and writes raw PCM to stdout, so
+    nothing touches the disk; the WAV header is written from the known
+    PCM length.
+    """
+    try:
+        with span("stt_convert"):
+            pcm, _ = (
+                ffmpeg
+                .input('pipe:0')
+                .output('pipe:1', format='s16le', acodec='pcm_s16le', ac=1, ar=STT_SAMPLE_RATE)
+                .global_args('-nostdin', '-loglevel', 'error')
+                .run(input=audio_bytes, capture_stdout=True, capture_stderr=True)
+            )
+    except ffmpeg.Error as e:
+        raise ValueError(f"Could not decode audio: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    return wav_header(len(pcm)) + pcm
+
+def whisper_headers():
+    return {"Authorization": f"Bearer {HUGGING_FACE_INFERENCEAPI}"}
+
+def post_whisper(wav_bytes):
+    import requests
+
+    response = requests.post(WHISPER_API_URL, headers=whisper_headers(), data=wav_bytes, timeout=60)
+    # Hugging Face answers 503 while the model is loading
+    raise_for_retryable(response)
+    return response.json()
+
+async def post_whisper_async(wav_bytes):
+    response = await get_async_client().post(WHISPER_API_URL, headers=whisper_headers(), content=wav_bytes, timeout=60)
+    raise_for_retryable(response)
+    return response.json()
+
+def transcribe(wav_bytes):
+    with span("stt_transcribe"):
+        return limited_call("huggingface", post_whisper, wav_bytes)
+
+async def transcribe_async(wav_bytes):
+    with span("stt_transcribe"):
+        return await limited_call_async("huggingface", post_whisper_async, wav_bytes)
+
+
+class SentenceBuffer:
+    """Collects streamed text and hands back finished sentences."""
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            # Very short fragments ("Hi.", "Dr.") are merged into the next sentence
+            if match.end() - start < self.min_chars:
+                continue
+            sentence = self.buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return [sentence] if sentence else []
+
+def submit_sentences(pipeline, sentences):
+    for sentence in sentences:
+        pipeline.submit(sentence)
+
+def finish_speech(pipeline, sentences, reply=None):
+    """Submits what is left in sentences. A reply that was never streamed (tool output, cached answers) replaces it and is spoken in full."""
+    if reply is not None:
+        sentences.flush()
+        submit_sentences(pipeline, sentences.feed(reply))
+    submit_sentences(pipeline, sentences.flush())
+
+
+class SpeechPipeline:
+    """Synthesizes sentences in the background and returns audio in submission order."""
+
+    def __init__(self, executor=tts_executor):
+        self.executor = executor
+        self.pending = deque()
+        self.seq = 0
+
+    def submit(self, sentence):
+        self.pending.append((self.seq, submit(self.executor, synthesize, sentence)))
+        self.seq += 1
+
+    def ready(self):
+        while self.pending and self.pending[0][1].done():
+            yield self._pop()
+
+    def drain(self):
+        while self.pending:
+            yield self._pop()
+
+    def _pop(self):
+        seq, future = self.pending.popleft()
+        try:
+            audio = future.result()
+        except Exception:
+            audio = b""
+        return seq, audio
+
+
+class AsyncSpeechPipeline(SpeechPipeline):
+    """SpeechPipeline counterpart that synthesizes on the event loop."""
+
+    def __init__(self):
+        super().__init__(executor=None)
+
+    def submit(self, sentence):
+        self.pending.append((self.seq, asyncio.ensure_future(synthesize_async(sentence))))
+        self.seq += 1
 
-    return base64.b64encode(audio_bytes).decode('utf-8')
-    
\ No newline at end of file
+    async def drain_async(self):
+        while self.pending:
+            seq, task = self.pending.popleft()
+            try:
+                yield seq, await task
+            except Exception:
+                yield seq, b""
@@ -0,0 +1,158 @@
+import math
+import logging
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import VAD_END_SILENCE_MS, VAD_THRESHOLD_RATIO, VAD_MIN_RMS, PARTIAL_TRANSCRIPT_INTERVAL_MS, CALL_TRANSCRIBE_WORKERS
+from services.speech_service import wav_header, transcribe, STT_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+SPEECH_START_FRAMES = 3
+PREROLL_MS = 300
+MAX_UTTERANCE_SECONDS = 30
+
+transcribe_executor = ThreadPoolExecutor(max_workers=CALL_TRANSCRIBE_WORKERS, thread_name_prefix="stt")
+
+def transcript_text(output):
+    if "text" not in output:
+        raise ValueError(f"Unexpected API response: {output}")
+    return output["text"].strip()
+
+def partial_transcript(wav_bytes):
+    # Partials are best effort; the final transcript is what the chat turn uses
+    try:
+        return transcript_text(transcribe(wav_bytes))
+    except Exception as e:
+        logger.debug(f"Partial transcription failed: {e}")
+        return None
+
+class EnergyVAD:
+    """Frame-level voice activity detection.
+
+    A frame counts as speech when its RMS is well above an adaptive
+    estimate of the background noise. Speech starts after a few voiced
+    frames in a row and ends after VAD_END_SILENCE_MS of silence.
+    """
+
+    def __init__(self, sample_rate=STT_SAMPLE_RATE, end_silence_ms=VAD_END_SILENCE_MS, threshold_ratio=VAD_THRESHOLD_RATIO, min_rms=VAD_MIN_RMS):
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+        self.end_frames = max(1, end_silence_ms // FRAME_MS)
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.noise_floor = None
+        self.voiced_run = 0
+        self.silent_run = 0
+        self.in_speech = False
+
+    def is_voiced(self, frame):
+        samples = array('h', frame)
+        rms = math.sqrt(sum(s * s for s in samples) / len(samples)) if samples else 0.0
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        voiced = rms > max(self.min_rms, self.noise_floor * self.threshold_ratio)
+        if not voiced:
+            # Track the background level only while nobody is talking
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return voiced
+
+    def process(self, frame):
+        """Returns "start", "end" or None for one frame of audio."""
+        voiced = self.is_voiced(frame)
+        if not self.in_speech:
+            self.voiced_run = self.voiced_run + 1 if voiced else 0
+            if self.voiced_run >= SPEECH_START_FRAMES:
+                self.in_speech = True
+                self.silent_run = 0
+                return "start"
+            return None
+
+        self.silent_run = 0 if voiced else self.silent_run + 1
+        if self.silent_run >= self.end_frames:
+            self.in_speech = False
+            self.voiced_run = 0
+            return "end"
+        return None
+
+
+class CallSession:
+    """Buffers streamed 16-bit mono PCM and reports turn boundaries.
+
+    feed() returns a list of events: "speech_start", "partial" when enough
+    new speech has accumulated for another partial transcript, and
+    "end_of_turn" once the speaker goes quiet. take_utterance() then hands
+    back the finished utterance as WAV bytes.
+
+    Partials only transcribe the audio since the previous one
+    (take_partial_audio) and add_partial() joins the pieces, so the
+    transcription work per utterance grows linearly with its length.
+    """
+
+    def __init__(self, sample_rate=STT_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.vad = EnergyVAD(sample_rate)
+        self.pending = bytearray()
+        self.preroll = deque(maxlen=max(1, PREROLL_MS // FRAME_MS))
+        self.utterance = bytearray()
+        self.partial_bytes = sample_rate * 2 * PARTIAL_TRANSCRIPT_INTERVAL_MS // 1000
+        self.max_bytes = sample_rate * 2 * MAX_UTTERANCE_SECONDS
+        self.last_partial = 0
+        self.partial_start = 0
+        self.partial_text = ""
+
+    @property
+    def in_speech(self):
+        return self.vad.in_speech
+
+    def feed(self, pcm):
+        events = []
+        self.pending += pcm
+        frame_bytes = self.vad.frame_bytes
+        while len(self.pending) >= frame_bytes:
+            frame = bytes(self.pending[:frame_bytes])
+            del self.pending[:frame_bytes]
+            was_speaking = self.vad.in_speech
+            transition = self.vad.process(frame)
+
+            if transition == "start":
+                # Keep the quiet lead-in so the first syllable isn't clipped
+                self.utterance = bytearray(b"".join(self.preroll))
+                self.utterance += frame
+                self.last_partial = 0
+                self.partial_start = 0
+                self.partial_text = ""
+                events.append("speech_start")
+            elif was_speaking:
+                self.utterance += frame
+                if transition == "end" or len(self.utterance) >= self.max_bytes:
+                    self.vad.in_speech = False
+                    events.append("end_of_turn")
+                elif len(self.utterance) - self.last_partial >= self.partial_bytes:
+                    self.last_partial = len(self.utterance)
+                    events.append("partial")
+            self.preroll.append(frame)
+        return events
+
+    def snapshot(self):
+        return wav_header(len(self.utterance), self.sample_rate) + bytes(self.utterance)
+
+    def take_partial_audio(self):
+        audio = bytes(self.utterance[self.partial_start:])
+        self.partial_start = len(self.utterance)
+        return wav_header(len(audio), self.sample_rate) + audio
+
+    def add_partial(self, text):
+        """Appends a partial transcript piece; returns the text so far, or None once the speaker stopped."""
+        if not self.in_speech:
+            return None
+        self.partial_text = f"{self.partial_text} {text}".strip()
+        return self.partial_text
+
+    def take_utterance(self):
+        wav = self.snapshot()
+        self.utterance = bytearray()
+        self.last_partial = 0
+        self.partial_start = 0
+        self.partial_text = ""
+        return wav
@@ -1,52 +1,440 @@
-from googleapiclient.discovery import build
-from bs4 import BeautifulSoup
-import requests
-from config.settings import GOOGLE_API_KEY, GOOGLE_CSE_ID
+import asyncio
+import codecs
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config.settings import (
+    GOOGLE_API_KEY, GOOGLE_CSE_ID, WEB_SEARCH_MODE, WEB_FETCH_WORKERS, WEB_FETCH_TIMEOUT, WEB_FETCH_MAX_BYTES, WEB_SEARCH_DEADLINE,
+    WEB_CACHE_SIZE, SEARCH_CACHE_TTL, PAGE_CACHE_TTL, PAGE_CACHE_MAX_AGE, SUMMARY_CACHE_TTL, CUSTOM_SEARCH_ENDPOINT
+)
+from utils.async_http import get_async_client
+from utils.cache import TieredCache
+from utils.html_extract import MainContentExtractor
+from utils.metrics import span, submit
+from utils.limiter import limited_call, limited_call_async, UpstreamBusy
+from services.google_service import customsearch_service
 
-def web_search(query: str, num_results: int = 3, groq_client=None) -> str:
-    try:
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-        res = service.cse().list(q=query, cx=GOOGLE_CSE_ID, num=num_results).execute()
+logger = logging.getLogger(__name__)
 
-        search_results = []
-        for item in res.get('items', []):
-            title = item.get('title', 'No title')
-            link = item.get('link', 'No link')
-            snippet = item.get('snippet', 'No snippet')
-            search_results.append({"title": title, "link": link, "snippet": snippet})
+CSE_URL = f"{CUSTOM_SEARCH_ENDPOINT.rstrip('/')}/customsearch/v1"
+PAGE_CHAR_BUDGET = 4000
+MIN_PAGE_CHARS = 200
+FETCH_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; Athen/1.0)", "Accept": "text/html,application/xhtml+xml"}
+FETCH_CHUNK_SIZE = 16384
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+SEARCH_BUSY_RESPONSE = "Web search is busy right now. Please try again in a moment."
 
-        if not search_results:
-            return "No results found."
+fetch_executor = ThreadPoolExecutor(max_workers=WEB_FETCH_WORKERS, thread_name_prefix="web-fetch")
+
+# Search results and summaries are keyed on the normalized query, pages on their URL.
+# Page entries outlive their freshness window so they can be revalidated with ETag/Last-Modified.
+search_cache = TieredCache("cse", maxsize=WEB_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+page_cache = TieredCache("page", maxsize=WEB_CACHE_SIZE, ttl=PAGE_CACHE_MAX_AGE)
+summary_cache = TieredCache("summary", maxsize=WEB_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+
+saved_calls = {"cse_requests": 0, "groq_calls": 0, "page_fetches": 0, "page_revalidations": 0}
+saved_calls_lock = threading.Lock()
+
+def enable_shared_cache(collection):
+    for cache in (search_cache, page_cache, summary_cache):
+        cache.attach(collection)
+
+def record_saving(**counts):
+    with saved_calls_lock:
+        for name, count in counts.items():
+            saved_calls[name] += count
+
+def web_cache_stats():
+    with saved_calls_lock:
+        saved = dict(saved_calls)
+    return {
+        "search": search_cache.stats(),
+        "pages": page_cache.stats(),
+        "summaries": summary_cache.stats(),
+        "saved": saved
+    }
+
+def normalize_query(query):
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+def search_cache_key(query, num_results):
+    return f"{normalize_query(query)}|{num_results}"
+
+def revalidation_headers(entry):
+    headers = dict(FETCH_HEADERS)
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def fresh_page(entry):
+    return entry is not None and entry["fresh_until"] > time.time()
+
+def cache_page(url, text, headers, entry=None):
+    page_cache.set(url, {
+        "text": text,
+        "etag": headers.get("ETag") or (entry or {}).get("etag"),
+        "last_modified": headers.get("Last-Modified") or (entry or {}).get("last_modified"),
+        "fresh_until": time.time() + PAGE_CACHE_TTL
+    })
+
+def parse_search_results(res):
+    search_results = []
+    for item in res.get('items', []):
+        title = item.get('title', 'No title')
+        link = item.get('link', 'No link')
+        snippet = item.get('snippet', 'No snippet')
+        search_results.append({"title": title, "link": link, "snippet": snippet})
+    return search_results
+
+def ranking_prompt(query, search_results):
+    analysis_prompt = f"Analyze these search results and determine which is most relevant to the query '{query}':\n"
+    for i, result in enumerate(search_results):
+        analysis_prompt += f"{i+1}. Title: {result['title']}\nSnippet: {result['snippet']}\n\n"
+    analysis_prompt += "Return only the number of the most relevant result. Look up for the similar words/terms in the link as the query for most priority. If the link is forbidden or any error or any less informative or less relevant website for the user request, then you must move to other links."
+    return analysis_prompt
+
+def summary_prompt(url, query, page_content):
+    return f"Based on the following content from {url}, provide a very short that so small which only should include important things and dont bore the user with much information and basic guiding. Just say only key things, concise and informative summary addressing the query '{query}':\n\n{page_content[:4000]}"
 
-        analysis_prompt = f"Analyze these search results and determine which is most relevant to the query '{query}':\n"
-        for i, result in enumerate(search_results):
-            analysis_prompt += f"{i+1}. Title: {result['title']}\nSnippet: {result['snippet']}\n\n"
-        analysis_prompt += "Return only the number of the most relevant result. Look up for the similar words/terms in the link as the query for most priority. If the link is forbidden or any error or any less informative or less relevant website for the user request, then you must move to other links."
+class PageReader:
+    """Feeds a downloading page into the extractor until it has enough text or hits the byte ceiling."""
 
-        analysis_response = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": analysis_prompt}],
+    def __init__(self, url, headers):
+        content_type = headers.get("Content-Type", "")
+        if content_type and content_type.split(";")[0].strip().lower() not in HTML_CONTENT_TYPES:
+            raise ValueError(f"Skipping non-HTML content at {url}: {content_type}")
+        from requests.utils import get_encoding_from_headers
+        charset = get_encoding_from_headers({"content-type": content_type}) if "charset" in content_type else "utf-8"
+        try:
+            self.decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.extractor = MainContentExtractor(max_chars=PAGE_CHAR_BUDGET)
+        self.received = 0
+        self.deadline = time.monotonic() + WEB_FETCH_TIMEOUT
+
+    def feed(self, chunk):
+        """Returns False once no more bytes are wanted."""
+        self.received += len(chunk)
+        self.extractor.feed(self.decoder.decode(chunk))
+        return not self.extractor.done and self.received < WEB_FETCH_MAX_BYTES and time.monotonic() < self.deadline
+
+    def text(self):
+        self.extractor.close()
+        return self.extractor.text()
+
+def parse_ranking(content, num_results):
+    try:
+        index = int(content.strip()) - 1
+    except ValueError:
+        return None
+    return index if 0 <= index < num_results else None
+
+def rank_results(groq_client, query, search_results):
+    with span("search_rank"):
+        analysis_response = limited_call(
+            "groq",
+            groq_client.chat.completions.create,
+            messages=[{"role": "user", "content": ranking_prompt(query, search_results)}],
             model="llama-3.1-70b-versatile",
             temperature=0.5,
             max_tokens=50,
         )
-        most_relevant_index = int(analysis_response.choices[0].message.content.strip()) - 1
-        most_relevant_url = search_results[most_relevant_index]['link']
+    return parse_ranking(analysis_response.choices[0].message.content, len(search_results))
+
+def fetch_page(url):
+    entry = page_cache.get(url)
+    if fresh_page(entry):
+        record_saving(page_fetches=1)
+        return entry["text"]
+
+    import requests
+
+    with span("search_page"), requests.get(url, headers=revalidation_headers(entry), timeout=WEB_FETCH_TIMEOUT, stream=True) as response:
+        if response.status_code == 304 and entry:
+            record_saving(page_revalidations=1)
+            cache_page(url, entry["text"], response.headers, entry)
+            return entry["text"]
+        response.raise_for_status()
+
+        reader = PageReader(url, response.headers)
+        for chunk in response.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+            if not reader.feed(chunk):
+                break
 
-        response = requests.get(most_relevant_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        page_content = soup.get_text()
+    text = reader.text()
+    cache_page(url, text, response.headers)
+    return text
 
-        summary_prompt = f"Based on the following content from {most_relevant_url}, provide a very short that so small which only should include important things and dont bore the user with much information and basic guiding. Just say only key things, concise and informative summary addressing the query '{query}':\n\n{page_content[:4000]}"
+def preference_order(preferred, num_results):
+    order = list(range(num_results))
+    if preferred is not None:
+        order.remove(preferred)
+        order.insert(0, preferred)
+    return order
 
-        summary_response = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": summary_prompt}],
+def search_settled(order, pages, failed):
+    """True once the most preferred page that did not fail has arrived."""
+    for index in order:
+        if index in failed:
+            continue
+        return index in pages
+    return True
+
+def combine_pages(order, pages, search_results):
+    """Joins arrived pages in preference order, returning (primary url, content) within the char budget."""
+    primary_url = None
+    parts = []
+    remaining = PAGE_CHAR_BUDGET
+    for index in order:
+        if index not in pages or remaining <= 0:
+            continue
+        url = search_results[index]['link']
+        primary_url = primary_url or url
+        text = " ".join(pages[index].split())[:remaining]
+        parts.append(text if not parts else f"\n\nFrom {url}:\n{text}")
+        remaining -= len(text)
+    return primary_url, "".join(parts)
+
+def store_page(pages, failed, index, text):
+    if text and len(text.strip()) >= MIN_PAGE_CHARS:
+        pages[index] = text
+    else:
+        failed.add(index)
+
+def fetch_candidates(groq_client, query, search_results):
+    """Ranks results while fetching every candidate page concurrently.
+
+    Stops as soon as the best ranked page that did not fail has arrived, or
+    at WEB_SEARCH_DEADLINE, and returns whatever pages came in by then.
+    """
+    deadline = time.monotonic() + WEB_SEARCH_DEADLINE
+    rank_future = submit(fetch_executor, rank_results, groq_client, query, search_results)
+    page_futures = {submit(fetch_executor, fetch_page, result['link']): i for i, result in enumerate(search_results)}
+
+    pages, failed = {}, set()
+    preferred = None
+    pending = set(page_futures) | {rank_future}
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future is rank_future:
+                try:
+                    preferred = future.result()
+                except Exception as e:
+                    logger.warning(f"Ranking search results failed: {e}")
+                continue
+            index = page_futures[future]
+            try:
+                store_page(pages, failed, index, future.result())
+            except Exception as e:
+                logger.debug(f"Fetching {search_results[index]['link']} failed: {e}")
+                failed.add(index)
+        if not rank_future.done():
+            continue
+        if search_settled(preference_order(preferred, len(search_results)), pages, failed):
+            break
+
+    for future in pending:
+        future.cancel()
+    return combine_pages(preference_order(preferred, len(search_results)), pages, search_results)
+
+def summarize(groq_client, url, query, page_content):
+    with span("search_summarize"):
+        summary_response = limited_call(
+            "groq",
+            groq_client.chat.completions.create,
+            messages=[{"role": "user", "content": summary_prompt(url, query, page_content)}],
             model="llama-3.1-70b-versatile",
             temperature=0.7,
             max_tokens=1000,
         )
+    return summary_response.choices[0].message.content.strip()
+
+def web_search(query: str, num_results: int = 3, groq_client=None) -> str:
+    try:
+        cache_key = search_cache_key(query, num_results)
+        cached_summary = summary_cache.get(cache_key)
+        if cached_summary:
+            record_saving(cse_requests=1, groq_calls=2)
+            return cached_summary
+
+        search_results = search_cache.get(cache_key)
+        if search_results is None:
+            with span("search_cse"):
+                res = limited_call("google_cse", customsearch_service().cse().list(q=query, cx=GOOGLE_CSE_ID, num=num_results).execute)
+            search_results = parse_search_results(res)
+            search_cache.set(cache_key, search_results)
+        else:
+            record_saving(cse_requests=1)
+
+        if not search_results:
+            return "No results found."
+
+        if WEB_SEARCH_MODE == "concurrent":
+            with span("search_fetch"):
+                most_relevant_url, page_content = fetch_candidates(groq_client, query, search_results)
+            if not most_relevant_url:
+                return "I couldn't load any of the search results in time. Please try again."
+        else:
+            with span("search_rank"):
+                analysis_response = limited_call(
+                    "groq",
+                    groq_client.chat.completions.create,
+                    messages=[{"role": "user", "content": ranking_prompt(query, search_results)}],
+                    model="llama-3.1-70b-versatile",
+                    temperature=0.5,
+                    max_tokens=50,
+                )
+            most_relevant_index = int(analysis_response.choices[0].message.content.strip()) - 1
+            most_relevant_url = search_results[most_relevant_index]['link']
+            page_content = fetch_page(most_relevant_url)
+
+        summary = summarize(groq_client, most_relevant_url, query, page_content)
+
+        result = f"Based on information from {most_relevant_url}:\n\n{summary}"
+        summary_cache.set(cache_key, result)
+        return result
+
+    except UpstreamBusy:
+        return SEARCH_BUSY_RESPONSE
+    except Exception as e:
+        return f"An error occurred while searching and analyzing: {str(e)}"
+
+async def cse_request_async(query, num_results):
+    res = await get_async_client().get(CSE_URL, params={"key": GOOGLE_API_KEY, "cx": GOOGLE_CSE_ID, "q": query, "num": num_results})
+    res.raise_for_status()
+    return res.json()
+
+async def rank_results_async(groq_client, query, search_results):
+    with span("search_rank"):
+        analysis_response = await limited_call_async(
+            "groq",
+            groq_client.chat.completions.create,
+            messages=[{"role": "user", "content": ranking_prompt(query, search_results)}],
+            model="llama-3.1-70b-versatile",
+            temperature=0.5,
+            max_tokens=50,
+        )
+    return parse_ranking(analysis_response.choices[0].message.content, len(search_results))
+
+async def cache_get_async(cache, key):
+    # Only the shared tier does network I/O
+    if cache.collection is None:
+        return cache.get(key)
+    return await asyncio.to_thread(cache.get, key)
+
+async def cache_set_async(cache, key, value):
+    if cache.collection is None:
+        return cache.set(key, value)
+    await asyncio.to_thread(cache.set, key, value)
+
+async def fetch_page_async(url):
+    entry = await cache_get_async(page_cache, url)
+    if fresh_page(entry):
+        record_saving(page_fetches=1)
+        return entry["text"]
+
+    with span("search_page"):
+        async with get_async_client().stream("GET", url, headers=revalidation_headers(entry), timeout=WEB_FETCH_TIMEOUT) as response:
+            if response.status_code == 304 and entry:
+                record_saving(page_revalidations=1)
+                await asyncio.to_thread(cache_page, url, entry["text"], response.headers, entry)
+                return entry["text"]
+            response.raise_for_status()
+
+            reader = PageReader(url, response.headers)
+            async for chunk in response.aiter_bytes(FETCH_CHUNK_SIZE):
+                if not reader.feed(chunk):
+                    break
+
+    text = reader.text()
+    await asyncio.to_thread(cache_page, url, text, response.headers)
+    return text
+
+async def fetch_candidates_async(groq_client, query, search_results):
+    """Async counterpart of fetch_candidates."""
+    deadline = time.monotonic() + WEB_SEARCH_DEADLINE
+    rank_task = asyncio.ensure_future(rank_results_async(groq_client, query, search_results))
+    page_tasks = {asyncio.ensure_future(fetch_page_async(result['link'])): i for i, result in enumerate(search_results)}
+
+    pages, failed = {}, set()
+    preferred = None
+    pending = set(page_tasks) | {rank_task}
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for task in done:
+            if task is rank_task:
+                try:
+                    preferred = task.result()
+                except Exception as e:
+                    logger.warning(f"Ranking search results failed: {e}")
+                continue
+            index = page_tasks[task]
+            try:
+                store_page(pages, failed, index, task.result())
+            except Exception as e:
+                logger.debug(f"Fetching {search_results[index]['link']} failed: {e}")
+                failed.add(index)
+        if not rank_task.done():
+            continue
+        if search_settled(preference_order(preferred, len(search_results)), pages, failed):
+            break
+
+    for task in pending:
+        task.cancel()
+    return combine_pages(preference_order(preferred, len(search_results)), pages, search_results)
+
+async def web_search_async(query: str, num_results: int = 3, groq_client=None) -> str:
+    """Async counterpart of web_search; groq_client must be an AsyncGroq client."""
+    try:
+        cache_key = search_cache_key(query, num_results)
+        cached_summary = await cache_get_async(summary_cache, cache_key)
+        if cached_summary:
+            record_saving(cse_requests=1, groq_calls=2)
+            return cached_summary
+
+        search_results = await cache_get_async(search_cache, cache_key)
+        if search_results is None:
+            with span("search_cse"):
+                res = await limited_call_async("google_cse", cse_request_async, query, num_results)
+            search_results = parse_search_results(res)
+            await cache_set_async(search_cache, cache_key, search_results)
+        else:
+            record_saving(cse_requests=1)
+
+        if not search_results:
+            return "No results found."
+
+        with span("search_fetch"):
+            most_relevant_url, page_content = await fetch_candidates_async(groq_client, query, search_results)
+        if not most_relevant_url:
+            return "I couldn't load any of the search results in time. Please try again."
+
+        with span("search_summarize"):
+            summary_response = await limited_call_async(
+                "groq",
+                groq_client.chat.completions.create,
+                messages=[{"role": "user", "content": summary_prompt(most_relevant_url, query, page_content)}],
+                model="llama-3.1-70b-versatile",
+                temperature=0.7,
+                max_tokens=1000,
+            )
         summary = summary_response.choices[0].message.content.strip()
 
-        return f"Based on information from {most_relevant_url}:\n\n{summary}"
+        result = f"Based on information from {most_relevant_url}:\n\n{summary}"
+        await cache_set_async(summary_cache, cache_key, result)
+        return result
 
+    except UpstreamBusy:
+        return SEARCH_BUSY_RESPONSE
     except Exception as e:
-        return f"An error occurred while searching and analyzing: {str(e)}" 
\ No newline at end of file
+        return f"An error occurred while searching and analyzing: {str(e)}"
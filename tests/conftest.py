@@ -0,0 +1,5 @@
+import os
+
+# Clients and the MongoDB bootstrap are created on first use, which the tests replace
+os.environ.setdefault("STARTUP_INIT", "lazy")
+os.environ.setdefault("TTS_CACHE_DISK_BYTES", "0")
@@ -0,0 +1,133 @@
+import datetime as dt
+import pytest
+from googleapiclient.errors import HttpError
+from managers.calendar_index import CalendarIndex
+from managers.scheduling_manager import SchedulingManager
+
+
+def utc(hours):
+    return (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=hours)).isoformat()
+
+
+def event(event_id, summary, start_hours, end_hours):
+    return {"id": event_id, "summary": summary, "start": {"dateTime": utc(start_hours)}, "end": {"dateTime": utc(end_hours)}}
+
+
+class FakeRequest:
+    def __init__(self, result=None, error=None):
+        self.result, self.error = result, error
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class FakeEvents:
+    """Serves calendar pages and records list parameters and deletions."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.listed = []
+        self.deleted = []
+
+    def list(self, **params):
+        self.listed.append(params)
+        page = self.pages.pop(0)
+        return FakeRequest(error=page) if isinstance(page, Exception) else FakeRequest(page)
+
+    def delete(self, calendarId, eventId):
+        self.deleted.append(eventId)
+        return FakeRequest({})
+
+
+class FakeService:
+    def __init__(self, *pages):
+        self._events = FakeEvents(pages)
+
+    def events(self):
+        return self._events
+
+
+class FakeCredentials:
+    def get(self):
+        return None
+
+
+def http_error(status):
+    class Resp(dict):
+        reason = "error"
+    resp = Resp()
+    resp.status = status
+    return HttpError(resp, b"")
+
+
+def test_sync_pages_then_applies_incremental_changes():
+    service = FakeService(
+        {"items": [event("a", "Standup", 1, 2)], "nextPageToken": "p2"},
+        {"items": [event("b", "Review", 3, 4)], "nextSyncToken": "s1"},
+        {"items": [{"id": "a", "status": "cancelled"}, event("b", "Design review", 5, 6)], "nextSyncToken": "s2"},
+    )
+    index = CalendarIndex(sync_interval=0)
+    index.sync(service)
+    assert [e["id"] for e in index.range(dt.datetime.now(dt.timezone.utc))] == ["a", "b"]
+    index.sync(service)
+    assert service.events().listed[-1]["syncToken"] == "s1"
+    assert [e["summary"] for e in index.range(dt.datetime.now(dt.timezone.utc))] == ["Design review"]
+    assert index.find_by_summary("review") is None and index.find_by_summary("design review")["id"] == "b"
+
+
+def test_expired_sync_token_runs_a_full_sync():
+    service = FakeService(
+        {"items": [event("a", "Old", 1, 2)], "nextSyncToken": "s1"},
+        http_error(410),
+        {"items": [event("b", "New", 1, 2)], "nextSyncToken": "s2"},
+    )
+    index = CalendarIndex(sync_interval=0)
+    index.sync(service)
+    index.sync(service)
+    assert "syncToken" not in service.events().listed[-1]
+    assert index.get("a") is None and index.get("b") is not None
+
+
+def test_range_and_lookup_include_events_in_progress():
+    index = CalendarIndex()
+    index.apply(event("long", "Workshop", -3, 2))
+    index.apply(event("done", "Lunch", -2, -1))
+    index.apply(event("next", "Dinner", 4, 5))
+    now = dt.datetime.now(dt.timezone.utc)
+    assert [e["id"] for e in index.range(now)] == ["long", "next"]
+    assert [e["id"] for e in index.range(now, limit=1)] == ["long"]
+    assert index.find_by_summary("workshop", after=now)["id"] == "long"
+    assert index.find_by_summary("lunch", after=now) is None
+
+
+@pytest.fixture
+def manager():
+    return SchedulingManager(credentials=FakeCredentials(), calendar_sync_interval=0)
+
+
+def test_delete_takes_the_soonest_exact_match(manager):
+    service = FakeService({"items": [event("late", "Gym", 5, 6), event("early", "gym", 1, 2), event("other", "Gym class", 2, 3)], "nextSyncToken": "s1"})
+    deleted, candidates = manager.delete_event(service, "GYM")
+    assert deleted["id"] == "early" and candidates == []
+    assert service.events().deleted == ["early"]
+    assert manager.calendar_index.get("early") is None
+
+
+def test_delete_does_not_guess_between_close_matches(manager):
+    service = FakeService(
+        {"items": [event("a", "Team sync", 1, 2), event("b", "Team social", 3, 4)], "nextSyncToken": "s1"},
+        {"items": [], "nextSyncToken": "s2"},
+    )
+    deleted, candidates = manager.delete_event(service, "team")
+    assert deleted is None and [e["id"] for e in candidates] == ["a", "b"]
+    assert service.events().deleted == []
+    deleted, candidates = manager.delete_event(service, "team synk")
+    assert deleted["id"] == "a" and candidates == []
+
+
+def test_delete_reports_nothing_for_unknown_or_finished_events(manager):
+    service = FakeService({"items": [event("a", "Breakfast", -3, -2)], "nextSyncToken": "s1"})
+    assert manager.delete_event(service, "breakfast") == (None, [])
+    assert service.events().deleted == []
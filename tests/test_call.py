@@ -0,0 +1,106 @@
+import json
+import threading
+from array import array
+from simple_websocket import ConnectionClosed
+import app
+from services.voice_stream import CallSession, FRAME_MS
+
+RATE = 16000
+
+
+def frames(count, amplitude):
+    return [array('h', [amplitude, -amplitude] * (RATE * FRAME_MS // 2000)).tobytes() for _ in range(count)]
+
+
+def speech(ms):
+    return frames(ms // FRAME_MS, 4000)
+
+
+def silence(ms):
+    return frames(ms // FRAME_MS, 0)
+
+
+def test_partials_transcribe_only_new_audio():
+    session = CallSession(RATE)
+    for frame in silence(300) + speech(600):
+        session.feed(frame)
+    first = session.take_partial_audio()
+    for frame in speech(300):
+        session.feed(frame)
+    second = session.take_partial_audio()
+    assert len(first) - 44 + len(second) - 44 == len(session.utterance)
+    assert session.add_partial("hello") == "hello"
+    assert session.add_partial("there") == "hello there"
+    assert "end_of_turn" in [event for frame in silence(900) for event in session.feed(frame)]
+    session.take_utterance()
+    assert session.partial_text == "" and session.add_partial("late") is None
+
+
+class FakeSocket:
+    """Replays client messages, then waits for the test before hanging up."""
+
+    def __init__(self, messages, hang_up):
+        self.messages = list(messages)
+        self.hang_up = hang_up
+        self.sent = []
+
+    def receive(self, timeout=None):
+        if self.messages:
+            return self.messages.pop(0)
+        if self.hang_up.wait(timeout):
+            raise ConnectionClosed()
+        return None
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_call_keeps_receiving_during_a_turn_and_handles_barge_in(monkeypatch):
+    turn_started = threading.Event()
+    hang_up = threading.Event()
+    outcome = {}
+
+    def fake_turn(ws, wav_bytes, is_speech, interrupted):
+        turn_started.set()
+        # Only set if the receive loop kept running while this turn was busy
+        outcome["interrupted"] = interrupted.wait(5)
+        hang_up.set()
+
+    monkeypatch.setattr(app, "run_call_turn", fake_turn)
+    monkeypatch.setattr(app, "partial_transcript", lambda wav: None)
+    first_turn = silence(300) + speech(600) + silence(900)
+    ws = FakeSocket([json.dumps({"type": "start", "sample_rate": RATE})] + first_turn, hang_up)
+    threading.Thread(target=lambda: (turn_started.wait(5), ws.messages.extend(speech(300)))).start()
+
+    # Sock.route only registers the view; the handler itself is what it wraps
+    app.app.view_functions["call"].__wrapped__(ws)
+
+    assert outcome["interrupted"]
+    types = [message["type"] for message in ws.sent]
+    assert types.count("speech_start") == 2 and "interrupted" in types
+
+
+def test_interrupted_turn_stops_sending_and_keeps_the_partial_reply(monkeypatch):
+    written = []
+    interrupted = threading.Event()
+
+    def fake_events(user_input, is_speech):
+        try:
+            yield "token", {"text": "First."}
+            interrupted.set()
+            yield "token", {"text": "Second."}
+            yield "done", {"response": "First. Second."}
+        finally:
+            written.append("saved")
+
+    class History:
+        def add_message(self, role, content):
+            pass
+
+    monkeypatch.setattr(app, "transcribe", lambda wav: {"text": "hi"})
+    monkeypatch.setattr(app, "chat_events", fake_events)
+    monkeypatch.setattr(app, "history_manager", History())
+    ws = FakeSocket([], threading.Event())
+    app.run_call_turn(ws, b"", True, interrupted)
+    assert [message["type"] for message in ws.sent] == ["final", "token"]
+    assert written == ["saved"]
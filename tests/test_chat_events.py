@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+import app
+import asgi
+import services.speech_service as speech_service
+
+
+def delta_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None, function_call=None))])
+
+
+class FakeCompletions:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def create(self, **kwargs):
+        return iter([delta_chunk(text) for text in self.chunks])
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **kwargs):
+        async def stream():
+            for text in self.chunks:
+                yield delta_chunk(text)
+        return stream()
+
+
+class FakeHistory:
+    def __init__(self):
+        self.messages = []
+
+    def get_recent_context(self, limit=None):
+        return []
+
+    def add_message(self, role, content):
+        self.messages.append((role, content))
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    spoken = []
+    monkeypatch.setattr(app, "history_manager", FakeHistory())
+    monkeypatch.setattr(app, "response_cache", None)
+    monkeypatch.setattr(app, "route_intent", lambda user_input: None)
+    monkeypatch.setattr(speech_service, "synthesize", lambda sentence: spoken.append(sentence) or sentence.encode())
+
+    def run(chunks):
+        monkeypatch.setattr(app, "groq_client", SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(chunks))))
+        return list(app.chat_events("why is the sky blue?", is_speech=True))
+
+    run.spoken = spoken
+    return run
+
+
+def test_streamed_voice_turn_is_spoken(chat):
+    events = chat(['{"', 'response', '":', ' "', 'Sunlight scatters off air molecules.', ' Blue light scatters the most."}'])
+    assert [data["text"] for event, data in events if event == "token"] == [
+        "Sunlight scatters off air molecules.", " Blue light scatters the most."
+    ]
+    assert chat.spoken == ["Sunlight scatters off air molecules.", "Blue light scatters the most."]
+    assert sum(event == "audio" for event, _ in events) == 2
+
+
+def test_fallback_reply_is_spoken(chat):
+    # Not a {"response": ...} payload and not a tool call, so the raw content is the reply
+    events = chat(['{"answer": "Rayleigh scattering makes the sky look blue."}'])
+    reply = '{"answer": "Rayleigh scattering makes the sky look blue."}'
+    assert ("token", {"text": reply}) in events
+    assert " ".join(chat.spoken) == reply
+    assert any(event == "audio" for event, _ in events)
+    assert events[-1] == ("done", {"response": reply})
+
+
+def test_fallback_reply_is_spoken_async(monkeypatch):
+    spoken = []
+
+    async def synthesize_async(sentence):
+        spoken.append(sentence)
+        return sentence.encode()
+
+    reply = '{"answer": "Rayleigh scattering makes the sky look blue."}'
+    history = FakeHistory()
+    monkeypatch.setattr(app, "history_manager", history)
+    monkeypatch.setattr(asgi, "history_manager", history)
+    monkeypatch.setattr(app, "response_cache", None)
+    monkeypatch.setattr(asgi, "route_intent", lambda user_input: None)
+    monkeypatch.setattr(speech_service, "synthesize_async", synthesize_async)
+    monkeypatch.setattr(asgi, "async_groq_client", SimpleNamespace(chat=SimpleNamespace(completions=FakeAsyncCompletions([reply]))))
+
+    async def run():
+        return [event async for event in asgi.chat_events_async("why is the sky blue?", is_speech=True)]
+
+    events = asyncio.run(run())
+    assert spoken == [reply]
+    assert any(event == "audio" for event, _ in events)
+
+
+def test_voice_reply_is_published_off_the_event_loop(monkeypatch):
+    threads = []
+
+    async def process_chat_async(user_input):
+        return {'llm_resp': "Rayleigh scattering."}
+
+    async def synthesize_async(text):
+        return text.encode()
+
+    def publish_audio(audio_bytes):
+        threads.append(threading.current_thread())
+        return "clip"
+
+    monkeypatch.setattr(asgi, "history_manager", FakeHistory())
+    monkeypatch.setattr(asgi, "process_chat_async", process_chat_async)
+    monkeypatch.setattr(asgi, "synthesize_async", synthesize_async)
+    monkeypatch.setattr(asgi, "publish_audio", publish_audio)
+
+    async def run():
+        response = await asgi.async_app.test_client().post("/api/chat", json={"message": "why is the sky blue?", "is_speech": True})
+        return await response.get_json(), threading.current_thread()
+
+    body, loop_thread = asyncio.run(run())
+    assert body["audio_url"].endswith("/clip")
+    assert threads and threads[0] is not loop_thread
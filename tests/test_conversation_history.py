@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from bson import ObjectId
+from managers.conversation_manager import ConversationHistoryManager
+
+START = datetime(2026, 10, 1, 9)
+
+
+def messages_for(day_index, count):
+    # Three messages share each timestamp, so only the id orders them
+    return [{
+        "_id": ObjectId(),
+        "role": "user",
+        "content": f"d{day_index}-m{i}",
+        "timestamp": START + timedelta(days=day_index, minutes=i // 3)
+    } for i in range(count)]
+
+
+def make_manager(per_message):
+    db = mongomock.MongoClient().db
+    manager = ConversationHistoryManager(db.conversations, messages_collection=db.messages if per_message else None)
+    expected = []
+    for day_index, count in enumerate([7, 0, 5, 8]):
+        messages = messages_for(day_index, count)
+        day = (START + timedelta(days=day_index)).date().isoformat()
+        if per_message:
+            if messages:
+                db.messages.insert_many([{"date": day, **message} for message in messages])
+        else:
+            db.conversations.insert_one({"date": day, "messages": messages})
+        expected += [message["content"] for message in messages]
+    return manager, expected
+
+
+@pytest.mark.parametrize("per_message", [False, True], ids=["day", "message"])
+def test_pages_walk_back_across_days_without_gaps(per_message):
+    manager, expected = make_manager(per_message)
+    pages, cursor = [], None
+    while True:
+        page, cursor = manager.get_history_page(4, before=cursor)
+        pages.append([message["content"] for message in page])
+        if cursor is None:
+            break
+    assert all(len(page) == 4 for page in pages[:-1])
+    assert [content for page in reversed(pages) for content in page] == expected
+
+
+@pytest.mark.parametrize("per_message", [False, True], ids=["day", "message"])
+def test_latest_page_cache_is_invalidated_by_writes(per_message):
+    manager, expected = make_manager(per_message)
+    page, _ = manager.get_history_page(2)
+    assert [message["content"] for message in page] == expected[-2:]
+    manager.add_message("assistant", "newest")
+    page, _ = manager.get_history_page(2)
+    assert [message["content"] for message in page] == [expected[-1], "newest"]
+
+
+def test_invalid_cursor_is_rejected():
+    manager, _ = make_manager(False)
+    for cursor in ("garbage", "2026-10-01|not-a-time|", "2026-10-01|2026-10-01T09:00:00|not-an-id"):
+        with pytest.raises(ValueError):
+            manager.get_history_page(4, before=cursor)
@@ -0,0 +1,19 @@
+from utils.html_extract import extract_main_text
+
+
+def test_prefers_article_over_leading_text():
+    html = "<html><body><p>Cookie banner</p><article><p>The real story.</p></article></body></html>"
+    assert extract_main_text(html) == "The real story."
+
+
+def test_long_intro_before_article_is_kept():
+    intro = "<p>" + "Introductory paragraph text. " * 200 + "</p>"
+    html = f"<html><body>{intro}<article><p>The real story.</p></article></body></html>"
+    text = extract_main_text(html, max_chars=4000)
+    assert text.startswith("Introductory paragraph text.")
+    assert len(text) == 4000
+
+
+def test_skips_boilerplate():
+    html = "<body><nav>Home | About</nav><script>var x = 1;</script><p>Body text</p><footer>Legal</footer></body>"
+    assert extract_main_text(html) == "Body text"
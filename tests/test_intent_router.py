@@ -0,0 +1,33 @@
+import pytest
+from utils.intent_router import IntentRouter
+
+router = IntentRouter()
+
+
+@pytest.mark.parametrize("text, name, args", [
+    ("remind me to buy milk", "add_reminder", {"reminder": "buy milk"}),
+    ("show my reminders", "get_active_reminders", {}),
+    ("mark buy milk as done", "complete_reminder", {"reminder_text": "buy milk"}),
+    ("complete the reminder pay rent", "complete_reminder", {"reminder_text": "pay rent"}),
+    ("I finished the reminder to call mom", "complete_reminder", {"reminder_text": "call mom"}),
+    ("I've completed my task water the plants.", "complete_reminder", {"reminder_text": "water the plants"}),
+    ("what's on my calendar", "get_upcoming_events", {"max_results": 10}),
+    ("show me my next three events", "get_upcoming_events", {"max_results": 3}),
+])
+def test_routes_simple_commands(text, name, args):
+    intent = router.route(text)
+    assert intent is not None
+    assert (intent.name, intent.args) == (name, args)
+
+
+@pytest.mark.parametrize("text", [
+    "I finished reading the book yesterday",
+    "I've done my homework",
+    "I completed the marathon!",
+    "I have finished the report for work",
+    "remind me to buy milk and then show my calendar",
+    "tell me a joke",
+    "schedule a meeting with john tomorrow at 5pm",
+])
+def test_leaves_conversation_to_the_llm(text):
+    assert router.route(text) is None
@@ -0,0 +1,120 @@
+import threading
+import time
+from email.utils import formatdate
+import pytest
+import utils.limiter as limiter_module
+from utils.limiter import (
+    AdaptiveLimiter, UpstreamBusy, parse_retry_after, retry_delay, limited_call,
+    PRIORITY_VOICE, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def allow_decrease(limiter):
+    limiter.last_decrease = 0.0
+
+
+def test_limit_grows_only_while_saturated():
+    limiter = AdaptiveLimiter("test", initial=2, minimum=1, maximum=3)
+    limiter.acquire()
+    limiter.record_success(0.1)
+    assert limiter.limit == 2
+    limiter.acquire()
+    limiter.record_success(0.1)
+    assert limiter.limit == 2.5
+    for _ in range(10):
+        limiter.record_success(0.1)
+    assert limiter.limit == 3
+
+
+def test_overload_halves_and_timeouts_shrink_at_most_once_per_latency():
+    limiter = AdaptiveLimiter("test", initial=8, minimum=2, maximum=16)
+    limiter.record_success(5.0)
+    limiter.record_overload()
+    assert limiter.limit == 4
+    limiter.record_overload()
+    assert limiter.limit == 4
+    allow_decrease(limiter)
+    assert retry_delay(limiter, TimeoutError(), 0) is None
+    assert limiter.limit == pytest.approx(3.6)
+    allow_decrease(limiter)
+    limiter.record_overload()
+    allow_decrease(limiter)
+    limiter.record_overload()
+    assert limiter.limit == 2
+
+
+def test_queued_calls_are_granted_by_priority_then_arrival():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+    granted = []
+
+    def call(name, priority):
+        limiter.acquire(priority, timeout=5)
+        granted.append(name)
+        limiter.release()
+
+    threads = []
+    for name, priority in [("background", PRIORITY_BACKGROUND), ("chat-1", PRIORITY_INTERACTIVE),
+                           ("voice", PRIORITY_VOICE), ("chat-2", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        while limiter.stats()["queued"] < len(threads):
+            time.sleep(0.001)
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+    assert granted == ["voice", "chat-1", "chat-2", "background"]
+
+
+def test_queue_timeout_raises_busy():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+    with pytest.raises(UpstreamBusy):
+        limiter.acquire(timeout=0.01)
+    assert limiter.stats()["queued"] == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert 25 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after_pauses_the_provider_and_delays_the_retry():
+    limiter = AdaptiveLimiter("test")
+    delay = retry_delay(limiter, StatusError(429, {"retry-after": "2"}), 0)
+    assert 2 <= delay <= 2 + limiter_module.UPSTREAM_RETRY_BASE_DELAY
+    assert 1.5 < limiter.pause_remaining() <= 2
+    with pytest.raises(UpstreamBusy):
+        retry_delay(limiter, StatusError(503, {"Retry-After": str(limiter_module.UPSTREAM_MAX_RETRY_DELAY + 1)}), 0)
+    assert retry_delay(limiter, StatusError(400), 0) is None
+
+
+def test_limited_call_retries_server_errors(monkeypatch):
+    monkeypatch.setattr(limiter_module, "UPSTREAM_LIMITER", True)
+    monkeypatch.setattr(limiter_module, "limiters", {})
+    monkeypatch.setattr(limiter_module.time, "sleep", lambda seconds: None)
+    responses = [StatusError(502), StatusError(500), "ok"]
+
+    def flaky():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limited_call("flaky", flaky) == "ok"
+    assert limiter_module.limiters["flaky"].stats()["in_flight"] == 0
+
+    monkeypatch.setattr(limiter_module, "UPSTREAM_MAX_RETRIES", 1)
+    with pytest.raises(UpstreamBusy):
+        limited_call("flaky", lambda: (_ for _ in ()).throw(StatusError(503)))
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from managers.reminder_manager import RemindersManager, ACTIVE, COMPLETED
+
+
+@pytest.fixture
+def manager():
+    return RemindersManager(mongomock.MongoClient().db.reminders)
+
+
+def test_bulk_add_and_complete(manager):
+    ids = manager.add_reminders(["Buy milk", "Pay rent", "Call mom"])
+    assert len(ids) == 3
+    assert manager.complete_reminders(reminder_texts=["buy milk.", "  PAY   rent"]) == 2
+    assert [r["reminder"] for r in manager.get_active_reminders()] == ["Call mom"]
+    assert manager.complete_reminders(reminder_ids=[ids[2], "not-an-id"]) == 1
+    assert manager.get_active_reminders() == []
+    assert manager.complete_reminders() == 0
+
+
+def test_complete_by_text_takes_the_oldest(manager):
+    first = manager.add_reminder("Water plants")
+    manager.add_reminder("water plants!")
+    assert manager.complete_reminder(reminder_text="WATER PLANTS")
+    active = manager.get_active_reminders()
+    assert len(active) == 1 and str(active[0]["_id"]) != first
+    assert not manager.complete_reminder(reminder_id="bad id")
+
+
+def test_cursor_pages_cover_ties_without_gaps(manager):
+    timestamp = datetime(2026, 10, 1)
+    docs = [{"reminder": f"r{i}", "normalized": f"r{i}", "flag": ACTIVE, "timestamp": timestamp + timedelta(minutes=i // 3)} for i in range(10)]
+    manager.reminders.insert_many(docs)
+    seen, cursor = [], None
+    while True:
+        page, cursor = manager.list_reminders(limit=4, cursor=cursor)
+        seen += [r["reminder"] for r in page]
+        if cursor is None:
+            break
+    assert seen == [f"r{i}" for i in range(10)]
+    assert manager.list_reminders(flag=COMPLETED)[0] == []
+    assert len(manager.list_reminders(limit=0)[0]) == 1
+
+
+def test_invalid_cursor(manager):
+    with pytest.raises(ValueError):
+        manager.list_reminders(cursor="2026-10-01T00:00:00|nope")
+
@@ -0,0 +1,45 @@
+import threading
+import app
+from utils.response_cache import ResponseCache
+
+
+def test_general_answers_are_cached_per_context():
+    cache = ResponseCache("prompt-a")
+    assert cache.store("What is the capital of France?", "Paris.")
+    assert cache.get("what is the capital of france") == "Paris."
+    assert ResponseCache("prompt-b").get("What is the capital of France?") is None
+
+
+def test_time_sensitive_and_follow_up_questions_are_skipped():
+    cache = ResponseCache("prompt")
+    assert not cache.store("What's the weather today?", "Sunny.")
+    assert not cache.store("Tell me more about it", "Sure.")
+    assert not cache.store("Who wrote Hamlet?", "Checked on Monday: Shakespeare.")
+    assert not cache.store("Who wrote Hamlet?", "")
+    assert cache.get("What's the weather today?") is None
+    assert cache.stats()["skipped"] == 1
+
+
+def test_skipped_count_is_exact_under_concurrency():
+    cache = ResponseCache("prompt")
+
+    def lookups():
+        for _ in range(2000):
+            cache.get("What is on my calendar?")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["skipped"] == 16000
+
+
+def test_fallback_and_failure_replies_are_not_stored(monkeypatch):
+    cache = ResponseCache("prompt")
+    monkeypatch.setattr(app, "response_cache", cache)
+    for reply in (app.parse_llm_content(""), app.BUSY_RESPONSE, app.ERROR_RESPONSE):
+        app.store_response("Who wrote Hamlet?", reply)
+        assert app.cached_response("Who wrote Hamlet?") is None
+    app.store_response("Who wrote Hamlet?", "Shakespeare.")
+    assert app.cached_response("Who wrote Hamlet?") == "Shakespeare."
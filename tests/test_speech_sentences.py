@@ -0,0 +1,39 @@
+from services.speech_service import SentenceBuffer, finish_speech, submit_sentences
+
+
+class RecordingPipeline:
+    def __init__(self):
+        self.sentences = []
+
+    def submit(self, sentence):
+        self.sentences.append(sentence)
+
+
+def test_cached_reply_is_spoken_in_full():
+    pipeline = RecordingPipeline()
+    reply = ("Plants take in carbon dioxide and water. Sunlight drives the reaction in the chloroplasts. "
+             "Oxygen is released as a byproduct.")
+    finish_speech(pipeline, SentenceBuffer(), reply)
+    assert pipeline.sentences == [
+        "Plants take in carbon dioxide and water.",
+        "Sunlight drives the reaction in the chloroplasts.",
+        "Oxygen is released as a byproduct."
+    ]
+
+
+def test_tool_reply_replaces_streamed_text():
+    pipeline = RecordingPipeline()
+    sentences = SentenceBuffer()
+    sentences.feed("Let me check your remin")
+    finish_speech(pipeline, sentences, "Here are your reminders:\n- pay rent\n- call the dentist\n- buy milk")
+    spoken = " ".join(" ".join(pipeline.sentences).split())
+    assert spoken == "Here are your reminders: - pay rent - call the dentist - buy milk"
+
+
+def test_streamed_reply_keeps_every_sentence():
+    pipeline = RecordingPipeline()
+    sentences = SentenceBuffer()
+    for chunk in ("The meeting is at ten. ", "Bring the quarterly ", "report with you. Thanks"):
+        submit_sentences(pipeline, sentences.feed(chunk))
+    finish_speech(pipeline, sentences)
+    assert pipeline.sentences == ["The meeting is at ten.", "Bring the quarterly report with you.", "Thanks"]
@@ -0,0 +1,42 @@
+import gzip
+from flask import Flask
+from utils.static_assets import StaticAssets
+
+app = Flask(__name__)
+
+
+def build(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<!doctype html><title>ATHEN</title>" + "<p>x</p>" * 200)
+    (tmp_path / "static" / "js" / "main.eabb8f19.js").write_text("console.log('athen');" * 100)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" * 10)
+    return StaticAssets(str(tmp_path), min_compress_bytes=256)
+
+
+def serve(assets, path, headers=None):
+    with app.test_request_context():
+        response = assets.response(assets.get(path), headers or {})
+        response.direct_passthrough = False
+        return response
+
+
+def test_identity_content_type_has_one_charset(tmp_path):
+    assets = build(tmp_path)
+    assert serve(assets, "index.html").headers["Content-Type"] == "text/html; charset=utf-8"
+    assert serve(assets, "static/js/main.eabb8f19.js").headers["Content-Type"] == "text/javascript; charset=utf-8"
+    assert serve(assets, "logo.png").headers["Content-Type"] == "image/png"
+
+
+def test_compressed_variant(tmp_path):
+    assets = build(tmp_path)
+    response = serve(assets, "static/js/main.eabb8f19.js", {"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Content-Type"] == "text/javascript; charset=utf-8"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert gzip.decompress(response.get_data()) == (tmp_path / "static" / "js" / "main.eabb8f19.js").read_bytes()
+
+
+def test_revalidation(tmp_path):
+    assets = build(tmp_path)
+    etag = serve(assets, "index.html").headers["ETag"]
+    assert serve(assets, "index.html", {"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,71 @@
+import json
+import pytest
+from utils.stream_parser import ResponseStreamParser, parse_tool_call
+
+
+def run(chunks):
+    parser = ResponseStreamParser()
+    streamed = "".join(parser.feed(chunk) for chunk in chunks)
+    streamed += parser.finish()
+    return parser, streamed
+
+
+def splits(content):
+    yield [content]
+    for i in range(1, len(content)):
+        yield [content[:i], content[i:]]
+    yield list(content)
+
+
+RESPONSE = '{"response": "Hello \\"world\\".\\nBye \\u00e9!"}'
+TOOL = '{"name": "add_reminder", "arguments": {"reminder": "buy milk"}}'
+
+
+def test_groq_tokens_stream_the_response():
+    parser = ResponseStreamParser()
+    out = [parser.feed(chunk) for chunk in ['{"', 'response', '":', ' "', 'Hello', ' world', '."}']]
+    assert out == ['', '', '', '', 'Hello', ' world', '.']
+    assert parser.kind == "response"
+    assert parser.tool_call() is None
+
+
+@pytest.mark.parametrize("chunks", list(splits(RESPONSE)))
+def test_response_payload_at_every_split(chunks):
+    parser, streamed = run(chunks)
+    assert parser.kind == "response"
+    assert streamed == json.loads(RESPONSE)["response"]
+    assert parser.tool_call() is None
+
+
+@pytest.mark.parametrize("chunks", list(splits(TOOL)))
+def test_tool_call_at_every_split(chunks):
+    parser, streamed = run(chunks)
+    assert streamed == ""
+    assert parser.tool_call() == ("add_reminder", {"reminder": "buy milk"})
+
+
+@pytest.mark.parametrize("content", ['{"response": {"text": "hi"}}', '{"responses": "hi"}'])
+def test_other_objects_are_held_back(content):
+    for chunks in splits(content):
+        parser, streamed = run(chunks)
+        assert streamed == ""
+        assert parser.kind == "tool"
+
+
+@pytest.mark.parametrize("chunks", list(splits('Sure, adding it. ' + TOOL)))
+def test_text_followed_by_tool_call(chunks):
+    parser, streamed = run(chunks)
+    assert streamed == "Sure, adding it. "
+    assert parser.tool_call() == ("add_reminder", {"reminder": "buy milk"})
+
+
+def test_plain_text_with_trailing_brace_is_shown():
+    parser, streamed = run(["Use {braces} ", "carefully"])
+    assert streamed == "Use {braces} carefully"
+
+
+def test_parse_tool_call_formats():
+    assert parse_tool_call('{"function": {"name": "x", "arguments": "{\\"a\\": 1}"}}') == ("x", {"a": 1})
+    assert parse_tool_call('{"name": "x", "parameters": {"b": 2}}') == ("x", {"b": 2})
+    assert parse_tool_call('{"response": "hi"}') is None
+    assert parse_tool_call("no json") is None
@@ -0,0 +1,21 @@
+from config.settings import ASYNC_HTTP_MAX_CONNECTIONS
+
+_client = None
+
+def get_async_client():
+    """Returns the shared httpx client used by the async request path."""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS, max_keepalive_connections=50),
+            follow_redirects=True
+        )
+    return _client
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
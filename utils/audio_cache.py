@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def audio_cache_key(text, voice_id, model_id, voice_settings):
+    """Content address of a synthesized clip: any change to the text or the voice gives a new key."""
+    payload = json.dumps([text, voice_id, model_id, voice_settings], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Synthesized speech keyed by audio_cache_key, in two tiers.
+
+    The memory tier is an LRU bounded by total bytes. The optional disk
+    tier keeps one file per clip under directory, written atomically, and
+    evicts the least recently read files once it grows past disk_bytes.
+    Disk hits are promoted to memory. Clips are stored exactly as
+    ElevenLabs returned them, so a hit is never re-encoded.
+    """
+
+    def __init__(self, memory_bytes, directory=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.directory = directory if directory and disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()
+        self.memory_size = 0
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.directory:
+            self.scan_disk()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def scan_disk(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Disabling disk audio cache, cannot create {self.directory}: {e}")
+            self.directory = None
+            return
+        for directory, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".mp3"):
+                    self.disk_size += os.path.getsize(os.path.join(directory, name))
+        self.evict_disk()
+
+    def get(self, key):
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        audio = self.read_disk(key)
+        with self.lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self.set_memory(key, audio)
+        return audio
+
+    def set(self, key, audio):
+        if not audio:
+            return
+        self.set_memory(key, audio)
+        self.write_disk(key, audio)
+
+    def set_memory(self, key, audio):
+        if len(audio) > self.memory_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.memory_size -= len(previous)
+            self.entries[key] = audio
+            self.memory_size += len(audio)
+            while self.memory_size > self.memory_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.memory_size -= len(evicted)
+
+    def read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            # Access time is often not updated (noatime), so mtime records recency for eviction
+            os.utime(path)
+            return audio
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Error reading cached audio {key}: {e}")
+            return None
+
+    def write_disk(self, key, audio):
+        if not self.directory or len(audio) > self.disk_bytes:
+            return
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing cached audio {key}: {e}")
+            return
+        with self.disk_lock:
+            self.disk_size += len(audio)
+        self.evict_disk()
+
+    def evict_disk(self):
+        with self.disk_lock:
+            if self.disk_size <= self.disk_bytes:
+                return
+            files = []
+            for directory, _, names in os.walk(self.directory):
+                for name in names:
+                    if not name.endswith(".mp3"):
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+            # Evict down to 90% so a full cache does not rescan the directory on every write
+            target = self.disk_bytes * 0.9
+            for _, size, path in files:
+                if self.disk_size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self.disk_size -= size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_entries": len(self.entries),
+                "memory_bytes": self.memory_size,
+                "disk": self.directory is not None,
+                "disk_bytes": self.disk_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
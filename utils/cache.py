@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class TieredCache:
+    """An in-process TTLCache in front of an optional MongoDB collection shared by all workers.
+
+    Shared entries carry an expires_at date so a TTL index can purge them.
+    """
+
+    def __init__(self, name, maxsize=256, ttl=300, collection=None):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.collection = None
+        self.shared_hits = 0
+        self.shared_misses = 0
+        if collection is not None:
+            self.attach(collection)
+
+    def attach(self, collection):
+        try:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.error(f"Error creating TTL index for {self.name} cache: {e}")
+        self.collection = collection
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is not None or self.collection is None:
+            return default if value is None else value
+
+        try:
+            doc = self.collection.find_one({"_id": f"{self.name}:{key}", "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.error(f"Error reading {self.name} cache: {e}")
+            doc = None
+        if doc is None:
+            self.shared_misses += 1
+            return default
+
+        self.shared_hits += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        self.local.set(key, doc["value"], ttl=max(0, remaining))
+        return doc["value"]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=ttl)
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {"_id": f"{self.name}:{key}"},
+                {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error writing {self.name} cache: {e}")
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["shared"] = self.collection is not None
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_misses"] = self.shared_misses
+        return stats
@@ -46,9 +46,9 @@ function_tools = [
         "parameters": {
             "type": "object",
             "properties": {
-                "reminder": {"type": "string"}
-            },
-            "required": ["reminder"]
+                "reminder": {"type": "string"},
+                "reminders": {"type": "array", "items": {"type": "string"}, "description": "Use instead of reminder to add several reminders at once"}
+            }
         }
     },
     {
@@ -57,9 +57,9 @@ function_tools = [
         "parameters": {
             "type": "object",
             "properties": {
-                "reminder_text": {"type": "string"}
-            },
-            "required": ["reminder_text"]
+                "reminder_text": {"type": "string"},
+                "reminder_texts": {"type": "array", "items": {"type": "string"}, "description": "Use instead of reminder_text to complete several reminders at once"}
+            }
         }
     },
     {
@@ -85,4 +85,6 @@ function_tools = [
             "required": ["query"]
         }
     }
-] 
\ No newline at end of file
+] 
+# The same schemas in the tools format, which lets the model return several calls in one turn
+tool_definitions = [{"type": "function", "function": tool} for tool in function_tools]
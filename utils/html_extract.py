@@ -0,0 +1,81 @@
+from html.parser import HTMLParser
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe", "template", "button", "select"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table", "blockquote", "pre"}
+CONTENT_TAGS = {"main", "article"}
+
+class MainContentExtractor(HTMLParser):
+    """Streaming text extractor that drops boilerplate elements.
+
+    Feed it HTML as it downloads; once max_chars of visible text has been
+    collected `done` turns true and further input is ignored. Text seen
+    before the first <main>/<article> is discarded when one shows up,
+    unless the limit was already reached before it.
+    """
+
+    def __init__(self, max_chars=4000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+        self.in_content = False
+        self.done = False
+
+    def feed(self, data):
+        if not self.done:
+            super().feed(data)
+
+    def close(self):
+        if not self.done:
+            super().close()
+
+    def handle_starttag(self, tag, attrs):
+        # The rest of a chunk is still parsed after the limit is reached
+        if self.done:
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in CONTENT_TAGS and not self.in_content and self.skip_depth == 0:
+            self.in_content = True
+            self.parts = []
+            self.length = 0
+        elif tag in BLOCK_TAGS:
+            self._add("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self._add("\n")
+
+    def handle_data(self, data):
+        if self.skip_depth or self.done:
+            return
+        text = " ".join(data.split())
+        if text:
+            self._add(text + " ")
+
+    def _add(self, text):
+        if self.done:
+            return
+        if self.parts and text == "\n" and self.parts[-1].endswith("\n"):
+            return
+        self.parts.append(text)
+        self.length += len(text)
+        if self.length >= self.max_chars:
+            self.done = True
+
+    def text(self):
+        lines = (line.strip() for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)[:self.max_chars]
+
+
+def extract_main_text(html, max_chars=4000, chunk_size=16384):
+    extractor = MainContentExtractor(max_chars=max_chars)
+    for start in range(0, len(html), chunk_size):
+        extractor.feed(html[start:start + chunk_size])
+        if extractor.done:
+            return extractor.text()
+    extractor.close()
+    return extractor.text()
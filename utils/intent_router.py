@@ -0,0 +1,200 @@
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter, namedtuple
+from config.settings import INTENT_MIN_CONFIDENCE
+
+logger = logging.getLogger(__name__)
+
+Intent = namedtuple("Intent", ["name", "args", "confidence"])
+
+WORD_PATTERN = re.compile(r"[a-z']+")
+MAX_ROUTED_WORDS = 20
+# Anything chained or conditional is left to the LLM
+COMPOUND_PATTERN = re.compile(
+    r"\b(and then|and also|but|unless|if|after that|instead)\b|[;?].+"
+    r"|^(?:add|set|remind|mark|complete)\b.*?\b(?:reminder|me)\s+and\b"
+    r"|\b(?:and|then)\s+(?:show|list|get|add|remind|mark|complete|search|create|delete|schedule|tell|what)\b",
+    re.IGNORECASE
+)
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.lower())
+
+def command_frame(text, match):
+    # Free-text arguments are cut out so only the command wording is classified
+    spans = sorted(match.span(group) for group, value in match.groupdict().items() if value and group != "count")
+    frame, position = [], 0
+    for start, end in spans:
+        frame.append(text[position:start])
+        position = end
+    frame.append(text[position:])
+    return " ".join("".join(frame).split())
+
+def clean_argument(text):
+    return text.strip().strip("\"'").rstrip(".!").strip()
+
+def event_count(match):
+    count = match.groupdict().get("count")
+    if not count:
+        return 10
+    return int(count) if count.isdigit() else NUMBER_WORDS.get(count.lower(), 10)
+
+# (intent, compiled pattern, argument builder). Patterns must match the whole input.
+PATTERNS = [
+    ("get_active_reminders", re.compile(
+        r"^(?:please\s+)?(?:show|list|get|give|read|tell)(?:\s+me)?\s+(?:all\s+)?(?:of\s+)?my\s+(?:active\s+|pending\s+|current\s+)?(?:reminders|to-?dos?|to-?do list)(?:\s+please)?[.!]?$"
+        r"|^what(?:'s|\s+is|\s+are)\s+(?:on\s+)?my\s+(?:active\s+|pending\s+)?(?:reminders|to-?dos?|to-?do list)[.!?]?$"
+        r"|^(?:do\s+i\s+have\s+any\s+reminders|any\s+reminders)[.!?]?$", re.IGNORECASE),
+        lambda match: {}),
+    ("add_reminder", re.compile(
+        r"^(?:please\s+)?(?:remind\s+me\s+to|add\s+(?:a\s+)?reminder(?:\s+to)?|set\s+(?:a\s+)?reminder\s+to)\s+(?P<text>.+?)(?:\s+please)?[.!]?$", re.IGNORECASE),
+        lambda match: {"reminder": clean_argument(match.group("text"))}),
+    ("complete_reminder", re.compile(
+        r"^(?:please\s+)?(?:mark|set)\s+(?:the\s+)?(?:reminder\s+)?(?P<text>.+?)\s+as\s+(?:done|completed?|finished)[.!]?$"
+        r"|^(?:please\s+)?(?:complete|check\s+off)\s+(?:the\s+)?reminder\s+(?P<text2>.+?)[.!]?$"
+        # "I finished ..." alone is too common in conversation; a reminder or task must be named
+        r"|^i(?:\s+have|'ve)?\s+(?:finished|completed|done)\s+(?:the|my)\s+(?:reminder|task|to-?do)(?:\s+to|\s+about)?\s+(?P<text3>.+?)[.!]?$", re.IGNORECASE),
+        lambda match: {"reminder_text": clean_argument(match.group("text") or match.group("text2") or match.group("text3"))}),
+    ("get_upcoming_events", re.compile(
+        r"^(?:please\s+)?(?:show|list|get|give|tell)(?:\s+me)?\s+(?:the\s+)?(?:my\s+)?(?:next\s+(?P<count>\d+|one|two|three|four|five|six|seven|eight|nine|ten)\s+)?(?:upcoming\s+)?(?:events|meetings|calendar|schedule|appointments)(?:\s+please)?[.!]?$"
+        r"|^what(?:'s|\s+is)\s+(?:on\s+)?my\s+(?:calendar|schedule|agenda)(?:\s+(?:looking\s+like|today|this\s+week|coming\s+up))?[.!?]?$"
+        r"|^what(?:'s|\s+is|\s+are)\s+my\s+(?:upcoming|next)\s+(?:events|meetings|appointments)[.!?]?$"
+        r"|^(?:do\s+i\s+have\s+any|any)\s+(?:upcoming\s+)?(?:events|meetings|appointments)(?:\s+coming\s+up)?[.!?]?$", re.IGNORECASE),
+        lambda match: {"max_results": event_count(match)}),
+]
+
+# Training phrases for the classifier. "chat" covers everything the LLM should answer.
+EXAMPLES = {
+    "get_active_reminders": [
+        "show my reminders", "list my reminders", "what are my reminders", "what is on my to do list",
+        "show me my pending reminders", "do i have any reminders", "read my todo list",
+    ],
+    # Reminder texts are cut out before classifying, so these are command frames only
+    "add_reminder": [
+        "remind me to", "add a reminder to", "set a reminder to", "add reminder", "please remind me to",
+    ],
+    "complete_reminder": [
+        "mark as done", "i finished the reminder to", "i have completed the task", "complete the reminder",
+        "mark the reminder as completed", "check off reminder", "i've finished my reminder to", "mark as finished",
+        "i have done the task", "i've completed my task",
+    ],
+    "get_upcoming_events": [
+        "what's on my calendar", "show my upcoming events", "list my meetings", "what is my schedule",
+        "show me my next five events", "do i have any meetings", "what are my upcoming appointments",
+        "what's my schedule today", "any meetings coming up", "show me the events on my calendar",
+    ],
+    "chat": [
+        "what is the weather like", "tell me a joke", "how are you", "who won the match yesterday",
+        "schedule a meeting with john tomorrow at 5pm", "create an event for friday", "delete the team sync event",
+        "search the web for the latest news", "explain how reminders work", "why did my meeting get cancelled",
+        "what should i do today", "can you help me plan my week", "write an email to my manager",
+    ],
+}
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over word counts with add-one smoothing."""
+
+    def __init__(self, examples):
+        self.word_counts = {label: Counter(word for phrase in phrases for word in tokenize(phrase)) for label, phrases in examples.items()}
+        self.totals = {label: sum(counts.values()) for label, counts in self.word_counts.items()}
+        total_phrases = sum(len(phrases) for phrases in examples.values())
+        self.priors = {label: math.log(len(phrases) / total_phrases) for label, phrases in examples.items()}
+        self.vocabulary = set().union(*self.word_counts.values())
+
+    def predict(self, text):
+        """Returns (label, probability) of the most likely label."""
+        words = [word for word in tokenize(text) if word in self.vocabulary]
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for label, counts in self.word_counts.items():
+            denominator = self.totals[label] + vocabulary_size
+            scores[label] = self.priors[label] + sum(math.log((counts[word] + 1) / denominator) for word in words)
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / normalizer
+
+
+class IntentRouter:
+    """Answers trivial reminder and calendar commands without calling the LLM.
+
+    A request is routed only when a whole-input pattern matches and the
+    classifier independently picks the same intent with at least
+    INTENT_MIN_CONFIDENCE; everything else falls back to the LLM. Every
+    decision is counted so the hit rate and the time saved can be read
+    from stats().
+    """
+
+    def __init__(self, min_confidence=INTENT_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.classifier = NaiveBayesClassifier(EXAMPLES)
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.fallbacks = 0
+        self.route_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def match(self, user_input):
+        text = " ".join(user_input.split())
+        if not text or len(text.split()) > MAX_ROUTED_WORDS or COMPOUND_PATTERN.search(text):
+            return None, "not a simple command"
+
+        for name, pattern, build_args in PATTERNS:
+            match = pattern.match(text)
+            if not match:
+                continue
+            args = build_args(match)
+            if any(value == "" for value in args.values()):
+                return None, f"empty argument for {name}"
+            label, confidence = self.classifier.predict(command_frame(text, match))
+            if label != name:
+                return None, f"pattern {name} but classifier {label} ({confidence:.2f})"
+            if confidence < self.min_confidence:
+                return None, f"low confidence for {name} ({confidence:.2f})"
+            return Intent(name, args, confidence), None
+        return None, "no pattern"
+
+    def route(self, user_input):
+        start = time.perf_counter()
+        intent, reason = self.match(user_input)
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.route_seconds += elapsed
+            if intent:
+                self.hits[intent.name] += 1
+            else:
+                self.fallbacks += 1
+
+        if intent:
+            logger.info(f"Intent fast path hit: {intent.name} (confidence {intent.confidence:.2f}, {elapsed * 1000:.2f} ms)")
+        else:
+            logger.info(f"Intent fast path fallback: {reason} ({elapsed * 1000:.2f} ms)")
+        return intent
+
+    def record_llm_latency(self, seconds):
+        with self.lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def stats(self):
+        with self.lock:
+            hits = sum(self.hits.values())
+            turns = hits + self.fallbacks
+            avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0
+            return {
+                "turns": turns,
+                "hits": hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(hits / turns, 3) if turns else 0,
+                "hits_by_intent": dict(self.hits),
+                "avg_route_ms": round(self.route_seconds / turns * 1000, 3) if turns else 0,
+                "avg_llm_ms": round(avg_llm * 1000, 1),
+                "estimated_saved_s": round(hits * avg_llm, 2),
+            }
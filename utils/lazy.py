@@ -0,0 +1,56 @@
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyProxy:
+    """Stands in for an object that is created by factory() on first use.
+
+    Attribute access is forwarded to the real object, so module-level
+    clients and managers keep their names while their imports and network
+    setup move off the import path. Creation happens once, under a lock,
+    even when the first requests arrive concurrently.
+    """
+
+    def __init__(self, factory, name=None):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or factory.__name__)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_instance", None)
+
+    def _resolve(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+                    logger.info(f"Initialized {self._name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return instance
+
+    @property
+    def initialized(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self):
+        return f"<LazyProxy {self._name} {'initialized' if self.initialized else 'pending'}>"
+
+def warm_up(*proxies, strict=False):
+    """Resolves proxies in order. Unless strict, failures are logged and retried on first use."""
+    for proxy in proxies:
+        try:
+            proxy._resolve()
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"Warm-up of {proxy._name} failed: {e}")
@@ -0,0 +1,411 @@
+import time
+import heapq
+import random
+import asyncio
+import inspect
+import logging
+import itertools
+import threading
+import contextvars
+from email.utils import parsedate_to_datetime
+from config.settings import (
+    UPSTREAM_LIMITER, UPSTREAM_INITIAL_CONCURRENCY, UPSTREAM_MIN_CONCURRENCY, UPSTREAM_MAX_CONCURRENCY,
+    UPSTREAM_QUEUE_TIMEOUT, UPSTREAM_MAX_RETRIES, UPSTREAM_RETRY_BASE_DELAY, UPSTREAM_MAX_RETRY_DELAY
+)
+from utils.metrics import registry, record_stage
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first when calls are queued
+PRIORITY_VOICE = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+OVERLOAD_STATUSES = {429, 503}
+
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+upstream_retries_total = registry.counter("athen_upstream_retries_total", "Retried upstream calls, by provider and status.", ("provider", "status"))
+upstream_busy_total = registry.counter("athen_upstream_busy_total", "Upstream calls given up after queueing or retrying too long, by provider.", ("provider",))
+upstream_limit = registry.gauge("athen_upstream_concurrency_limit", "Adaptive concurrency limit, by provider.", ("provider",))
+upstream_in_flight = registry.gauge("athen_upstream_in_flight", "Upstream calls in progress, by provider.", ("provider",))
+upstream_queued = registry.gauge("athen_upstream_queued", "Upstream calls waiting for a slot, by provider.", ("provider",))
+
+def set_request_priority(priority):
+    request_priority.set(priority)
+
+
+class UpstreamBusy(Exception):
+    """A provider stayed rate limited or overloaded for longer than a call may wait."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} is busy ({reason})")
+        self.provider = provider
+
+
+class UpstreamStatusError(Exception):
+    """A retryable status from a client that does not raise on its own (requests, httpx)."""
+
+    def __init__(self, status_code, headers):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers
+
+def raise_for_retryable(response):
+    if response.status_code in RETRYABLE_STATUSES:
+        raise UpstreamStatusError(response.status_code, response.headers)
+    return response
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def error_status(error):
+    """Returns (HTTP status or None, Retry-After seconds or None) for an exception from a provider client."""
+    # Groq, httpx and requests errors carry .response; googleapiclient's HttpError carries .resp, an httplib2 dict
+    response = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "resp", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None) or getattr(response, "status", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None)
+    if headers is None and isinstance(response, dict):
+        headers = response
+    retry_after = (headers.get("retry-after") or headers.get("Retry-After")) if headers else None
+    return status, parse_retry_after(retry_after)
+
+
+class Waiter:
+    def __init__(self, priority, loop=None):
+        self.priority = priority
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.entry = None
+
+def resolve_waiter(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """Bounds the concurrent calls to one provider and learns the bound with AIMD.
+
+    While calls are being queued, each success raises the limit by
+    1/limit (about one slot per round trip). Only overload lowers it: a
+    429 or 503 halves it and a timeout cuts it by 10%. Latency alone is
+    not used, since one provider serves calls with very different normal
+    latencies. A Retry-After pauses new calls to the provider until it
+    has passed. Decreases happen at most once per average latency, so
+    one burst of errors does not collapse the limit.
+
+    Queued calls are granted slots lowest priority value first, then in
+    arrival order. Threads and asyncio tasks share the same queue.
+    """
+
+    def __init__(self, name, initial=UPSTREAM_INITIAL_CONCURRENCY, minimum=UPSTREAM_MIN_CONCURRENCY,
+                 maximum=UPSTREAM_MAX_CONCURRENCY):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.latency = None
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+        self.publish()
+
+    def publish(self):
+        upstream_limit.set(round(self.limit, 2), provider=self.name)
+        upstream_in_flight.set(self.in_flight, provider=self.name)
+        upstream_queued.set(len(self.waiters), provider=self.name)
+
+    def try_acquire(self):
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.publish()
+            return True
+        return False
+
+    def enqueue(self, waiter):
+        waiter.entry = (waiter.priority, next(self.sequence), waiter)
+        heapq.heappush(self.waiters, waiter.entry)
+        self.publish()
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=UPSTREAM_QUEUE_TIMEOUT):
+        """Blocks until a slot is free and returns the seconds spent queued. Raises UpstreamBusy on timeout."""
+        start = time.monotonic()
+        with self.lock:
+            if self.try_acquire():
+                return 0.0
+            waiter = Waiter(priority)
+            self.enqueue(waiter)
+        waiter.event.wait(timeout)
+        self.finish_wait(waiter)
+        return time.monotonic() - start
+
+    async def acquire_async(self, priority=PRIORITY_INTERACTIVE, timeout=UPSTREAM_QUEUE_TIMEOUT):
+        start = time.monotonic()
+        with self.lock:
+            if self.try_acquire():
+                return 0.0
+            waiter = Waiter(priority, loop=asyncio.get_running_loop())
+            self.enqueue(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self.abandon(waiter)
+            raise
+        self.finish_wait(waiter)
+        return time.monotonic() - start
+
+    def finish_wait(self, waiter):
+        # A slot granted right as the wait timed out is still taken
+        with self.lock:
+            if waiter.granted:
+                return
+            self.remove_waiter(waiter)
+        upstream_busy_total.inc(provider=self.name)
+        raise UpstreamBusy(self.name, "queue timeout")
+
+    def abandon(self, waiter):
+        with self.lock:
+            if not waiter.granted:
+                self.remove_waiter(waiter)
+                return
+        self.release()
+
+    def remove_waiter(self, waiter):
+        self.waiters.remove(waiter.entry)
+        heapq.heapify(self.waiters)
+        self.publish()
+
+    def grant_waiters(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self.waiters)
+            if waiter.future is None:
+                waiter.granted = True
+                self.in_flight += 1
+                waiter.event.set()
+                continue
+            try:
+                waiter.loop.call_soon_threadsafe(resolve_waiter, waiter.future)
+            except RuntimeError:
+                # The waiter's event loop is closed; nobody is left to use the slot
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+        self.publish()
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.grant_waiters()
+
+    def pause_remaining(self):
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def decrease(self, factor):
+        now = time.monotonic()
+        if now - self.last_decrease < (self.latency or 1.0):
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self.last_decrease = now
+
+    def record_success(self, latency):
+        with self.lock:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            # Only a limit that is actually reached says anything about the provider's capacity
+            if self.in_flight >= int(self.limit) or self.waiters:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.grant_waiters()
+
+    def record_overload(self, retry_after=None, factor=0.5):
+        with self.lock:
+            self.decrease(factor)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.publish()
+        logger.warning(f"{self.name} is overloaded, concurrency limit now {int(self.limit)}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queued": len(self.waiters),
+                "latency": self.latency,
+                "paused": self.pause_remaining()
+            }
+
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+def limiter_for(provider):
+    limiter = limiters.get(provider)
+    if limiter is None:
+        with limiters_lock:
+            limiter = limiters.get(provider)
+            if limiter is None:
+                limiter = limiters[provider] = AdaptiveLimiter(provider)
+    return limiter
+
+def is_timeout(error):
+    # requests, httpx and the Groq client each have their own timeout classes
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+def retry_delay(limiter, error, attempt):
+    """Seconds to wait before retrying error, or None if it is not retryable. Raises UpstreamBusy when out of retries."""
+    status, retry_after = error_status(error)
+    if status not in RETRYABLE_STATUSES:
+        if status is None and is_timeout(error):
+            limiter.record_overload(factor=0.9)
+        return None
+    if status in OVERLOAD_STATUSES:
+        limiter.record_overload(retry_after)
+    if attempt >= UPSTREAM_MAX_RETRIES or (retry_after or 0) > UPSTREAM_MAX_RETRY_DELAY:
+        upstream_busy_total.inc(provider=limiter.name)
+        raise UpstreamBusy(limiter.name, f"HTTP {status}") from error
+
+    upstream_retries_total.inc(provider=limiter.name, status=status)
+    # Full jitter, so callers that failed together don't retry together
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, UPSTREAM_RETRY_BASE_DELAY)
+    else:
+        delay = random.uniform(0, min(UPSTREAM_MAX_RETRY_DELAY, UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt))
+    logger.warning(f"{limiter.name} returned {status}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+    return delay
+
+def take_slot(limiter, provider):
+    time.sleep(limiter.pause_remaining())
+    waited = limiter.acquire(request_priority.get())
+    if waited:
+        record_stage(f"queue_{provider}", waited)
+
+async def take_slot_async(limiter, provider):
+    await asyncio.sleep(limiter.pause_remaining())
+    waited = await limiter.acquire_async(request_priority.get())
+    if waited:
+        record_stage(f"queue_{provider}", waited)
+
+def limited_call(provider, fn, *args, **kwargs):
+    """Calls fn within provider's concurrency limit, retrying rate limits and 5xx responses."""
+    if not UPSTREAM_LIMITER:
+        return fn(*args, **kwargs)
+    limiter = limiter_for(provider)
+    for attempt in itertools.count():
+        take_slot(limiter, provider)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+        else:
+            limiter.record_success(time.perf_counter() - start)
+            return result
+        finally:
+            limiter.release()
+        time.sleep(delay)
+
+def limited_stream(provider, fn, *args, **kwargs):
+    """limited_call for a function returning an iterator.
+
+    The slot is held until the iterator is exhausted or closed. Only
+    failures before the first item are retried, and latency is measured
+    to the first item.
+    """
+    if not UPSTREAM_LIMITER:
+        yield from fn(*args, **kwargs)
+        return
+    limiter = limiter_for(provider)
+    for attempt in itertools.count():
+        take_slot(limiter, provider)
+        start = time.perf_counter()
+        started = False
+        try:
+            for item in fn(*args, **kwargs):
+                if not started:
+                    started = True
+                    limiter.record_success(time.perf_counter() - start)
+                yield item
+            if not started:
+                limiter.record_success(time.perf_counter() - start)
+            return
+        except Exception as e:
+            if started:
+                raise
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+        finally:
+            limiter.release()
+        time.sleep(delay)
+
+async def limited_call_async(provider, fn, *args, **kwargs):
+    if not UPSTREAM_LIMITER:
+        return await fn(*args, **kwargs)
+    limiter = limiter_for(provider)
+    for attempt in itertools.count():
+        await take_slot_async(limiter, provider)
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+        else:
+            limiter.record_success(time.perf_counter() - start)
+            return result
+        finally:
+            limiter.release()
+        await asyncio.sleep(delay)
+
+async def limited_stream_async(provider, fn, *args, **kwargs):
+    """limited_stream for a function returning an async iterator, or a coroutine resolving to one."""
+    limiter = limiter_for(provider) if UPSTREAM_LIMITER else None
+    for attempt in itertools.count():
+        if limiter:
+            await take_slot_async(limiter, provider)
+        start = time.perf_counter()
+        started = False
+        try:
+            iterator = fn(*args, **kwargs)
+            if inspect.isawaitable(iterator):
+                iterator = await iterator
+            async for item in iterator:
+                if not started:
+                    started = True
+                    if limiter:
+                        limiter.record_success(time.perf_counter() - start)
+                yield item
+            if not started and limiter:
+                limiter.record_success(time.perf_counter() - start)
+            return
+        except Exception as e:
+            if started or not limiter:
+                raise
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+        finally:
+            if limiter:
+                limiter.release()
+        await asyncio.sleep(delay)
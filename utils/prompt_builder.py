@@ -0,0 +1,129 @@
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from config.settings import USER_NAME, USER_AGE, USER_OCCUPATION, USER_INTERESTS, PROMPT_CONTEXT_TOKENS
+from utils.function_tools import function_tools
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text):
+    # Words and punctuation track BPE token counts closely enough for budgeting
+    return len(TOKEN_PATTERN.findall(text or ""))
+
+def static_prefix():
+    tools_schema = json.dumps(function_tools, separators=(",", ":"))
+    return f"""You are 'Athen', a virtual personal assistant created to engage and satisfy {USER_NAME}, the one who created you and you work for, by following the tasks they ask you to do. {USER_NAME} is {USER_AGE} years old and he is a {USER_OCCUPATION}. Their interests include {USER_INTERESTS}. You can perform tasks by selecting the most appropriate function. Your capabilities include accessing the user's Google Calendar (create, delete, list events), handling reminders (add, mark as completed, list), and now you can also perform web searches when explicitly asked to do so.
+
+    When the user asks you to search for something online or if you need to verify information, use the web_search function. Only use this function when explicitly asked or when you need to verify important information. Do not use it for every query.
+
+    You are given the recent message history of the user with you at the end of these instructions. When responding, ANALYZE ONLY THE LATEST USER INPUT TO DETERMINE THE APPROPRIATE ACTION. DO NOT CONSIDER PREVIOUS MESSAGES FOR FUNCTION CALLING.
+    Choose one of two response formats:
+
+    1. Function Call Format (for task-oriented requests):
+    If the user's latest input requires a specific task to be completed using available functions, respond with a JSON object in this format:
+    {tools_schema}. Refer carefully what are the functions used for which purposes using the descriptions provided in each functions. AND VERY IMPORTANTLY IF REQUIRED ARGUMENTS ARE PROVIDED BY THE USER DONT TOOL CALL STRAIGHT AWAY, INSTEAD ASK THE USER NECESSARY INFORMATION THAT IS MISSING IN A FOLLOWUP/RESPONSE by using secong response format (Nomral response format) AND THEN PROCEED TO TOOL CALLING TILL YOU GET THE DETAILS COMPLETELY. FOR EXAMPLE IF USER ASKS YOU TO SCHEDULE AN EVENT IN GOOGLE CALENDAR WITHOUT REQUIRED INFORMATIONS LIKE SUMMARY, START TIME AND END TIME, YOU SHOULD ASK THEM THESE DETAILS IN A FOLLOW UP AND THEN AFTER YOU GET THE REQUIRED DETAILS ONLY PROCEED TO TOOL CALLING. Check the necessary parameters/arguments for each function in the structure given. (( OPTIONAL - If you can append your explanation or confirmation of the action taken or function choosed in a short description outside the tool calling format and If you feel you need more accurate data in order to respond to the user, dont hesitate to use the web_search function to get more information)).
+
+    2. Normal Response Format (for general queries or when no function is needed):
+    If the user's latest input is a general query or doesn't require a specific function, respond with a JSON object in this format:
+    {{
+        "response": "Your direct response to the user's query or input. respond only to the latest user input and not to the previous conversation history or context."
+    }}
+
+    Use the current date and time given below for relative references and respond with dates and times in sentence format (example: 3rd May 2024) with AM/PM format only."""
+
+
+class PromptBuilder:
+    """Builds chat prompts as a constant prefix followed by the per-turn parts.
+
+    The instructions and tool schema never change between requests, so they
+    form an identical leading system message that provider-side prompt
+    caching can reuse. History and the current time follow in a second
+    system message, with history trimmed to a token budget newest-first.
+    """
+
+    def __init__(self, context_budget=PROMPT_CONTEXT_TOKENS):
+        self.prefix = static_prefix()
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.context_budget = context_budget
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.estimated_tokens = 0
+        self.usage_turns = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.last_turn = {}
+
+    def fit_context(self, history):
+        lines, used = [], 0
+        for msg in reversed(history):
+            line = f"{msg['role'].capitalize()}: {msg['content']}"
+            tokens = estimate_tokens(line)
+            if used + tokens > self.context_budget:
+                break
+            lines.append(line)
+            used += tokens
+        return lines[::-1], used
+
+    def build(self, user_input, history, now=None):
+        now = now or datetime.now()
+        context_lines, context_tokens = self.fit_context(history)
+        formatted_context = "\n".join(context_lines)
+        turn_message = (
+            f"Recent message history (oldest first):\n<\"{formatted_context}\">\n\n"
+            f"The current date and time is {now.strftime(r'%Y-%m-%d %I:%M:%S %p')}, and today is {now.strftime('%A')}."
+        )
+
+        estimated = self.prefix_tokens + estimate_tokens(turn_message) + estimate_tokens(user_input)
+        with self.lock:
+            self.turns += 1
+            self.estimated_tokens += estimated
+            self.last_turn = {
+                "prefix_tokens": self.prefix_tokens,
+                "context_messages": len(context_lines),
+                "context_tokens": context_tokens,
+                "estimated_tokens": estimated,
+            }
+        logger.info(
+            f"Prompt: ~{estimated} tokens (prefix {self.prefix_tokens}, "
+            f"history {len(context_lines)}/{len(history)} messages, {context_tokens} tokens)"
+        )
+
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "system", "content": turn_message},
+            {"role": "user", "content": user_input}
+        ]
+
+    def record_usage(self, usage):
+        """Records the provider-reported token usage of the latest turn."""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        with self.lock:
+            self.usage_turns += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached
+            self.last_turn.update(prompt_tokens=prompt_tokens, cached_tokens=cached)
+        logger.info(f"Prompt usage: {prompt_tokens} input tokens, {cached} cached")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "turns": self.turns,
+                "prefix_tokens": self.prefix_tokens,
+                "context_budget": self.context_budget,
+                "avg_estimated_tokens": round(self.estimated_tokens / self.turns, 1) if self.turns else 0,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.usage_turns, 1) if self.usage_turns else 0,
+                "cached_tokens": self.cached_tokens,
+                "last_turn": dict(self.last_turn),
+            }
+
+def stream_usage(chunk):
+    # Groq attaches usage to the final streamed chunk under x_groq
+    return getattr(getattr(chunk, "x_groq", None), "usage", None)
@@ -0,0 +1,71 @@
+import re
+import hashlib
+import threading
+import logging
+from config.settings import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Answers that depend on the clock, the calendar or live data are never cached
+TIME_SENSITIVE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|currently|current|latest|recent|recently|upcoming|"
+    r"this (?:morning|afternoon|evening|week|month|year)|next|last|ago|date|time|day|days|week|month|year|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december|"
+    r"weather|news|price|prices|score|stock|schedule|calendar|event|events|meeting|remind|reminder|reminders|"
+    r"\d{1,2}(?::\d{2})?\s*(?:am|pm)|\d{4})\b",
+    re.IGNORECASE
+)
+# Follow-ups only make sense with the previous turn, so they are not cacheable either
+CONTEXT_DEPENDENT = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|he|she|him|her|again|more|above|previous|earlier|same|else|also)\b",
+    re.IGNORECASE
+)
+
+def normalize_input(text):
+    text = re.sub(r"[^\w\s']", " ", (text or "").lower())
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """Opt-in cache of LLM answers to general, time-independent questions.
+
+    Keys combine the normalized user input with a hash of the context the
+    answer depends on (the prompt prefix and the model), so a prompt change
+    invalidates every entry. Entries are evicted LRU and expire after
+    RESPONSE_CACHE_TTL seconds.
+    """
+
+    def __init__(self, context, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()[:16]
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def cacheable(self, user_input):
+        return not TIME_SENSITIVE.search(user_input) and not CONTEXT_DEPENDENT.search(user_input)
+
+    def key(self, user_input):
+        return f"{self.context_hash}:{normalize_input(user_input)}"
+
+    def get(self, user_input):
+        if not self.cacheable(user_input):
+            with self.lock:
+                self.skipped += 1
+            return None
+        response = self.cache.get(self.key(user_input))
+        if response is not None:
+            logger.info(f"Response cache hit for: {user_input}")
+        return response
+
+    def store(self, user_input, response):
+        if not response or not self.cacheable(user_input) or TIME_SENSITIVE.search(response):
+            return False
+        self.cache.set(self.key(user_input), response)
+        return True
+
+    def stats(self):
+        with self.lock:
+            skipped = self.skipped
+        return {**self.cache.stats(), "skipped": skipped}
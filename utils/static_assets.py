@@ -0,0 +1,180 @@
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from flask import Response, send_file
+from config.settings import STATIC_COMPRESS_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Create React App names bundles like main.eabb8f19.js; their content never changes under that name
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?(?:js|css|map|woff2?|png|jpe?g|svg|gif|webp)$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/manifest+json")
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# The platform's table varies (older Pythons and mime.types files say application/javascript)
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("application/json", ".map")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+def content_type(path):
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return f"{mimetype}; charset=utf-8" if mimetype.startswith("text/") or mimetype == "application/javascript" else mimetype
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header that are not refused with q=0."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: a W/ prefix does not matter for GET revalidation
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+class StaticAsset:
+    def __init__(self, relative_path, full_path, data):
+        stat = os.stat(full_path)
+        self.path = relative_path
+        self.full_path = full_path
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.content_type = content_type(relative_path)
+        self.immutable = bool(HASHED_NAME.search(relative_path))
+        self.etag = f'"{hashlib.sha1(data).hexdigest()[:20]}"'
+        # encoding -> compressed bytes, only kept when smaller than the original
+        self.variants = {}
+
+    @property
+    def cache_control(self):
+        return IMMUTABLE_CACHE if self.immutable else REVALIDATE_CACHE
+
+    def variant_etag(self, encoding):
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+class StaticAssets:
+    """Serves frontend/build from a manifest built once.
+
+    Every file is hashed for its ETag, and compressible files get gzip (and
+    brotli, when the module is installed) variants kept in memory. Prebuilt
+    .gz/.br files next to an asset are used instead of compressing it.
+    Content-hashed bundles are cached as immutable; everything else,
+    index.html included, is revalidated with If-None-Match or
+    If-Modified-Since and answered with 304 when unchanged.
+    """
+
+    def __init__(self, root, min_compress_bytes=STATIC_COMPRESS_MIN_BYTES):
+        self.root = root
+        self.min_compress_bytes = min_compress_bytes
+        self.assets = {}
+        self.build_manifest()
+
+    def build_manifest(self):
+        if not os.path.isdir(self.root):
+            logger.warning(f"Static root {self.root} does not exist.")
+            return
+        original_bytes = compressed_bytes = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith((".gz", ".br")):
+                    continue
+                full_path = os.path.join(directory, name)
+                relative_path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    data = f.read()
+                asset = StaticAsset(relative_path, full_path, data)
+                self.add_variants(asset, data)
+                self.assets[relative_path] = asset
+                if asset.variants:
+                    original_bytes += asset.size
+                    compressed_bytes += min(len(variant) for variant in asset.variants.values())
+        logger.info(
+            f"Static manifest: {len(self.assets)} files, compressed {original_bytes // 1024} KiB to {compressed_bytes // 1024} KiB"
+            f"{'' if brotli else ' (brotli not installed, gzip only)'}"
+        )
+
+    def add_variants(self, asset, data):
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            prebuilt = asset.full_path + suffix
+            if os.path.exists(prebuilt):
+                with open(prebuilt, "rb") as f:
+                    asset.variants[encoding] = f.read()
+
+        compressible = asset.content_type.startswith(COMPRESSIBLE_TYPES)
+        if not compressible or asset.size < self.min_compress_bytes:
+            return
+        if "gzip" not in asset.variants:
+            asset.variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if "br" not in asset.variants and brotli is not None:
+            asset.variants["br"] = brotli.compress(data, quality=11)
+        asset.variants = {encoding: variant for encoding, variant in asset.variants.items() if len(variant) < asset.size}
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def choose_encoding(self, asset, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and encoding in accepted:
+                return encoding
+        return None
+
+    def not_modified(self, asset, etag, headers):
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return asset.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, asset, headers):
+        encoding = self.choose_encoding(asset, headers.get("Accept-Encoding"))
+        etag = asset.variant_etag(encoding)
+
+        if self.not_modified(asset, etag, headers):
+            response = Response(status=304)
+        else:
+            if encoding:
+                response = Response(asset.variants[encoding])
+                response.headers["Content-Encoding"] = encoding
+            else:
+                response = send_file(asset.full_path, conditional=False, etag=False, last_modified=asset.mtime)
+            # Set here rather than through send_file, which would append its own charset
+            response.headers["Content-Type"] = asset.content_type
+
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = asset.last_modified
+        response.headers["Cache-Control"] = asset.cache_control
+        if asset.variants:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
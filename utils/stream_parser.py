@@ -0,0 +1,159 @@
+import json
+import re
+
+RESPONSE_PREFIX = re.compile(r'^\s*\{\s*"response"\s*:\s*"')
+FIRST_KEY = re.compile(r'^\s*\{\s*"([^"]*)"(.*)$', re.DOTALL)
+# What may follow a complete "response" key before its string value opens
+RESPONSE_KEY_TAIL = re.compile(r'^\s*(?::\s*)?$')
+
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class ResponseStreamParser:
+    """Incrementally classifies streamed LLM content.
+
+    The model answers either with a tool call JSON object or with a
+    {"response": "..."} payload. Only the user-visible text is returned
+    from feed(); tool call JSON is buffered until the stream finishes.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.kind = None  # "response", "tool" or "text"
+        self.text = ""
+        self._pending = ""
+        self._pending_start = 0
+        self._closed = False
+        self._tail_start = None
+
+    def feed(self, chunk):
+        if not chunk:
+            return ""
+        self.raw += chunk
+
+        if self.kind is None:
+            self._detect()
+            if self.kind is None:
+                return ""
+            chunk = self.raw[self._pending_start:]
+
+        if self.kind == "response":
+            return self._decode_string(chunk)
+        if self.kind == "text":
+            return self._stream_text(chunk)
+        return ""
+
+    def finish(self):
+        """Returns any visible text still held back at the end of the stream."""
+        if self.kind is None:
+            self._detect(final=True)
+        if self.kind == "text" and self._tail_start is not None:
+            tail = self.raw[self._tail_start:]
+            if parse_tool_call(tail) is None:
+                self._tail_start = None
+                self.text += tail
+                return tail
+        return ""
+
+    def tool_call(self):
+        """Returns (name, args) if the content turned out to be a tool call."""
+        if self.kind == "tool":
+            return parse_tool_call(self.raw)
+        if self.kind == "text" and self._tail_start is not None:
+            return parse_tool_call(self.raw[self._tail_start:])
+        return None
+
+    def _detect(self, final=False):
+        stripped = self.raw.lstrip()
+        if not stripped:
+            return
+        if stripped[0] != "{":
+            self.kind = "text"
+            self._pending_start = 0
+            return
+        match = RESPONSE_PREFIX.match(self.raw)
+        if match:
+            self.kind = "response"
+            self._pending_start = match.end()
+            return
+        # Tokens often end right after {" or "response", so wait until the first key can no longer become the payload
+        key = FIRST_KEY.match(self.raw)
+        if final or (key and (key.group(1) != "response" or not RESPONSE_KEY_TAIL.match(key.group(2)))):
+            # Any other JSON object is held back and resolved once complete
+            self.kind = "tool"
+            self._pending_start = len(self.raw)
+
+    def _decode_string(self, chunk):
+        if self._closed:
+            return ""
+        data = self._pending + chunk
+        self._pending = ""
+        out = []
+        i = 0
+        while i < len(data):
+            ch = data[i]
+            if ch == '"':
+                self._closed = True
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(data):
+                self._pending = data[i:]
+                break
+            esc = data[i + 1]
+            if esc == 'u':
+                if i + 6 > len(data):
+                    self._pending = data[i:]
+                    break
+                try:
+                    out.append(chr(int(data[i + 2:i + 6], 16)))
+                except ValueError:
+                    out.append(data[i:i + 6])
+                i += 6
+                continue
+            out.append(JSON_ESCAPES.get(esc, esc))
+            i += 2
+        visible = "".join(out)
+        self.text += visible
+        return visible
+
+    def _stream_text(self, chunk):
+        # Plain text may be followed by a tool call object; hold back from the first brace
+        if self._tail_start is not None:
+            return ""
+        brace = chunk.find("{")
+        if brace == -1:
+            self.text += chunk
+            return chunk
+        self._tail_start = len(self.raw) - len(chunk) + brace
+        visible = chunk[:brace]
+        self.text += visible
+        return visible
+
+
+def parse_tool_call(content):
+    """Parses a tool call written into the message content, returning (name, args) or None."""
+    try:
+        start = content.index("{")
+        end = content.rindex("}") + 1
+        obj = json.loads(content[start:end])
+    except ValueError:
+        return None
+    if not isinstance(obj, dict) or "response" in obj:
+        return None
+
+    function = obj.get("function")
+    name = obj.get("name") or (function.get("name") if isinstance(function, dict) else function)
+    if not isinstance(name, str):
+        return None
+    args = obj.get("arguments", obj.get("parameters"))
+    if args is None and isinstance(function, dict):
+        args = function.get("arguments", function.get("parameters"))
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            return None
+    return name, args or {}